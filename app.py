@@ -1,10 +1,14 @@
 import streamlit as st
-import os
-import time
-import google.generativeai as genai
-from voice_io import speak_response
-from booking import tools, handle_tool_calls
-from dotenv import load_dotenv
+import streamlit.components.v1 as components
+import base64
+import json
+import uuid
+from voice_io import SpeechStream
+from memory import ConversationMemory
+from session_store import WEB_NAMESPACE, SessionStore, exchanges, issued_session_id, new_session_id
+import engine
+from engine import generate_empathetic_response
+import tracing
 
 # Page configuration
 st.set_page_config(
@@ -14,21 +18,21 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# Load environment variables from .env file
-load_dotenv()
+# Every session's transcript is appended to its own compressed log; one store per process keeps the files open.
+# Web logs live apart from the CLI's, so no URL can reach a CLI conversation.
+@st.cache_resource
+def load_session_store():
+    return SessionStore(window=RECENT_MESSAGES, namespace=WEB_NAMESPACE)
 
-# Configure API key
-api_key = os.environ.get("GOOGLE_API_KEY")
-if not api_key:
+# The engine (model, client, persona and tools) is built once per process and shared by every
+# session and rerun; it reads the API key once
+if not engine.api_key:
     st.error("GOOGLE_API_KEY is not set. Please add it to your .env file in the project directory.")
     st.stop()
 
-# Configure the API
-genai.configure(api_key=api_key)
-
-# Initialize the model
-model_name = os.environ.get("MODEL_NAME", "gemini-1.5-flash-8b-latest")
-model = genai.GenerativeModel(model_name)
+# How many of the latest messages are drawn on each rerun; older ones are paged in an expander
+RECENT_MESSAGES = 20
+HISTORY_PAGE_SIZE = 20
 
 # Custom CSS
 st.markdown("""
@@ -85,51 +89,133 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Function to generate empathetic responses
-def generate_empathetic_response(user_input):
-    prompt = f"""You're an empathetic therapist named Cotton. Respond supportively to: '{user_input}'. 
-    Be warm, understanding, and compassionate. Use a conversational tone and keep responses concise.
-    If the user expresses interest in booking a session with a human therapist, offer to help them book an appointment."""
+# Browser-side speech queue: one audio element in the page that plays a reply's segments in order,
+# each starting when the one before it ends. A new reply stops the previous one. It is installed in
+# the page itself (not the component's frame) so it keeps playing after the script run that fed it.
+SPEECH_QUEUE_JS = """
+(function () {
+    const page = window.parent;
+    if (!page.cottonSpeech) {
+        page.eval(`window.cottonSpeech = {
+            audio: new Audio(), reply: null, next: 0, segments: {}, playing: false,
+            add(reply, index, src) {
+                if (reply !== this.reply) {
+                    this.audio.pause();
+                    Object.assign(this, {reply: reply, next: 0, segments: {}, playing: false});
+                }
+                this.segments[index] = src;
+                if (!this.playing) this.advance();
+            },
+            advance() {
+                const src = this.segments[this.next];
+                this.playing = src !== undefined;
+                if (!this.playing) return;
+                delete this.segments[this.next++];
+                this.audio.src = src;
+                this.audio.play().catch(() => this.advance());
+            },
+        };
+        window.cottonSpeech.audio.addEventListener("ended", () => window.cottonSpeech.advance());`);
+    }
+    page.cottonSpeech.add(%s, %d, %s);
+})();
+"""
+
+# Sends one reply's speech to the browser while it is synthesized off the script thread.
+# Each segment goes to the page's speech queue as soon as it is ready; nothing here waits for
+# playback, so the rest of the page renders while Cotton is still speaking. The whole reply is
+# left in a player afterwards so it can be replayed.
+class BrowserSpeech:
+    def __init__(self):
+        self.stream = SpeechStream()
+        self.reply = uuid.uuid4().hex
+        self.played = []
     
-    # Generate response with tools enabled
-    response = model.generate_content(
-        prompt,
-        tools=tools,
-        generation_config={
-            "temperature": 0.7,
-            "max_output_tokens": 1024
-        }
-    )
+    # Send every segment that is ready; with wait, every segment of the reply
+    def play(self, wait=False):
+        while True:
+            audio = self.stream.next_segment(block=wait)
+            if audio is None:
+                return
+            src = "data:audio/mp3;base64," + base64.b64encode(audio).decode("ascii")
+            components.html(f"<script>{SPEECH_QUEUE_JS % (json.dumps(self.reply), len(self.played), json.dumps(src))}</script>",
+                            height=0)
+            self.played.append(audio)
     
-    # Check if there's a tool call in the response
-    booking_result = handle_tool_calls(response, prompt)
+    def feed(self, text):
+        self.stream.feed(text)
+        self.play()
+    
+    def finish(self):
+        self.stream.finish()
+        self.play(wait=True)
+        if self.played:
+            st.audio(b"".join(self.played), format="audio/mp3")
+
+# Function to build the HTML for a bot chat bubble
+def bot_bubble(content):
+    return f'<div style="display: flex; justify-content: flex-start;"><div class="bot-bubble">{content}</div></div>'
+
+# Function to build the HTML for a user chat bubble
+def user_bubble(content):
+    return f'<div style="display: flex; justify-content: flex-end;"><div class="user-bubble">{content}</div></div>'
+
+# Function to build the HTML for any stored message
+def message_bubble(message):
+    if message["role"] == "user":
+        return user_bubble(message["content"])
+    return bot_bubble(message["content"])
+
+# Function to draw the transcript with a bounded number of elements per rerun.
+# The latest messages come from the log's in-memory window and go out as a single markdown block;
+# older ones are paged straight from the log file.
+def render_transcript(transcript):
+    recent = list(transcript.recent)[-RECENT_MESSAGES:]
+    older = len(transcript) - len(recent)
     
-    if booking_result:
-        # Generate a final response that includes the booking confirmation
-        final_prompt = f"{prompt}\n\nThe appointment has been booked: {booking_result}"
-        final_response = model.generate_content(final_prompt)
-        return final_response.text
+    if older:
+        with st.expander(f"Earlier messages ({older})"):
+            pages = (older + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE
+            page = pages
+            if pages > 1:
+                page = st.number_input("Page", min_value=1, max_value=pages, value=pages, step=1)
+            start = (page - 1) * HISTORY_PAGE_SIZE
+            page_messages = transcript.read(start, min(start + HISTORY_PAGE_SIZE, older))
+            st.markdown("".join(message_bubble(message) for message in page_messages), unsafe_allow_html=True)
     
-    # If no tool call, return the regular response
-    return response.text
+    st.markdown("".join(message_bubble(message) for message in recent), unsafe_allow_html=True)
 
-# Initialize session state for chat history
-if 'messages' not in st.session_state:
-    st.session_state.messages = []
+# Identifies this conversation to the per-user rate limits and the session store. It is kept in the
+# URL (?session=...), so reloading the page or restarting the server picks the conversation back up.
+# Only IDs the server issued are accepted; anything else (e.g. ?session=test) starts a new conversation.
+if 'session_id' not in st.session_state:
+    session_id = st.query_params.get("session", "")
+    if not issued_session_id(session_id):
+        session_id = new_session_id()
+        st.query_params["session"] = session_id
+    st.session_state.session_id = session_id
+
+# Chat history, read back from the session log (only a recent window is held in memory)
+transcript = load_session_store().open(st.session_state.session_id)
+if not len(transcript):
     # Add welcome message
     welcome_message = "Hey, I'm Cotton, your therapy companion. Feel free to spill your thoughts, and I'm here to listen and support you."
-    st.session_state.messages.append({"role": "assistant", "content": welcome_message})
+    transcript.append("assistant", welcome_message)
+
+# Token-budgeted memory of the conversation that is sent along with each prompt
+if 'memory' not in st.session_state:
+    st.session_state.memory = ConversationMemory(
+        summarize=engine.summarizer(st.session_state.session_id)
+    )
+    # A resumed conversation carries on from its latest exchanges
+    st.session_state.memory.restore(exchanges(transcript.tail(2 * st.session_state.memory.recent_turns)))
 
 # Display header
 st.markdown('<h1 class="main-header">Cotton Therapy</h1>', unsafe_allow_html=True)
 st.markdown('<p class="sub-header">Your AI therapy companion</p>', unsafe_allow_html=True)
 
 # Display chat messages
-for message in st.session_state.messages:
-    if message["role"] == "user":
-        st.markdown(f'<div style="display: flex; justify-content: flex-end;"><div class="user-bubble">{message["content"]}</div></div>', unsafe_allow_html=True)
-    else:
-        st.markdown(f'<div style="display: flex; justify-content: flex-start;"><div class="bot-bubble">{message["content"]}</div></div>', unsafe_allow_html=True)
+render_transcript(transcript)
 
 # Voice mode toggle
 voice_mode = st.sidebar.checkbox("Enable Voice Output", value=False)
@@ -139,25 +225,40 @@ user_input = st.chat_input("Type your message here...")
 
 # Process user input
 if user_input:
-    # Add user message to chat history
-    st.session_state.messages.append({"role": "user", "content": user_input})
-    
-    # Display user message
-    st.markdown(f'<div style="display: flex; justify-content: flex-end;"><div class="user-bubble">{user_input}</div></div>', unsafe_allow_html=True)
-    
-    # Generate bot response
-    with st.spinner("Cotton is thinking..."):
-        bot_response = generate_empathetic_response(user_input)
-    
-    # Add bot response to chat history
-    st.session_state.messages.append({"role": "assistant", "content": bot_response})
-    
-    # Display bot response
-    st.markdown(f'<div style="display: flex; justify-content: flex-start;"><div class="bot-bubble">{bot_response}</div></div>', unsafe_allow_html=True)
-    
-    # Speak response if voice mode is enabled
-    if voice_mode:
-        speak_response(bot_response)
+    # Every stage of the turn is timed under one turn ID (when TRACE/TRACE_FILE is set)
+    with tracing.turn(channel="streamlit"):
+        # Add user message to chat history
+        transcript.append("user", user_input)
+        
+        # Display user message
+        st.markdown(user_bubble(user_input), unsafe_allow_html=True)
+        
+        # Generate bot response into a bubble that grows as chunks stream in
+        bubble = st.empty()
+        bubble.markdown(bot_bubble("<i>Cotton is thinking...</i>"), unsafe_allow_html=True)
+        streamed = []
+        
+        # Speech is synthesized sentence by sentence as the reply streams in and played in this browser only
+        speech = BrowserSpeech() if voice_mode else None
+        
+        def render_chunk(text):
+            streamed.append(text)
+            bubble.markdown(bot_bubble("".join(streamed)), unsafe_allow_html=True)
+            if speech:
+                speech.feed(text)
+        
+        bot_response = generate_empathetic_response(user_input, on_text=render_chunk, memory=st.session_state.memory,
+                                                     user_id=st.session_state.session_id)
+        
+        # Add bot response to chat history
+        transcript.append("assistant", bot_response)
+        
+        # Make sure the final text is shown even if nothing was streamed
+        bubble.markdown(bot_bubble(bot_response), unsafe_allow_html=True)
+        
+        # Play the rest of the spoken response
+        if speech:
+            speech.finish()
 
 # Sidebar information
 with st.sidebar:
@@ -171,4 +272,4 @@ with st.sidebar:
     st.write("- Appointment booking with human therapists")
     
     st.header("Using Voice Mode")
-    st.write("Enable the 'Voice Output' option to have Cotton speak responses aloud.")
\ No newline at end of file
+    st.write("Enable the 'Voice Output' option to have Cotton speak responses aloud in your browser.")
\ No newline at end of file
@@ -0,0 +1,540 @@
+# Therapist availability engine behind book_appointment and find_available_slots.
+# Each therapist's open slots are a sorted array of start times (minutes since year 1), so checking
+# a slot, booking it and finding the next free ones are bisections. A sorted (start, therapist)
+# index answers "who is free on Thursday?" across every therapist; booked entries are skipped
+# when read and dropped when the index is rebuilt. Names match exactly, by prefix of any word, or
+# fuzzily through a trigram index. Reservations take one lock, so two sessions can never book
+# the same slot. State lives in memory: every booking is appended to a journal and snapshot()
+# folds the journal into a JSON snapshot that is loaded on the next start. Processes sharing the
+# files (the CLI, the Streamlit app, the service) take an advisory lock on them and pick up each
+# other's bookings before every reservation. Past slots are dropped once a day.
+import array
+import bisect
+import contextlib
+import datetime
+import difflib
+import json
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+AVAILABILITY_FILE = os.environ.get("AVAILABILITY_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".availability.json"))
+AVAILABILITY_DAYS = int(os.environ.get("AVAILABILITY_DAYS", "14"))  # how far ahead the calendar is open
+OPENING_HOURS = range(9, 18)  # session start hours, every day
+FUZZY_CUTOFF = 0.75
+FUZZY_CANDIDATES = 20
+THERAPIST_BITS = 20  # therapist ids are packed under the start time in the time index
+
+DEFAULT_THERAPISTS = ("Dr. Maya Lee", "Dr. Carlos Rivera", "Dr. Priya Patel", "Dr. Thomas Nguyen",
+                      "Dr. Amara Okafor", "Dr. Sarah Cohen")
+
+TITLE_PATTERN = re.compile(r"^(?:dr|doctor|mr|mrs|ms|mx|miss|prof|professor)\b\.?\s*")
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+MONTHS = ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec")
+ISO_PATTERN = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})(?:[ t](\d{1,2}):(\d{2}))?\b")
+DATE_PATTERN = re.compile(r"\b(?:(\d{1,2})(?:st|nd|rd|th)?\s+(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*"
+                          r"|(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\s+(\d{1,2})(?:st|nd|rd|th)?)\b")
+DAY_PATTERN = re.compile(r"\b(today|tonight|tomorrow|(?:mon|tues|wednes|thurs|fri|satur|sun)day)\b")
+PART_PATTERN = re.compile(r"\b(morning|afternoon|evening|tonight)\b")
+TIME_PATTERN = re.compile(r"\b(\d{1,2})(?::(\d{2}))?\s*(am|pm|a\.m\.|p\.m\.)|\b(\d{1,2}):(\d{2})\b|\bat (\d{1,2})\b|\b(noon|midnight)\b")
+PART_OF_DAY = {"morning": (0, 12 * 60), "afternoon": (12 * 60, 17 * 60), "evening": (17 * 60, 24 * 60),
+               "tonight": (17 * 60, 24 * 60)}
+
+
+class BookingError(ValueError):
+    pass
+
+
+class UnknownTherapist(BookingError):
+    pass
+
+
+class AmbiguousTherapist(BookingError):
+    pass
+
+
+class UnclearTime(BookingError):
+    pass
+
+
+class SlotUnavailable(BookingError):
+    pass
+
+
+# Function to block until this process holds the lock on an open lock file
+def _lock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# Function to tell whether a file has been replaced or rewritten since it was last read
+def _file_id(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+# Function to turn a datetime into minutes since year 1 (the engine's time unit)
+def to_minutes(moment):
+    return moment.toordinal() * 1440 + moment.hour * 60 + moment.minute
+
+
+def from_minutes(minutes):
+    days, minute = divmod(minutes, 1440)
+    return datetime.datetime.fromordinal(days) + datetime.timedelta(minutes=minute)
+
+
+# Function to describe a slot the way a person would say it, e.g. "Thursday 16 October at 4:00 PM"
+def format_slot(minutes):
+    moment = from_minutes(minutes)
+    hour = moment.hour % 12 or 12
+    return f"{moment:%A} {moment.day} {moment:%B} at {hour}:{moment.minute:02d} {'AM' if moment.hour < 12 else 'PM'}"
+
+
+# Function to read a free-text time slot ("4pm Thursday", "tomorrow afternoon", "2026-10-20 15:00").
+# Returns (day, window): the date or None, and a (start, end) range of minutes within the day or None.
+def parse_time_slot(text, now):
+    text = (text or "").lower()
+    day = None
+    match = ISO_PATTERN.search(text)
+    if match:
+        day = datetime.date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        if match.group(4):
+            minute = int(match.group(4)) * 60 + int(match.group(5))
+            return day, (minute, minute + 1)
+        text = text.replace(match.group(0), " ")
+    match = DATE_PATTERN.search(text)
+    if match and day is None:
+        number, month = (match.group(1), match.group(2)) if match.group(1) else (match.group(4), match.group(3))
+        day = datetime.date(now.year, MONTHS.index(month) + 1, int(number))
+        if day < now.date():
+            day = day.replace(year=now.year + 1)
+        text = text.replace(match.group(0), " ")
+
+    window = None
+    this_weekday = False
+    match = DAY_PATTERN.search(text)
+    if match and day is None:
+        word = match.group(1)
+        if word == "tomorrow":
+            day = now.date() + datetime.timedelta(days=1)
+        elif word.endswith("day") and word != "today":
+            ahead = (WEEKDAYS.index(word) - now.weekday()) % 7
+            this_weekday = not ahead and f"next {word}" not in text
+            day = now.date() + datetime.timedelta(days=ahead or 7 * (f"next {word}" in text))
+        else:
+            day = now.date()
+    match = PART_PATTERN.search(text)
+    if match:
+        day = day or now.date()
+        window = PART_OF_DAY[match.group(1)]
+
+    match = TIME_PATTERN.search(text)
+    if match:
+        if match.group(7):
+            hour, minute = 12 * (match.group(7) == "noon"), 0
+        elif match.group(1):
+            hour, minute = int(match.group(1)) % 12, int(match.group(2) or 0)
+            hour += 12 * match.group(3).startswith("p")
+        elif match.group(4):
+            hour, minute = int(match.group(4)), int(match.group(5))
+        else:  # "at 4" with no am/pm means office hours, so 1-7 are afternoon times
+            hour, minute = int(match.group(6)), 0
+            hour += 12 * (1 <= hour <= 7)
+        if hour < 24 and minute < 60:
+            window = (hour * 60 + minute, hour * 60 + minute + 1)
+    # "Thursday 4pm" said on a Thursday evening means next week
+    if this_weekday and window and window[1] <= now.hour * 60 + now.minute:
+        day += datetime.timedelta(days=7)
+    return day, window
+
+
+# Function to normalize a name for matching: lower case, no title or punctuation
+def normalize_name(name):
+    name = re.sub(r"[^\w\s'-]", " ", (name or "").lower()).strip()
+    return " ".join(TITLE_PATTERN.sub("", name).split())
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# Name lookups: exact, prefix of the full name or any word in it, then trigram-filtered fuzzy matching
+class TherapistDirectory:
+    def __init__(self):
+        self.names = []  # therapist id -> display name
+        self.exact = defaultdict(list)  # normalized name -> ids
+        self.keys = []  # sorted (word or full name, id) pairs for prefix search
+        self.keys_sorted = True
+        self.trigrams = defaultdict(list)  # trigram -> ids
+
+    def add(self, therapist_id, name):
+        normalized = normalize_name(name)
+        self.names.append(name)
+        self.exact[normalized].append(therapist_id)
+        words = normalized.split()
+        for key in {normalized, *words}:
+            self.keys.append((key, therapist_id))
+        self.keys_sorted = False
+        for trigram in _trigrams(normalized):
+            self.trigrams[trigram].append(therapist_id)
+
+    def _prefix(self, query, limit):
+        if not self.keys_sorted:
+            self.keys.sort()
+            self.keys_sorted = True
+        found = []
+        position = bisect.bisect_left(self.keys, (query,))
+        while position < len(self.keys) and self.keys[position][0].startswith(query):
+            therapist_id = self.keys[position][1]
+            if therapist_id not in found:
+                found.append(therapist_id)
+                if len(found) > limit:
+                    break
+            position += 1
+        return found
+
+    def _fuzzy(self, query, limit):
+        shared = Counter()
+        for trigram in _trigrams(query):
+            shared.update(self.trigrams.get(trigram, ()))
+        scored = []
+        for therapist_id, _ in shared.most_common(FUZZY_CANDIDATES):
+            candidates = normalize_name(self.names[therapist_id])
+            score = max(difflib.SequenceMatcher(None, query, key).ratio() for key in {candidates, *candidates.split()})
+            if score >= FUZZY_CUTOFF:
+                scored.append((score, therapist_id))
+        scored.sort(reverse=True)
+        return [therapist_id for _, therapist_id in scored[:limit]]
+
+    # Best matches for a name, most likely first
+    def match(self, name, limit=5):
+        query = normalize_name(name)
+        if not query:
+            return []
+        if query in self.exact:
+            return self.exact[query][:limit]
+        return self._prefix(query, limit) or self._fuzzy(query, limit)
+
+    # The one therapist a name refers to; raises UnknownTherapist or AmbiguousTherapist
+    def resolve(self, name):
+        matches = self.match(name, limit=4)
+        if not matches:
+            raise UnknownTherapist(f"I couldn't find a therapist called {name}.")
+        if len(matches) > 1:
+            options = ", ".join(self.names[therapist_id] for therapist_id in matches[:3])
+            raise AmbiguousTherapist(f"Several therapists match {name}: {options}. Which one did you mean?")
+        return matches[0]
+
+
+class AvailabilityEngine:
+    # With path=None nothing is written to disk
+    def __init__(self, path=None):
+        self.path = path or None
+        self.directory = TherapistDirectory()
+        self.free = []  # therapist id -> sorted array of open slot starts
+        self.horizon = 0  # the last day (ordinal) whose default hours have been opened
+        self.time_index = None  # sorted array of start << THERAPIST_BITS | therapist id, built on demand
+        self.pruned_day = 0  # the day (ordinal) before which slots have been dropped
+        self.lock = threading.RLock()
+        self.lock_file = None
+        self.lock_depth = 0
+        self.journal = None
+        self.journal_offset = 0  # how far into the journal this process has read
+        self.snapshot_id = None  # the snapshot file this process last loaded or wrote
+        self.reservations = 0
+        self.conflicts = 0
+
+    # Load the snapshot and journal at path, or start from the default roster
+    @classmethod
+    def load(cls, path=AVAILABILITY_FILE, now=None):
+        engine = cls(path)
+        with engine._locked():
+            if engine.path and os.path.exists(engine.path):
+                changed = engine._read_snapshot()
+            else:
+                for name in DEFAULT_THERAPISTS:
+                    engine.add_therapist(name)
+                changed = True
+            changed = engine.open_days(now) or changed
+            if changed:
+                engine.snapshot()
+        return engine
+
+    # Context manager holding the engine's lock and, with a path, the lock on its files
+    @contextlib.contextmanager
+    def _locked(self):
+        with self.lock:
+            if not self.path:
+                yield
+                return
+            if self.lock_depth == 0:
+                if self.lock_file is None:
+                    self.lock_file = open(f"{self.path}.lock", "a+b")
+                _lock_file(self.lock_file)
+            self.lock_depth += 1
+            try:
+                yield
+            finally:
+                self.lock_depth -= 1
+                if self.lock_depth == 0:
+                    _unlock_file(self.lock_file)
+
+    # Catch up with bookings other processes made: reload a snapshot one of them wrote, or read
+    # what they appended to the journal. Call with _locked() held.
+    def _sync(self):
+        if not self.path or self.snapshot_id is None:
+            return
+        if _file_id(self.path) != self.snapshot_id:
+            self.directory = TherapistDirectory()
+            self.free = []
+            self.horizon = 0
+            self.pruned_day = 0
+            self.time_index = None
+            self._read_snapshot()
+        else:
+            self._replay_journal()
+
+    def add_therapist(self, name, starts=()):
+        with self.lock:
+            therapist_id = len(self.free)
+            if therapist_id >= 1 << THERAPIST_BITS:
+                raise ValueError("Too many therapists")
+            self.directory.add(therapist_id, name)
+            self.free.append(array.array("q", sorted(starts)))
+            self.time_index = None
+            return therapist_id
+
+    def name(self, therapist_id):
+        return self.directory.names[therapist_id]
+
+    # Open OPENING_HOURS for every therapist on each day up to AVAILABILITY_DAYS ahead, and drop
+    # slots on days that have passed; returns whether any day was opened
+    def open_days(self, now=None, days=AVAILABILITY_DAYS):
+        now = now or datetime.datetime.now()
+        today = now.date().toordinal()
+        with self.lock:
+            if today > self.pruned_day:
+                for slots in self.free:
+                    del slots[:bisect.bisect_left(slots, today * 1440)]
+                self.pruned_day = today
+                self.time_index = None
+            return self._open_through(max(self.horizon + 1, today), today + days - 1)
+
+    def _open_through(self, first, last):
+        if first > last:
+            return False
+        starts = [day * 1440 + hour * 60 for day in range(first, last + 1) for hour in OPENING_HOURS]
+        for slots in self.free:
+            slots.extend(starts)  # later days than anything already open, so the array stays sorted
+        self.horizon = last
+        self.time_index = None
+        return True
+
+    # Take one slot off a therapist's open slots; returns whether it was open
+    def _take(self, therapist_id, start):
+        slots = self.free[therapist_id]
+        position = bisect.bisect_left(slots, start)
+        if position == len(slots) or slots[position] != start:
+            return False
+        del slots[position]
+        return True
+
+    def _is_free(self, therapist_id, start):
+        slots = self.free[therapist_id]
+        position = bisect.bisect_left(slots, start)
+        return position < len(slots) and slots[position] == start
+
+    def _index(self):
+        if self.time_index is None:
+            packed = [start << THERAPIST_BITS | therapist_id
+                      for therapist_id, slots in enumerate(self.free) for start in slots]
+            packed.sort()
+            self.time_index = array.array("q", packed)
+        return self.time_index
+
+    # Function to turn a free-text time slot into a [start, end) range of minutes from now on
+    def _window(self, time_slot, now):
+        day, window = parse_time_slot(time_slot, now)
+        earliest = to_minutes(now)
+        if day is None and window is None:
+            return earliest, None
+        if day is None:  # a time with no day: the next time it comes round
+            day = now.date() if window[0] >= now.hour * 60 + now.minute else now.date() + datetime.timedelta(days=1)
+        base = day.toordinal() * 1440
+        start, end = window or (0, 1440)
+        return max(base + start, earliest), base + end
+
+    # Free slots as (therapist name, start) pairs, earliest first. Without a therapist every one is
+    # searched; without a time slot the search starts now.
+    def find(self, therapist_name=None, time_slot=None, limit=5, now=None):
+        now = now or datetime.datetime.now()
+        with self._locked():
+            self._sync()
+        self.open_days(now)
+        start, end = self._window(time_slot, now)
+        if time_slot and end is not None and end - start <= 1:
+            end = None  # an exact time also shows the next openings after it
+        found = []
+        with self.lock:
+            if therapist_name:
+                therapist_id = self.directory.resolve(therapist_name)
+                slots = self.free[therapist_id]
+                position = bisect.bisect_left(slots, start)
+                for slot in slots[position:position + limit]:
+                    if end is not None and slot >= end:
+                        break
+                    found.append((self.name(therapist_id), slot))
+                return found
+
+            index = self._index()
+            mask = (1 << THERAPIST_BITS) - 1
+            position = bisect.bisect_left(index, start << THERAPIST_BITS)
+            while position < len(index) and len(found) < limit:
+                slot, therapist_id = index[position] >> THERAPIST_BITS, index[position] & mask
+                if end is not None and slot >= end:
+                    break
+                if self._is_free(therapist_id, slot):
+                    found.append((self.name(therapist_id), slot))
+                position += 1
+        return found
+
+    # Book one slot atomically, across processes sharing the files too; returns (therapist name,
+    # start) or raises a BookingError
+    def reserve(self, therapist_name, time_slot, now=None):
+        now = now or datetime.datetime.now()
+        with self._locked():
+            self._sync()
+            self.open_days(now)
+            therapist_id = self.directory.resolve(therapist_name)
+            name = self.name(therapist_id)
+            day, window = parse_time_slot(time_slot, now)
+            if window is None or window[1] - window[0] > 1:
+                openings = self._describe(self.find(name, time_slot, limit=3, now=now))
+                raise UnclearTime(f"What time would you like to see {name}?{openings}")
+            if day is None:  # a time with no day: the next time it comes round
+                day = now.date() if window[0] >= now.hour * 60 + now.minute else now.date() + datetime.timedelta(days=1)
+            start = day.toordinal() * 1440 + window[0]
+            if start < to_minutes(now):
+                raise UnclearTime(f"That time has already passed. When would you like to see {name}?")
+
+            if not self._take(therapist_id, start):
+                self.conflicts += 1
+                openings = self._describe(self.find(name, time_slot, limit=3, now=now))
+                raise SlotUnavailable(f"{name} isn't available on {format_slot(start)}.{openings}")
+            self.reservations += 1
+            self._journal({"reserve": [therapist_id, start]})
+        return name, start
+
+    def _describe(self, slots):
+        if not slots:
+            return " There are no open times then."
+        return " Open times: " + "; ".join(f"{name}, {format_slot(start)}" for name, start in slots) + "."
+
+    def _journal(self, entry):
+        if not self.path:
+            return
+        if self.journal is None:
+            self.journal = open(f"{self.path}.journal", "ab")
+        self.journal.write(json.dumps(entry).encode() + b"\n")
+        self.journal.flush()
+        self.journal_offset = self.journal.tell()  # caught up before writing, so this is the end
+
+    # Write every therapist's open slots to the snapshot file and empty the journal
+    def snapshot(self):
+        if not self.path:
+            return
+        with self._locked():
+            self._sync()
+            state = {
+                "horizon": self.horizon,
+                "therapists": [{"name": self.name(therapist_id), "free": slots.tolist()}
+                               for therapist_id, slots in enumerate(self.free)],
+            }
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(state, f, separators=(",", ":"))
+            os.replace(temporary, self.path)
+            self.snapshot_id = _file_id(self.path)
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+            open(f"{self.path}.journal", "w").close()
+            self.journal_offset = 0
+
+    # Load the snapshot and replay the journal; returns whether the journal had any bookings
+    def _read_snapshot(self):
+        self.snapshot_id = _file_id(self.path)
+        with open(self.path, encoding="utf-8") as f:
+            state = json.load(f)
+        for therapist in state["therapists"]:
+            self.add_therapist(therapist["name"], therapist["free"])
+        self.horizon = state.get("horizon", 0)
+        self.journal_offset = 0
+        return self._replay_journal()
+
+    # Apply the bookings appended to the journal since it was last read; returns whether there were any
+    def _replay_journal(self):
+        try:
+            with open(f"{self.path}.journal", "rb") as f:
+                f.seek(self.journal_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return False
+        end = data.rfind(b"\n") + 1  # a line still being written is read next time
+        self.journal_offset += end
+        replayed = False
+        for line in data[:end].splitlines():
+            try:
+                therapist_id, start = json.loads(line)["reserve"]
+            except (ValueError, KeyError, TypeError):
+                continue  # a line cut short by a crash
+            day = start // 1440
+            if day > self.horizon:  # booked by a process that had already opened that day
+                self._open_through(max(self.horizon + 1, datetime.date.today().toordinal()), day)
+            self._take(therapist_id, start)
+            replayed = True
+        return replayed
+
+    def stats(self):
+        with self.lock:
+            return {
+                "therapists": len(self.free),
+                "open_slots": sum(len(slots) for slots in self.free),
+                "reservations": self.reservations,
+                "conflicts": self.conflicts,
+            }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+# Function to get the shared engine, loading it on first use
+def get_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AvailabilityEngine.load()
+        return _engine
@@ -0,0 +1,2 @@
+# Offline benchmarks for Cotton Therapy. Run from the project root, e.g.
+#   python -m benchmarks.bench_streaming
@@ -0,0 +1,148 @@
+# Availability engine at scale: tens of thousands of therapists and millions of open slots.
+# Compares slot lookups and name matching against a plain list scan (what a naive calendar would
+# do), books contended slots from many threads to check nothing is double-booked, and times a
+# snapshot and reload.
+#   python -m benchmarks.bench_availability [--therapists 20000] [--days 14] [--threads 16]
+import argparse
+import datetime
+import difflib
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from availability import AvailabilityEngine, BookingError, format_slot, to_minutes
+
+FIRST_NAMES = ["Maya", "Carlos", "Priya", "Thomas", "Amara", "Sarah", "Kenji", "Fatima", "Liam", "Elena",
+               "Omar", "Grace", "Ravi", "Hannah", "Diego", "Zoe", "Samuel", "Aisha", "Noah", "Ingrid"]
+LAST_NAMES = ["Lee", "Rivera", "Patel", "Nguyen", "Okafor", "Cohen", "Tanaka", "Haddad", "Murphy", "Rossi",
+              "Khan", "Walker", "Iyer", "Schmidt", "Alvarez", "Martin", "Osei", "Rahman", "Brooks", "Larsen"]
+
+
+# Function to make unique therapist names: first + last name + a numbered practice suffix
+def therapist_names(count, seed):
+    rng = random.Random(seed)
+    return [f"Dr. {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}-{index}" for index in range(count)]
+
+
+def median_ms(action, inputs):
+    samples = []
+    for item in inputs:
+        start = time.perf_counter()
+        action(item)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+# Function to misspell a surname the way a speech recogniser might: one letter dropped
+def misspell(name, rng):
+    last = name.split()[-1].split("-")[0]
+    position = rng.randrange(1, len(last) - 1)
+    return last[:position] + last[position + 1:] + name[name.index("-"):]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--therapists", type=int, default=20000)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    now = datetime.datetime(2026, 10, 19, 8, 0)
+    names = therapist_names(args.therapists, args.seed)
+
+    start = time.perf_counter()
+    engine = AvailabilityEngine()
+    for name in names:
+        engine.add_therapist(name)
+    engine.open_days(now, args.days)
+    engine.find(time_slot="tomorrow", now=now)  # builds the time index
+    open_slots = engine.stats()["open_slots"]
+    print(f"{args.therapists:,} therapists, {open_slots:,} open slots, built and indexed in "
+          f"{time.perf_counter() - start:.2f} s")
+
+    # The naive calendar: one list of free (therapist, start) pairs, scanned for every question
+    naive = [(name, slot) for therapist_id, name in enumerate(names) for slot in engine.free[therapist_id]]
+    earliest = to_minutes(now)
+
+    def naive_find(name, limit=5):
+        return sorted(slot for therapist, slot in naive if therapist == name and slot >= earliest)[:limit]
+
+    def naive_find_any(day_start, limit=5):
+        return sorted((slot, therapist) for therapist, slot in naive if day_start <= slot < day_start + 1440)[:limit]
+
+    sample = [rng.choice(names) for _ in range(args.queries)]
+    days = [rng.choice(["tomorrow", "thursday afternoon", "friday", "saturday morning"]) for _ in range(args.queries)]
+    scans = sample[:max(args.queries // 20, 3)]
+    print(f"\n{'query':<36} {'engine ms':>10} {'list scan ms':>13}")
+    engine_ms = median_ms(lambda name: engine.find(name, now=now), sample)
+    print(f"{'next slots for a therapist':<36} {engine_ms:>10.3f} {median_ms(naive_find, scans):>13.1f}")
+    engine_ms = median_ms(lambda day: engine.find(None, day, now=now), days)
+    day_start = (now.date().toordinal() + 1) * 1440
+    print(f"{'first free therapists on a day':<36} {engine_ms:>10.3f} "
+          f"{median_ms(lambda _: naive_find_any(day_start), scans):>13.1f}")
+
+    # Name matching: exact, a surname prefix, and a misspelt name against difflib over every name
+    misspelt = [misspell(name, rng) for name in sample]
+    resolve = engine.directory.match
+    print(f"{'exact name':<36} {median_ms(resolve, sample):>10.3f}")
+    print(f"{'surname prefix':<36} {median_ms(resolve, [name.split()[-1][:4] for name in sample]):>10.3f}")
+    found = sum(names[ids[0]] == name for name, ids in zip(sample, map(resolve, misspelt)) if ids)
+    baseline = median_ms(lambda name: difflib.get_close_matches(name, names, n=5), misspelt[:3])
+    print(f"{'misspelt name (fuzzy)':<36} {median_ms(resolve, misspelt):>10.3f} {baseline:>13.1f}"
+          f"   top match right for {found}/{len(sample)}")
+
+    # Contended bookings: every thread tries to book the same small set of popular slots
+    popular = [(name, format_slot(slot)) for name in sample[:20]
+               for _, slot in engine.find(name, "tomorrow", limit=3, now=now)]
+    booked = []
+    lock = threading.Lock()
+    attempts_per_thread = 200
+
+    def book(seed):
+        local = random.Random(seed)
+        for _ in range(attempts_per_thread):
+            name, slot = local.choice(popular)
+            try:
+                result = engine.reserve(name, slot, now=now)
+            except BookingError:
+                continue
+            with lock:
+                booked.append(result)
+
+    threads = [threading.Thread(target=book, args=(index,)) for index in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stats = engine.stats()
+    attempts = args.threads * attempts_per_thread
+    print(f"\n{args.threads} threads, {attempts} booking attempts on {len(popular)} popular slots in {elapsed:.2f} s "
+          f"({attempts / elapsed:,.0f}/s)")
+    print(f"  booked {len(booked)}, refused {stats['conflicts']} as taken, "
+          f"double bookings {len(booked) - len(set(booked))}")
+
+    # Persistence: snapshot every open slot, then reload from it
+    with tempfile.TemporaryDirectory() as directory:
+        engine.path = os.path.join(directory, "availability.json")
+        start = time.perf_counter()
+        engine.snapshot()
+        snapshot_s = time.perf_counter() - start
+        size = os.path.getsize(engine.path)
+        start = time.perf_counter()
+        reloaded = AvailabilityEngine(engine.path)
+        reloaded._read_snapshot()
+        load_s = time.perf_counter() - start
+        assert reloaded.stats()["open_slots"] == stats["open_slots"]
+        print(f"\nsnapshot {size / 1e6:.1f} MB in {snapshot_s:.2f} s, reload in {load_s:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Benchmarks booking-turn latency: the old two generate_content calls against a
+# function-response turn in one chat session and the local fast path.
+import os
+import statistics
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+import booking
+import streaming
+from benchmarks.fake_genai import FakeModel
+
+RUNS = 10
+PROMPT = "You're an empathetic therapist named Cotton. Respond supportively to: 'Can I get an appointment with Dr. Lee at 3pm?'"
+GENERATION_CONFIG = {"temperature": 0.7, "max_output_tokens": 1024}
+
+
+def make_model():
+    return FakeModel(first_token_latency=0.08, chunk_latency=0.005,
+                     function_call=("book_appointment", {"therapist_name": "Dr. Lee", "time_slot": "3pm"}))
+
+
+# The flow before this change: run the tool, then resend the whole prompt
+def legacy_turn(model):
+    response = model.generate_content(PROMPT, tools=booking.tools, generation_config=GENERATION_CONFIG)
+    booking_result = booking.handle_tool_calls(response, PROMPT)
+    final_response = model.generate_content(f"{PROMPT}\n\nThe appointment has been booked: {booking_result}")
+    return final_response.text
+
+
+def chat_turn(model):
+    chat = model.start_chat()
+    response = chat.send_message(PROMPT, tools=booking.tools, generation_config=GENERATION_CONFIG)
+    return booking.complete_tool_turn(chat, booking.get_function_calls(response), generation_config=GENERATION_CONFIG)
+
+
+def measure(label, turn, fast_path=False):
+    booking.BOOKING_FAST_PATH = fast_path
+    streaming.STREAMING_ENABLED = False
+    model = make_model()
+    samples = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        turn(model)
+        samples.append(time.perf_counter() - start)
+    print(f"{label:<32} {statistics.median(samples) * 1000:7.1f} ms/turn, {model.calls / RUNS:.0f} model calls/turn")
+
+
+def main():
+    # The mock booking function prints; keep the report readable
+    booking.registry.get("book_appointment").function = lambda therapist_name, time_slot: (
+        f"Successfully booked an appointment with {therapist_name} at {time_slot}."
+    )
+    measure("before: two generate_content", legacy_turn)
+    measure("after: function-response turn", chat_turn)
+    measure("after: BOOKING_FAST_PATH=1", chat_turn, fast_path=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# Compares turn latency calling the fake model directly against GeminiClient (deadlines, hedging,
+# retries) when some calls are slow or fail, then shows the circuit breaker during an outage.
+#   python -m benchmarks.bench_client [--calls 150] [--slow-rate 0.02] [--failure-rate 0.03]
+import argparse
+import time
+
+from benchmarks.fake_genai import FakeModel
+from benchmarks.harness import percentile
+from gemini_client import CircuitBreaker, GeminiClient, ModelUnavailable
+from streaming import stream_generate
+
+PROMPT = "I've been feeling really anxious about work lately."
+
+
+def run(model, calls):
+    latencies = []
+    errors = 0
+    for _ in range(calls):
+        start = time.perf_counter()
+        try:
+            stream_generate(model, PROMPT)
+        except ModelUnavailable:
+            errors += 1  # the caller would answer with FALLBACK_REPLY here
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies), errors
+
+
+def report(label, latencies, errors):
+    print(f"{label:<22} p50 {percentile(latencies, 50) * 1000:7.0f} ms   p95 {percentile(latencies, 95) * 1000:7.0f} ms   "
+          f"p99 {percentile(latencies, 99) * 1000:7.0f} ms   max {latencies[-1] * 1000:7.0f} ms   errors {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=150)
+    parser.add_argument("--first-token", type=float, default=0.08)
+    parser.add_argument("--slow-rate", type=float, default=0.02)
+    parser.add_argument("--slow-latency", type=float, default=3.0)
+    parser.add_argument("--failure-rate", type=float, default=0.03)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    def fake():
+        return FakeModel(first_token_latency=args.first_token, chunk_latency=0.005, jitter=0.2, seed=args.seed,
+                         slow_rate=args.slow_rate, slow_latency=args.slow_latency, failure_rate=args.failure_rate)
+
+    print(f"{args.calls} streamed calls, {args.slow_rate:.0%} slow ({args.slow_latency:.1f}s), {args.failure_rate:.0%} failing")
+    report("direct", *run(fake(), args.calls))
+    client = GeminiClient(fake(), turn_deadline=5.0, attempt_timeout=2.5)
+    report("GeminiClient", *run(client, args.calls))
+    print(client.summary())
+
+    # Outage: every call fails until the breaker opens, then calls fail fast until the API recovers
+    print("\noutage")
+    outage = fake()
+    outage.failure_rate = 1.0
+    client = GeminiClient(outage, turn_deadline=5.0, attempt_timeout=2.5,
+                          breaker=CircuitBreaker(failure_threshold=5, reset_seconds=1.0))
+    report("while down", *run(client, 20))
+    outage.failure_rate = 0.0
+    time.sleep(1.0)
+    report("after recovery", *run(client, 20))
+    print(client.summary())
+
+
+if __name__ == "__main__":
+    main()
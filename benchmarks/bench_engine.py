@@ -0,0 +1,149 @@
+# Per-call cost of building a reply request: the old copy-pasted generate_empathetic_response
+# (persona pasted into an f-string prompt, a fresh generation_config and raw tool schemas on every
+# call) against engine.py (persona as the system instruction, shared config, tools compiled once).
+# Both run the real google.generativeai GenerativeModel and ChatSession, with the network transport
+# swapped for a stub that answers at once and records each serialized request, so the numbers are
+# the bytes and Python time spent per turn before anything reaches the wire.
+#   python -m benchmarks.bench_engine [--turns 300] [--history 4]
+import argparse
+import statistics
+import time
+
+import google.generativeai as genai
+from google.generativeai import protos
+
+import engine
+from gemini_client import GeminiClient, ModelUnavailable, FALLBACK_REPLY
+from intent_router import local_reply
+from memory import ConversationMemory
+from streaming import STREAMING_ENABLED, stream_chat
+from tool_registry import complete_tool_turn, get_function_calls, tools
+
+# Messages that go to the model (not answered by the local router)
+MESSAGES = [
+    "I've been feeling really anxious about work lately.",
+    "My sister and I had another argument last night.",
+    "I didn't sleep well again and I feel drained.",
+    "Sometimes I feel like nobody really listens to me.",
+    "I keep overthinking everything I say at work.",
+]
+REPLY = "I'm here for you. That sounds really hard, and it makes sense you feel this way."
+
+
+# Stands in for the SDK's GenerativeServiceClient: answers at once and keeps request sizes
+class RecordingTransport:
+    def __init__(self):
+        self.request_bytes = []
+
+    def _answer(self, request):
+        self.request_bytes.append(len(protos.GenerateContentRequest.serialize(request)))
+        return protos.GenerateContentResponse(candidates=[protos.Candidate(
+            content=protos.Content(role="model", parts=[protos.Part(text=REPLY)]),
+            finish_reason=protos.Candidate.FinishReason.STOP,
+        )])
+
+    def generate_content(self, request, **kwargs):
+        return self._answer(request)
+
+    def stream_generate_content(self, request, **kwargs):
+        return iter([self._answer(request)])
+
+
+# A real GenerativeModel whose requests go to the recording transport
+def make_model(**kwargs):
+    model = genai.GenerativeModel(engine.model_name, **kwargs)
+    model._client = RecordingTransport()
+    return model
+
+
+# The prompt before engine.py: the persona pasted around the context and the user's words
+def legacy_prompt(user_input, context):
+    if context:
+        context = f"""Here is what you know about the conversation so far:
+    {context}
+
+    """
+    return f"""You're an empathetic therapist named Cotton. {context}Respond supportively to: '{user_input}'.
+    Be warm, understanding, and compassionate. Use a conversational tone and keep responses concise.
+    If the user expresses interest in booking a session with a human therapist, offer to help them book an appointment."""
+
+
+# The flow before engine.py, as main.py, bot.py and app.py each had it
+def legacy_reply(client, user_input, memory):
+    text = local_reply(user_input)
+    if text is not None:
+        return text
+
+    prompt = legacy_prompt(user_input, memory.context() if memory else "")
+    generation_config = {
+        "temperature": 0.7,
+        "max_output_tokens": 1024
+    }
+
+    chat = client.start_chat()
+    try:
+        if STREAMING_ENABLED:
+            result = stream_chat(chat, prompt, tools=tools, generation_config=generation_config)
+            text = result.text
+            if result.function_calls:
+                text += complete_tool_turn(chat, result.function_calls, generation_config=generation_config)
+        else:
+            response = chat.send_message(prompt, tools=tools, generation_config=generation_config)
+            function_calls = get_function_calls(response)
+            text = complete_tool_turn(chat, function_calls, generation_config=generation_config) if function_calls else response.text
+    except ModelUnavailable:
+        text = FALLBACK_REPLY
+    return text
+
+
+def make_memory(history):
+    memory = ConversationMemory()
+    memory.restore([(MESSAGES[i % len(MESSAGES)], REPLY) for i in range(history)])
+    return memory
+
+
+# Median time per reply, mean serialized request size, and mean prompt size built per call
+def measure(respond, build_prompt, model, messages, history):
+    samples = []
+    prompt_bytes = []
+    for message in messages:
+        memory = make_memory(history)  # the same context on every turn
+        prompt_bytes.append(len(build_prompt(message, memory.context()).encode()))
+        start = time.perf_counter()
+        respond(message, memory)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6, statistics.mean(prompt_bytes), statistics.mean(model._client.request_bytes)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=300)
+    parser.add_argument("--history", type=int, default=4, help="earlier exchanges in the conversation context")
+    args = parser.parse_args()
+
+    messages = [MESSAGES[i % len(MESSAGES)] for i in range(args.turns)]
+
+    legacy_model = make_model()
+    legacy_client = GeminiClient(legacy_model, hedge=False)
+    legacy = measure(lambda message, memory: legacy_reply(legacy_client, message, memory), legacy_prompt,
+                     legacy_model, messages, args.history)
+
+    engine_model = make_model(system_instruction=engine.PERSONA)
+    engine.model = engine_model
+    engine.client = GeminiClient(engine_model, hedge=False, system_tokens=engine.client.system_tokens)
+    current = measure(lambda message, memory: engine.generate_empathetic_response(message, memory=memory),
+                      engine.user_turn, engine_model, messages, args.history)
+
+    print(f"{args.turns} turns, {args.history} earlier exchanges in context, streaming {'on' if STREAMING_ENABLED else 'off'}")
+    print(f"{'':<34} {'per call us':>12} {'prompt bytes':>13} {'request bytes':>14}")
+    for label, (per_call, prompt_bytes, request_bytes) in (("before: prompt rebuilt per call", legacy),
+                                                          ("after: engine.py", current)):
+        print(f"{label:<34} {per_call:>12.0f} {prompt_bytes:>13.0f} {request_bytes:>14.0f}")
+    start = time.perf_counter()
+    for _ in range(1000):
+        genai.types.content_types.to_function_library(tools)
+    print(f"(converting the raw tool schemas, skipped by engine.py: {(time.perf_counter() - start) * 1000:.0f} us per call)")
+
+
+if __name__ == "__main__":
+    main()
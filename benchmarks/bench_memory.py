@@ -0,0 +1,44 @@
+# Shows that the context sent per turn stays flat as a session grows,
+# compared with naively sending the whole transcript.
+import random
+import time
+
+from memory import ConversationMemory, estimate_tokens, format_turn
+
+TURNS = 500
+CHECKPOINTS = (10, 50, 100, 250, 500)
+
+USER_LINES = [
+    "I've been feeling really anxious about work lately.",
+    "My sister and I had another argument last night and I can't stop thinking about it.",
+    "I didn't sleep well again.",
+    "Sometimes I feel like nobody really listens to me.",
+    "Today was actually a bit better than yesterday.",
+]
+
+
+# Stand-in for the model summarizer: keeps the last few sentences, costs a fixed delay
+def fake_summarize(summary, turns):
+    time.sleep(0.001)
+    facts = [user_text for user_text, _ in turns]
+    return " ".join((summary.split(". ") + facts)[-12:])
+
+
+def main():
+    random.seed(7)
+    memory = ConversationMemory(summarize=fake_summarize)
+    transcript = []
+    print(f"budget {memory.token_budget} tokens, {memory.recent_turns} verbatim turns, summary every {memory.summarize_every}")
+    print(f"{'turn':>5} {'memory ctx tokens':>18} {'full transcript tokens':>23} {'summary updates':>16}")
+    for turn in range(1, TURNS + 1):
+        user_text = random.choice(USER_LINES)
+        bot_text = "That sounds hard. " * random.randint(2, 8) + "I'm here with you."
+        memory.add_turn(user_text, bot_text)
+        memory.flush()  # summaries run in the background; a real user takes longer than one to reply
+        transcript.append(format_turn((user_text, bot_text)))
+        if turn in CHECKPOINTS:
+            print(f"{turn:>5} {estimate_tokens(memory.context()):>18} {estimate_tokens(chr(10).join(transcript)):>23} {memory.summary_updates:>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# Playback start and interrupt latency: the in-process player (pydub decode + one long-lived output
+# stream) against launching an external player process per segment, as play_audio does.
+# The sound card is a stand-in that consumes PCM in real time, and the external player is a small
+# process that reads the segment from stdin and then "plays" it for its duration, so the numbers
+# are the software overhead on top of the audio itself (a real mpg123 also has to open the device).
+#   python -m benchmarks.bench_playback [--segments 20] [--seconds 3]
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.fixtures import synthetic_utterance, to_wav
+from playback import CHANNELS, SAMPLE_RATE, SAMPLE_WIDTH, AudioPlayer, decode
+
+# Reads the whole segment, reports that playback began, then plays for its duration
+PLAYER_SCRIPT = (
+    "import sys, time; data = sys.stdin.buffer.read(); sys.stdout.write('playing\\n'); sys.stdout.flush(); "
+    "time.sleep(float(sys.argv[1]))"
+)
+
+
+# Output stand-in: write() blocks for as long as the PCM takes to play, like a real stream
+class RealTimeOutput:
+    def __init__(self):
+        self.first_write = None
+
+    def write(self, pcm):
+        if self.first_write is None:
+            self.first_write = time.perf_counter()
+        time.sleep(len(pcm) / (SAMPLE_RATE * CHANNELS * SAMPLE_WIDTH))
+
+    def close(self):
+        pass
+
+
+# The external path: one process per segment, started when the segment is ready
+def external_start_ms(audio, seconds):
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", PLAYER_SCRIPT, str(seconds)],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    process.stdin.write(audio)
+    process.stdin.close()
+    process.stdout.readline()
+    started = time.perf_counter() - start
+    process.terminate()
+    process.wait()
+    return started * 1000
+
+
+def external_interrupt_ms(audio, seconds, after):
+    process = subprocess.Popen([sys.executable, "-c", PLAYER_SCRIPT, str(seconds)],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    process.stdin.write(audio)
+    process.stdin.close()
+    process.stdout.readline()
+    time.sleep(after)
+    start = time.perf_counter()
+    process.terminate()
+    process.wait()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--segments", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=3.0, help="length of each spoken segment")
+    parser.add_argument("--interrupt-after", type=float, default=0.5)
+    args = parser.parse_args()
+
+    audio = to_wav(synthetic_utterance(args.seconds), sample_rate=16000)
+    first_decode = time.perf_counter()
+    decode(audio)
+    first_decode = (time.perf_counter() - first_decode) * 1000
+    print(f"segment: {args.seconds:g} s of speech, {len(audio) / 1000:.0f} kB WAV "
+          f"(decode + resample to {SAMPLE_RATE} Hz: {first_decode:.1f} ms, then cached)")
+
+    # Start latency: segment handed over -> first audio written / player process running
+    outputs = []
+
+    def open_output():
+        outputs.append(RealTimeOutput())
+        return outputs[-1]
+
+    player = AudioPlayer("pyaudio", open_output=open_output).open()
+    in_process = []
+    for _ in range(args.segments):
+        outputs[0].first_write = None
+        start = time.perf_counter()
+        player.play(audio)
+        while outputs[0].first_write is None:
+            time.sleep(0.0005)
+        in_process.append((outputs[0].first_write - start) * 1000)
+        player.cancel()
+        player.wait()
+    external = [external_start_ms(audio, args.seconds) for _ in range(args.segments)]
+    print(f"\n{'':<28} {'in-process ms':>14} {'external process ms':>20}")
+    print(f"{'start (p50)':<28} {statistics.median(in_process):>14.2f} {statistics.median(external):>20.1f}")
+
+    # Interrupt latency: cancel() partway through a segment -> output silent
+    player.interrupt_latencies.clear()
+    for _ in range(args.segments):
+        player.play(audio)
+        player.play(audio)  # a queued second segment must be dropped too
+        time.sleep(args.interrupt_after)
+        player.cancel()
+        player.wait()
+    interrupts = player.stats()["interrupt_ms"]
+    external = [external_interrupt_ms(audio, args.seconds, args.interrupt_after) for _ in range(min(args.segments, 5))]
+    print(f"{'interrupt (p50)':<28} {interrupts:>14.2f} {statistics.median(external):>20.1f}")
+    print(f"{'interrupt, blocking player':<28} {'':>14} {(2 * args.seconds - args.interrupt_after) * 1000:>20.0f}"
+          "   (before: play_audio waited for the player to exit)")
+    player.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Batch replay throughput against the local fake model: the same records replayed one at a time
+# and on a worker pool, then an interrupted run finished with --resume.
+#   python -m benchmarks.bench_replay [--records 2000] [--workers 64]
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+
+from benchmarks.harness import BOOKING_CALL, WORKLOAD, FakeEnvironment, StageTimings, use_fake_model
+
+
+# Function to write a JSONL input: mostly single messages, some multi-turn transcripts
+def write_records(path, count, seed):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for index in range(count):
+            if rng.random() < 0.2:
+                record = {"id": f"t{index}", "messages": rng.sample(WORKLOAD, 3)}
+            else:
+                record = {"id": f"m{index}", "text": rng.choice(WORKLOAD)}
+            f.write(json.dumps(record) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--serial-records", type=int, default=100, help="records for the one-at-a-time baseline")
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--first-token", type=float, default=0.12)
+    parser.add_argument("--chunk", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    model_options = {"first_token_latency": args.first_token, "chunk_latency": args.chunk,
+                     "function_call": BOOKING_CALL, "jitter": 0.3, "seed": args.seed}
+    with tempfile.TemporaryDirectory() as directory, FakeEnvironment(StageTimings(), model_options) as env:
+        from replay import Replayer, read_records
+
+        use_fake_model(env)
+        source = os.path.join(directory, "input.jsonl")
+        output = os.path.join(directory, "output.jsonl")
+        write_records(source, args.records, args.seed)
+        replayer = Replayer()
+        runs = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            records = list(read_records(source))
+            runs.append(("serial, 1 worker", replayer.run(records[:args.serial_records], output, workers=1)))
+            runs.append((f"pool, {args.workers} workers", replayer.run(records, output, workers=args.workers)))
+
+            # Simulate a crash halfway through, then pick up from the checkpoint
+            half = args.records // 2
+            replayer.run(records[:half], output, workers=args.workers)
+            resumed = replayer.run(records, output, workers=args.workers, resume=True)
+            with open(output, encoding="utf-8") as f:
+                written = {json.loads(line)["id"] for line in f}
+
+    for label, stats in runs:
+        print(f"{label}:\n  {stats.summary()}")
+    print(f"resume after {half} records:\n  {resumed.summary()}")
+    print(f"  output holds {len(written)} of {args.records} records")
+
+
+if __name__ == "__main__":
+    main()
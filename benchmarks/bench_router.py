@@ -0,0 +1,61 @@
+# Measures local intent-routing cost per message and how often the model is skipped.
+import time
+
+import booking
+import intent_router
+
+MESSAGES = [
+    "book me with Dr. Lee at 3pm tomorrow",
+    "Can you schedule a session with doctor Sarah Jones at 10:30 am on Friday?",
+    "I'd like to book an appointment with Maria tomorrow at noon",
+    "I want to book a session",
+    "Could I see someone next week?",
+    "hello!",
+    "Hey Cotton",
+    "exit",
+    "voice",
+    "I feel really anxious about my exams and I can't sleep.",
+    "My partner and I keep arguing and I don't know what to do anymore.",
+    "I have an appointment with my boss at 3pm tomorrow and I'm nervous about it",
+    "Today was a little better than yesterday.",
+    "Why do I always feel like this on Sundays?",
+]
+# Messages that mention a session without asking for one; none of them may be booked locally
+NOT_BOOKINGS = [
+    "I have a session with Dr. Lee at 3pm tomorrow and I'm really scared about it",
+    "I need to talk about my session with Dr. Lee at 3pm yesterday",
+    "My appointment with Dr. Lee at 10am on Friday went badly",
+    "I booked a session with Dr. Lee for 3pm tomorrow but I might cancel",
+    "My mum told me to book a session with Dr. Lee at 3pm tomorrow",
+    "I want an appointment with my boss at 5pm today to go well",
+    "Can you make me feel better before my session with Dr. Lee at 3pm?",
+]
+ROUNDS = 2000
+
+
+def main():
+    booking.book_appointment = lambda therapist_name, time_slot: f"Booked {therapist_name} at {time_slot}."
+    intent_router.book_appointment = booking.book_appointment
+
+    classify = intent_router.route.__wrapped__  # uncached, to measure the real cost
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for message in MESSAGES:
+            classify(message)
+    per_message = (time.perf_counter() - start) / (ROUNDS * len(MESSAGES))
+    print(f"route(): {per_message * 1e6:.1f} µs per message (uncached)")
+
+    for message in MESSAGES:
+        if intent_router.command_intent(message) is None:
+            intent_router.local_reply(message)
+        print(f"  {intent_router.route(message)!r:<90} {message}")
+    print(intent_router.router_stats.summary())
+
+    for message in NOT_BOOKINGS:
+        if intent_router.handled_locally(message):
+            raise AssertionError(f"booked locally: {message!r} -> {intent_router.route(message)!r}")
+    print(f"{len(NOT_BOOKINGS)} narrative messages all left to the model")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# Exercises the rate-limit scheduler two ways:
+#   1. simulated: a bursty multi-user workload replayed on a SimulatedClock (no sleeping), showing
+#      per-class queue waits, rejections and the busiest minute against the configured limit;
+#   2. live: concurrent turns against a fake model that enforces a quota, with and without the scheduler.
+#   python -m benchmarks.bench_scheduler [--users 20] [--minutes 5] [--rpm 60]
+import argparse
+import bisect
+import random
+import threading
+import time
+
+from benchmarks.fake_genai import FakeModel
+from gemini_client import GeminiClient, ModelUnavailable
+from scheduler import BACKGROUND, CRISIS, NORMAL, PRIORITY_NAMES, QueueFull, Scheduler, SimulatedClock
+
+
+# Function to build (time, user, priority, tokens) arrivals: each user chats in bursts, some messages are
+# crisis-flagged and some turns also trigger a background summary
+def simulated_workload(users, minutes, seed):
+    rng = random.Random(seed)
+    arrivals = []
+    for user in range(users):
+        now = rng.uniform(0, 30)
+        while now < minutes * 60:
+            for _ in range(rng.randint(1, 4)):  # a burst of quick messages
+                priority = CRISIS if rng.random() < 0.05 else NORMAL
+                arrivals.append((now, f"user-{user}", priority, rng.randint(300, 1500)))
+                if rng.random() < 0.25:
+                    arrivals.append((now + 0.1, f"user-{user}", BACKGROUND, 900))
+                now += rng.uniform(2, 8)
+            now += rng.expovariate(1 / 45)  # pause between bursts
+    return sorted(arrivals)
+
+
+def simulate(args):
+    clock = SimulatedClock()
+    scheduler = Scheduler(clock=clock, rpm=args.rpm, tpm=args.tpm, user_rpm=args.user_rpm, user_tpm=args.user_tpm)
+    arrivals = simulated_workload(args.users, args.minutes, args.seed)
+    admitted_at = []
+    index = 0
+    while index < len(arrivals) or scheduler.next_wait() is not None:
+        wait = scheduler.next_wait()
+        next_arrival = arrivals[index][0] if index < len(arrivals) else None
+        if next_arrival is not None and (wait is None or next_arrival <= clock.time() + wait):
+            clock.advance(next_arrival - clock.time())
+            _, user, priority, tokens = arrivals[index]
+            index += 1
+            try:
+                scheduler.submit(user, priority, tokens)
+            except QueueFull:
+                pass
+        else:
+            clock.advance(wait)
+        admitted_at.extend(clock.time() for _ in scheduler.dispatch())
+
+    busiest = max(bisect.bisect_left(admitted_at, start + 60) - i for i, start in enumerate(admitted_at))
+    offered = len(arrivals) / args.minutes
+    print(f"simulated: {len(arrivals)} requests from {args.users} users over {args.minutes} min "
+          f"({offered:.0f}/min offered, limit {args.rpm:.0f}/min)")
+    print(f"  busiest 60 s window admitted {busiest} requests; simulation ended at {clock.time() / 60:.1f} min")
+    print(scheduler.summary())
+
+
+def live(args, use_scheduler):
+    model = FakeModel(first_token_latency=0.05, chunk_latency=0.005, quota=(args.quota, 5), seed=args.seed)
+    scheduler = Scheduler(rpm=args.quota * 12 * 0.8, tpm=10 ** 9, user_rpm=10 ** 6, user_tpm=10 ** 9,
+                          burst_seconds=1) if use_scheduler else None
+    client = GeminiClient(model, turn_deadline=60, max_retries=0, hedge=False, scheduler=scheduler)
+    rng = random.Random(args.seed)
+    outcomes = {CRISIS: [], NORMAL: []}
+    lock = threading.Lock()
+
+    def turn(user, priority):
+        start = time.perf_counter()
+        try:
+            client.generate_content("How are you feeling today?", user=user, priority=priority)
+            ok = True
+        except ModelUnavailable:
+            ok = False
+        except Exception:  # the quota error itself, when nothing holds requests back
+            ok = False
+        with lock:
+            outcomes[priority].append((ok, time.perf_counter() - start))
+
+    threads = [threading.Thread(target=turn, args=(f"user-{i % 20}", CRISIS if rng.random() < 0.1 else NORMAL))
+               for i in range(args.live_requests)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    label = "with scheduler" if use_scheduler else "direct"
+    print(f"live {label}: {args.live_requests} concurrent requests, fake quota {args.quota} per 5 s, "
+          f"{model.quota_errors} quota errors, {elapsed:.1f}s")
+    for priority, results in outcomes.items():
+        latencies = sorted(seconds for _, seconds in results)
+        if latencies:
+            succeeded = sum(ok for ok, _ in results)
+            print(f"  {PRIORITY_NAMES[priority]:<8} {succeeded}/{len(results)} answered, "
+                  f"median {latencies[len(latencies) // 2]:.2f}s, max {latencies[-1]:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--minutes", type=float, default=5)
+    parser.add_argument("--rpm", type=float, default=60)
+    parser.add_argument("--tpm", type=float, default=60000)
+    parser.add_argument("--user-rpm", type=float, default=10)
+    parser.add_argument("--user-tpm", type=float, default=20000)
+    parser.add_argument("--quota", type=int, default=10, help="fake model requests allowed per 5 s")
+    parser.add_argument("--live-requests", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    simulate(args)
+    print()
+    live(args, use_scheduler=False)
+    live(args, use_scheduler=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# Load test for the async conversation service against the local fake model.
+# Half the sessions talk over HTTP (one request per turn), half over a WebSocket that sends all
+# of its turns at once to check that a session's replies still come back in order.
+# By default the model client has no rate limits, so the figures are the service's own capacity;
+# --rate-limits admits requests through a Scheduler with the production defaults (GEMINI_RPM=60,
+# GEMINI_USER_RPM=20), which is how a deployment with one API key behaves.
+#   python -m benchmarks.bench_service [--sessions 200] [--turns 5] [--workers 256] [--rate-limits]
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import time
+
+from benchmarks.harness import FakeEnvironment, StageTimings, percentile, use_fake_model
+
+
+async def http_session(client, base, session_id, turns, latencies, replies):
+    for turn in range(1, turns + 1):
+        start = time.perf_counter()
+        response = await client.fetch(f"{base}/sessions/{session_id}/messages", method="POST",
+                                      body=json.dumps({"text": f"I've been feeling low lately ({turn})"}),
+                                      request_timeout=120)
+        latencies.append(time.perf_counter() - start)
+        body = json.loads(response.body)
+        if body["turn"] != turn:
+            raise AssertionError(f"{session_id}: replies out of order")
+        replies.append(body.get("reply"))
+
+
+async def socket_session(base, session_id, turns, latencies, replies):
+    import tornado.websocket
+
+    connection = await tornado.websocket.websocket_connect(f"{base.replace('http', 'ws')}/sessions/{session_id}/ws")
+    sent = []
+    for turn in range(1, turns + 1):
+        sent.append(time.perf_counter())
+        await connection.write_message(f"Work has been overwhelming this week ({turn})")
+    expected = 1
+    while expected <= turns:
+        message = json.loads(await connection.read_message())
+        if message["type"] == "chunk":
+            continue
+        if message.get("turn") != expected:
+            raise AssertionError(f"{session_id}: expected turn {expected}, got {message}")
+        latencies.append(time.perf_counter() - sent[expected - 1])
+        replies.append(message.get("reply"))
+        expected += 1
+    connection.close()
+
+
+async def run(args, fallback_reply):
+    from tornado.httpclient import AsyncHTTPClient
+    from service import ConversationService, start_server
+
+    service = ConversationService(workers=args.workers)
+    server, port = start_server(service, port=0)
+    base = f"http://127.0.0.1:{port}"
+    AsyncHTTPClient.configure(None, max_clients=args.sessions)
+    client = AsyncHTTPClient()
+
+    http_latencies, socket_latencies, replies = [], [], []
+    jobs = []
+    for index in range(args.sessions):
+        session_id = f"load-{index}"
+        if index % 2:
+            jobs.append(socket_session(base, session_id, args.turns, socket_latencies, replies))
+        else:
+            jobs.append(http_session(client, base, session_id, args.turns, http_latencies, replies))
+
+    start = time.perf_counter()
+    await asyncio.gather(*jobs)
+    elapsed = time.perf_counter() - start
+
+    # Each WebSocket session's memory must hold its messages in the order they were sent
+    for index in range(1, args.sessions, 2):
+        said = [user_text for user_text, _ in service.sessions[f"load-{index}"].memory.recent]
+        if said != sorted(said, key=lambda text: int(text.rsplit("(", 1)[1].rstrip(")"))):
+            raise AssertionError(f"load-{index}: memory out of order: {said}")
+
+    server.stop()
+    service.close()
+    return (elapsed, sorted(http_latencies), sorted(socket_latencies), service.stats(),
+            sum(reply == fallback_reply for reply in replies))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=256)
+    parser.add_argument("--first-token", type=float, default=0.3)
+    parser.add_argument("--chunk", type=float, default=0.02)
+    parser.add_argument("--rate-limits", action="store_true", help="admit model requests with the production Scheduler")
+    args = parser.parse_args()
+
+    import engine
+    from gemini_client import FALLBACK_REPLY
+
+    model_options = {"first_token_latency": args.first_token, "chunk_latency": args.chunk, "jitter": 0.2, "seed": 1}
+    with FakeEnvironment(StageTimings(), model_options, rate_limits=args.rate_limits) as env:
+        use_fake_model(env)
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed, http_latencies, socket_latencies, stats, fallbacks = asyncio.run(run(args, FALLBACK_REPLY))
+        client_summary = engine.client.summary()
+
+    total = args.sessions * args.turns
+    single_turn = args.first_token + args.chunk * 5
+    limits = ("production rate limits (Scheduler defaults)" if args.rate_limits
+              else "no rate limits: the figures exclude GEMINI_RPM / GEMINI_USER_RPM queueing (see --rate-limits)")
+    print(f"model client: {limits}")
+    print(f"{args.sessions} sessions x {args.turns} turns, {args.workers} workers: "
+          f"{total} turns in {elapsed:.2f}s = {total / elapsed:.0f} turns/s")
+    print(f"  a single blocking loop at ~{single_turn * 1000:.0f} ms per turn manages ~{1 / single_turn:.1f} turns/s")
+    for label, latencies in (("http (one turn at a time)", http_latencies), ("websocket (pipelined)", socket_latencies)):
+        print(f"  {label:<26} p50 {percentile(latencies, 50) * 1000:7.0f} ms   p95 {percentile(latencies, 95) * 1000:7.0f} ms"
+              f"   p99 {percentile(latencies, 99) * 1000:7.0f} ms")
+    print(f"  service: {stats}, {fallbacks} fallback replies")
+    if args.rate_limits:
+        print("  " + client_summary.replace("\n", "\n  "))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# Session log write throughput, size on disk, and resume latency as transcripts grow, against
+# a plain JSONL transcript that has to be read in full to get its last messages.
+#   python -m benchmarks.bench_session_store [--messages 100000] [--tail 20]
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.harness import WORKLOAD
+from session_store import SessionLog
+
+REPLIES = [
+    "I'm here for you. That sounds really hard, and it makes sense you feel this way.",
+    "Thank you for sharing that with me. Would you like to talk about what's been on your mind?",
+    "It's completely understandable to feel overwhelmed. What has helped you cope before?",
+    "Successfully booked an appointment with Dr. Rivera at Thursday 4pm. You'll receive a confirmation email shortly.",
+]
+
+
+def synthetic_messages(count, seed):
+    rng = random.Random(seed)
+    for index in range(count):
+        if index % 2 == 0:
+            yield "user", f"{rng.choice(WORKLOAD)} ({rng.randint(1, 10 ** 6)})"
+        else:
+            yield "assistant", " ".join(rng.sample(REPLIES, rng.randint(1, 3)))
+
+
+def median_seconds(action, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        action()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def jsonl_tail(path, n):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f][-n:]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--tail", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Write throughput, with the same messages also written as plain JSONL for comparison
+        messages = list(synthetic_messages(args.messages, args.seed))
+        log = SessionLog("bench", directory, window=args.tail)
+        start = time.perf_counter()
+        for role, content in messages:
+            log.append(role, content)
+        elapsed = time.perf_counter() - start
+        log.close()
+
+        raw_path = os.path.join(directory, "bench.jsonl")
+        with open(raw_path, "w", encoding="utf-8") as f:
+            for role, content in messages:
+                f.write(json.dumps({"role": role, "content": content, "ts": 0.0}) + "\n")
+        log_bytes = os.path.getsize(os.path.join(directory, "bench.log"))
+        index_bytes = os.path.getsize(os.path.join(directory, "bench.idx"))
+        raw_bytes = os.path.getsize(raw_path)
+        print(f"append {args.messages} messages: {args.messages / elapsed:,.0f} messages/s "
+              f"({raw_bytes / elapsed / 1e6:.1f} MB/s of JSON)")
+        print(f"  log {log_bytes / 1e6:.1f} MB + index {index_bytes / 1e6:.1f} MB, "
+              f"against {raw_bytes / 1e6:.1f} MB of plain JSONL ({raw_bytes / log_bytes:.1f}x smaller log)")
+
+        # Resume latency: open the session and load its last messages, for growing transcripts
+        print(f"\nresume (open + last {args.tail} messages), median of {args.repeats}:")
+        print(f"{'messages':>10} {'session log ms':>15} {'full JSONL read ms':>19}")
+        size = 1000
+        while size <= args.messages:
+            session = f"resume-{size}"
+            log = SessionLog(session, directory)
+            for role, content in messages[:size]:
+                log.append(role, content)
+            log.close()
+            jsonl_path = os.path.join(directory, f"{session}.jsonl")
+            with open(jsonl_path, "w", encoding="utf-8") as f:
+                for role, content in messages[:size]:
+                    f.write(json.dumps({"role": role, "content": content}) + "\n")
+
+            def resume():
+                resumed = SessionLog(session, directory, window=args.tail)
+                assert len(resumed.recent) == min(args.tail, size)
+                resumed.close()
+
+            log_ms = median_seconds(resume, args.repeats) * 1000
+            jsonl_ms = median_seconds(lambda: jsonl_tail(jsonl_path, args.tail), args.repeats) * 1000
+            print(f"{size:>10,} {log_ms:>15.2f} {jsonl_ms:>19.2f}")
+            size *= 10
+
+
+if __name__ == "__main__":
+    main()
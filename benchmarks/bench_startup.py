@@ -0,0 +1,54 @@
+# Tracks CLI startup cost: module import time and time until the first "You:" prompt.
+#   python -m benchmarks.bench_startup [main|bot]
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+RUNS = 5
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child_env():
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_API_KEY", "benchmark")
+    env["PYTHONUNBUFFERED"] = "1"
+    return env
+
+
+def import_time(module):
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=child_env(),
+                            capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+# Start the CLI and wait until it prints the input prompt
+def time_to_first_prompt(module):
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, f"{module}.py"], cwd=ROOT, env=child_env(),
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    seen = b""
+    try:
+        while not seen.endswith(b"You: "):
+            byte = process.stdout.read(1)
+            if not byte:
+                raise RuntimeError(f"{module}.py exited before showing a prompt:\n{seen.decode(errors='replace')}")
+            seen += byte
+        return time.perf_counter() - start
+    finally:
+        process.kill()
+        process.wait()
+
+
+def main():
+    module = sys.argv[1] if len(sys.argv) > 1 else "main"
+    imports = [import_time(module) for _ in range(RUNS)]
+    prompts = [time_to_first_prompt(module) for _ in range(RUNS)]
+    print(f"{module}: import {statistics.median(imports) * 1000:7.1f} ms, "
+          f"first prompt {statistics.median(prompts) * 1000:7.1f} ms (median of {RUNS}, includes interpreter start)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+# Compares time-to-first-token of streamed responses against blocking calls
+import statistics
+import time
+
+from benchmarks.fake_genai import FakeModel
+from streaming import stream_generate
+
+RUNS = 20
+
+
+def bench_blocking(model):
+    samples = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        model.generate_content("Respond supportively to: 'I feel low today'").text
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_streaming(model):
+    ttft, total = [], []
+    for _ in range(RUNS):
+        result = stream_generate(model, "Respond supportively to: 'I feel low today'")
+        ttft.append(result.ttft)
+        total.append(result.total)
+    return ttft, total
+
+
+def main():
+    model = FakeModel(first_token_latency=0.05, chunk_latency=0.01)
+    blocking = bench_blocking(model)
+    ttft, total = bench_streaming(model)
+    print(f"blocking  first visible text: {statistics.median(blocking) * 1000:7.1f} ms (median of {RUNS})")
+    print(f"streaming first token:        {statistics.median(ttft) * 1000:7.1f} ms")
+    print(f"streaming full response:      {statistics.median(total) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Compares speech-to-text backends on WAV fixtures: per-utterance latency, throughput and, for
+# fixtures with a reference transcript, word error rate (WER) and exact-match accuracy.
+#   python -m benchmarks.bench_stt [--backends vosk,whisper,sphinx,google] [file.wav ...]
+import argparse
+import statistics
+import time
+
+import stt
+from benchmarks.fixtures import load_fixtures, normalize_words, word_errors
+
+RUNS = 3
+
+
+def bench_backend(name, fixtures):
+    import speech_recognition as sr
+
+    start = time.perf_counter()
+    try:
+        backend = stt.get_backend(name)
+    except Exception as e:
+        print(f"{name:<8} unavailable: {e}")
+        return
+    load_time = time.perf_counter() - start
+
+    latencies = []
+    audio_seconds = 0.0
+    failures = 0
+    transcripts = {}
+    for _ in range(RUNS):
+        for fixture, audio, _ in fixtures:
+            audio_seconds += len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+            start = time.perf_counter()
+            text = ""
+            try:
+                text = backend.transcribe(audio)
+            except sr.UnknownValueError:
+                pass
+            except sr.RequestError:
+                failures += 1
+            latencies.append(time.perf_counter() - start)
+            transcripts.setdefault(fixture, text)
+
+    busy = sum(latencies)
+    print(f"{name:<8} {'local' if backend.local else 'network':<8} load {load_time * 1000:7.0f} ms  "
+          f"p50 {statistics.median(latencies) * 1000:7.0f} ms  max {max(latencies) * 1000:7.0f} ms  "
+          f"{len(latencies) / busy:6.2f} utt/s  {audio_seconds / busy:6.1f}x realtime"
+          + (f"  ({failures} request errors)" if failures else ""))
+    report_accuracy(fixtures, transcripts)
+
+
+# Function to print a backend's word error rate over the fixtures that have a reference transcript
+def report_accuracy(fixtures, transcripts):
+    errors = words = exact = scored = 0
+    for name, _, reference in fixtures:
+        if reference is None:
+            continue
+        heard = transcripts.get(name, "")
+        wrong, total = word_errors(reference, heard)
+        errors += wrong
+        words += total
+        exact += normalize_words(reference) == normalize_words(heard)
+        scored += 1
+        print(f"           {name:<16} WER {wrong / max(total, 1):6.1%}  heard: {heard!r}")
+    if scored:
+        print(f"           accuracy: WER {errors / max(words, 1):.1%} over {words} words, "
+              f"{exact}/{scored} utterances exact")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", default="vosk,whisper,sphinx")
+    parser.add_argument("files", nargs="*")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.files)
+    print(f"{len(fixtures)} fixtures: {', '.join(name for name, _, _ in fixtures)}")
+    if not any(reference for _, _, reference in fixtures):
+        print("no reference transcripts: accuracy is not measured (record some with python -m benchmarks.fixtures)")
+    for name in args.backends.split(","):
+        bench_backend(name.strip(), fixtures)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# Post-speech recognition latency for long utterances: recognizing the whole recording once the
+# user stops, against segments cut at pauses and recognized on the worker pool while the
+# recording is still running. Audio is fed to VoiceListener in real time from WAV fixtures (or
+# speech-shaped synthetic utterances), so the recording itself takes as long as the speech.
+#   python -m benchmarks.bench_stt_segments [--backend sphinx] [--seconds 8,20,45] [file.wav ...]
+import argparse
+import array
+import os
+import random
+import time
+
+import speech_recognition as sr
+
+import stt
+from benchmarks.fixtures import SAMPLE_RATE, synthetic_utterance
+from voice_io import VoiceListener
+
+CHUNK = 1024
+ROOM_TONE_SECONDS = 0.6
+
+
+# Microphone stand-in: room tone, then the fixture, then silence, delivered at the pace of real audio
+class FixtureSource:
+    CHUNK = CHUNK
+    SAMPLE_WIDTH = 2
+
+    def __init__(self, pcm, sample_rate, speed=1.0):
+        self.SAMPLE_RATE = sample_rate
+        self.stream = self
+        self.speed = speed
+        rng = random.Random(0)
+        quiet = array.array("h", (int(rng.gauss(0, 40)) for _ in range(int(sample_rate * ROOM_TONE_SECONDS)))).tobytes()
+        self.data = quiet + quiet + pcm + quiet + quiet
+        self.position = 0
+        self.next_frame = None
+
+    def read(self, frames):
+        if self.next_frame is None:
+            self.next_frame = time.perf_counter()
+        self.next_frame += frames / self.SAMPLE_RATE / self.speed
+        delay = self.next_frame - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        chunk = self.data[self.position:self.position + frames * 2]
+        self.position += frames * 2
+        return chunk
+
+
+def fixtures(paths, lengths):
+    if paths:
+        loaded = []
+        for path in paths:
+            with sr.AudioFile(path) as source:
+                audio = sr.Recognizer().record(source)
+            loaded.append((os.path.basename(path), stt.pcm16(audio, audio.sample_rate), audio.sample_rate))
+        return loaded
+    # Continuous speech: a breath every phrase or so, shorter than the end-of-utterance silence
+    return [(f"synthetic_{seconds:g}s", synthetic_utterance(seconds, pause_every=1.5, pause_seconds=0.4, seed=int(seconds)),
+             SAMPLE_RATE) for seconds in lengths]
+
+
+def run(backend, pcm, sample_rate, speed, segmented):
+    listener = VoiceListener(FixtureSource(pcm, sample_rate, speed))
+    listener.backend = backend
+    listener.calibrate(ROOM_TONE_SECONDS)
+    transcription = stt.SegmentedTranscription(backend, sample_rate, 2) if segmented else None
+    audio = listener.record_utterance(on_segment=transcription.add if segmented else None)
+    stopped = time.perf_counter()
+    try:
+        if segmented:
+            text = transcription.text()
+        else:
+            text = backend.transcribe(sr.AudioData(audio, sample_rate, 2))
+    except sr.UnknownValueError:
+        text = ""
+    return time.perf_counter() - stopped, len(audio) / (2 * sample_rate), len(transcription) if segmented else 1, text
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", default="sphinx")
+    parser.add_argument("--seconds", default="8,20,45", help="lengths of the synthetic utterances")
+    parser.add_argument("--speed", type=float, default=1.0, help="feed audio this many times faster than real time")
+    parser.add_argument("files", nargs="*")
+    args = parser.parse_args()
+
+    try:
+        backend = stt.get_backend(args.backend)
+    except Exception as e:
+        print(f"{args.backend} unavailable: {e}")
+        return
+    start = time.perf_counter()
+    stt.prewarm_pool(backend)
+    print(f"backend {backend.name}, {stt.STT_WORKERS} workers ({'processes' if backend.holds_gil else 'threads'}, "
+          f"started in {time.perf_counter() - start:.1f} s), {os.cpu_count()} CPUs")
+    print(f"{'fixture':<18} {'speech s':>9} {'whole: after speech ms':>23} {'segmented: after speech ms':>27} {'segments':>9}")
+    for name, pcm, sample_rate in fixtures(args.files, [float(s) for s in args.seconds.split(",")]):
+        whole, seconds, _, whole_text = run(backend, pcm, sample_rate, args.speed, segmented=False)
+        segmented, _, segments, segmented_text = run(backend, pcm, sample_rate, args.speed, segmented=True)
+        print(f"{name:<18} {seconds:>9.1f} {whole * 1000:>23.0f} {segmented * 1000:>27.0f} {segments:>9}")
+        if args.files:
+            print(f"  whole:     {whole_text}\n  segmented: {segmented_text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# Tool-call turns where the model asks for several tools at once: running the calls one after
+# another against the registry's concurrent dispatch, plus a tool that overruns its timeout, and a
+# turn where the model answers a tool result with another call (look up open times, then book one).
+#   python -m benchmarks.bench_tools [--runs 10] [--tool-latency 0.2]
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("AVAILABILITY_FILE", "")  # book into an in-memory calendar
+
+import availability
+import streaming
+from benchmarks.fake_genai import FakeModel
+from tool_registry import complete_tool_turn, get_function_calls, registry, tools
+
+PROMPT = "Can I get an appointment with Dr. Lee at 3pm, and what else could help me this week?"
+CALLS = [
+    ("book_appointment", {"therapist_name": "Dr. Lee", "time_slot": "3pm"}),
+    ("find_support_groups", {"topic": "anxiety"}),
+    ("breathing_exercise", {"minutes": 5}),
+]
+FIND_SLOTS = ("find_available_slots", {"therapist_name": "Dr. Lee", "day": "tomorrow"})
+BOOK_SLOT = ("book_appointment", {"therapist_name": "Dr. Lee", "time_slot": "3pm tomorrow"})
+
+
+# Stand-in tools that take as long as a typical network lookup
+def register_demo_tools(latency):
+    @registry.tool("Find local support groups", topic="What the group is about")
+    def find_support_groups(topic: str):
+        time.sleep(latency)
+        return f"There is a {topic} support group on Wednesday evenings."
+
+    @registry.tool("Suggest a guided breathing exercise", minutes="Length of the exercise")
+    def breathing_exercise(minutes: int = 5):
+        time.sleep(latency)
+        return f"A {minutes}-minute box breathing exercise."
+
+    @registry.tool("A lookup that hangs", timeout=latency)
+    def slow_lookup():
+        time.sleep(latency * 10)
+        return "too late"
+
+
+# The old flow: run each call in turn, then send the results back (a failed call as an error, like dispatch)
+def sequential_turn(chat, function_calls):
+    import google.generativeai as genai
+
+    parts = []
+    for function_call in function_calls:
+        try:
+            response = {"result": registry.get(function_call.name)(dict(function_call.args))}
+        except Exception as e:
+            response = {"error": f"{type(e).__name__}: {e}"}
+        parts.append(genai.protos.Part(function_response=genai.protos.FunctionResponse(
+            name=function_call.name, response=response)))
+    return chat.send_message(parts, tools=tools).text
+
+
+def measure(label, finish, calls, runs, follow_up_call=None):
+    model = FakeModel(first_token_latency=0.08, chunk_latency=0.005, function_call=calls, follow_up_call=follow_up_call)
+    samples = []
+    booked = 0
+    with contextlib.redirect_stdout(io.StringIO()):  # the mock booking function prints
+        for _ in range(runs):
+            availability._engine = availability.AvailabilityEngine.load(path=None)  # the same slot is booked every run
+            start = time.perf_counter()
+            chat = model.start_chat()
+            response = chat.send_message(PROMPT, tools=tools)
+            finish(chat, get_function_calls(response))
+            samples.append(time.perf_counter() - start)
+            booked += availability.get_engine().reservations
+    print(f"{label:<40} {statistics.median(samples) * 1000:7.1f} ms/turn, {model.calls / runs:.0f} model calls/turn, "
+          f"{booked / runs:.0f} booking/turn")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--tool-latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    streaming.STREAMING_ENABLED = False
+    register_demo_tools(args.tool_latency)
+    print(f"{len(CALLS)} function calls per response, {args.tool_latency * 1000:.0f} ms per lookup tool")
+    measure("sequential", sequential_turn, CALLS, args.runs)
+    measure("registry dispatch (concurrent)", complete_tool_turn, CALLS, args.runs)
+    measure("registry dispatch, one tool times out", complete_tool_turn, CALLS + [("slow_lookup", {})], args.runs)
+    measure("find slots, then book (two tool turns)", complete_tool_turn, FIND_SLOTS, args.runs, follow_up_call=BOOK_SLOT)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# Measures the per-span cost of tracing when it is off and when spans go to the registry and a JSONL file.
+import json
+import os
+import tempfile
+import time
+
+import tracing
+
+SPANS = 100000
+
+
+def per_span():
+    start = time.perf_counter()
+    with tracing.turn(mode="bench"):
+        for _ in range(SPANS):
+            with tracing.span("bench.stage"):
+                pass
+    return (time.perf_counter() - start) / SPANS
+
+
+def main():
+    tracing.TRACE_ENABLED = False
+    print(f"disabled:          {per_span() * 1e9:8.0f} ns per span")
+
+    tracing.TRACE_ENABLED = True
+    print(f"registry only:     {per_span() * 1e9:8.0f} ns per span")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "trace.jsonl")
+        tracing._sink = tracing.JsonlSink(path)
+        print(f"registry + JSONL:  {per_span() * 1e9:8.0f} ns per span")
+        tracing._sink.close()
+        with open(path) as trace:
+            records = [json.loads(line) for line in trace]
+    turn_ids = {record["turn_id"] for record in records}
+    print(f"{len(records)} records written across {len(turn_ids)} turn(s)")
+    print(tracing.metrics.summary())
+
+
+if __name__ == "__main__":
+    main()
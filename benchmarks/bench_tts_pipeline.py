@@ -0,0 +1,53 @@
+# Measures time-to-first-audio for sentence-pipelined speech against whole-reply synthesis.
+# gTTS and the audio player are replaced with sleeps proportional to text length.
+import time
+
+import voice_io
+from playback import AudioPlayer
+
+REPLY = (
+    "I'm really glad you reached out and shared this with me. "
+    "It sounds like the past few weeks have been heavy, and feeling worn down makes a lot of sense. "
+    "You don't have to sort everything out at once. "
+    "Would it help to talk through what has been weighing on you the most? "
+    "If you'd like, I can also help you book a session with one of our therapists."
+)
+
+SYNTH_SECONDS_PER_CHAR = 0.0008
+PLAY_SECONDS_PER_CHAR = 0.0015
+
+
+def fake_synthesize(text, lang='en'):
+    time.sleep(len(text) * SYNTH_SECONDS_PER_CHAR)
+    return text.encode()
+
+
+def main():
+    first_audio = []
+
+    def fake_play(audio, stop=None):
+        if not first_audio:
+            first_audio.append(time.perf_counter())
+        time.sleep(len(audio) * PLAY_SECONDS_PER_CHAR)
+
+    voice_io.synthesize = fake_synthesize
+    voice_io.play_audio = fake_play
+    voice_io.player = AudioPlayer("external", fallback=fake_play)
+
+    # Whole reply synthesized before anything plays
+    start = time.perf_counter()
+    fake_play(fake_synthesize(REPLY))
+    whole_first, whole_total = first_audio[0] - start, time.perf_counter() - start
+
+    first_audio.clear()
+    start = time.perf_counter()
+    voice_io.speak_response(REPLY)
+    piped_first, piped_total = first_audio[0] - start, time.perf_counter() - start
+
+    print(f"sentences: {len(voice_io.split_sentences(REPLY))}")
+    print(f"whole reply  first audio {whole_first * 1000:6.0f} ms, finished {whole_total * 1000:6.0f} ms")
+    print(f"pipelined    first audio {piped_first * 1000:6.0f} ms, finished {piped_total * 1000:6.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# Local stand-in for google.generativeai models, used by the benchmarks
+import random
+import threading
+import time
+from collections import deque
+
+
+class FakeFunctionCall:
+    def __init__(self, name="", args=None):
+        self.name = name
+        self.args = args or {}
+
+
+class FakePart:
+    def __init__(self, text="", function_call=None):
+        self.text = text
+        self.function_call = function_call or FakeFunctionCall()
+
+
+class FakeContent:
+    def __init__(self, parts):
+        self.parts = parts
+
+
+class FakeCandidate:
+    def __init__(self, parts):
+        self.content = FakeContent(parts)
+
+
+# Mimics a transient google.api_core error (503 Service Unavailable)
+class FakeServiceError(Exception):
+    code = 503
+
+
+# Mimics google.api_core's 429 ResourceExhausted (quota exceeded)
+class FakeQuotaError(Exception):
+    code = 429
+
+
+# Mimics the SDK's IncompleteIterationError: a chat's history is only final once its last stream has been read to the end
+class FakeIncompleteIterationError(Exception):
+    pass
+
+
+# Mimics GenerateContentResponse (and its streamed chunks)
+class FakeResponse:
+    def __init__(self, parts):
+        self.candidates = [FakeCandidate(parts)]
+
+    @property
+    def text(self):
+        return "".join(part.text for part in self.candidates[0].content.parts)
+
+
+# Fake GenerativeModel with configurable latency and tool-call behaviour.
+#   first_token_latency - seconds before the first chunk is produced
+#   chunk_latency       - seconds between subsequent chunks
+#   function_call       - (name, args), or a list of them, returned instead of text when tool_trigger appears in the prompt
+#   follow_up_call      - (name, args), or a list of them, returned (once per chat) in answer to a function response
+#                         when tools are offered, e.g. book_appointment after find_available_slots
+#   jitter              - sigma of a log-normal factor applied to every delay (0 = fixed latency)
+#   slow_rate           - share of calls whose first chunk takes slow_latency instead
+#   failure_rate        - share of calls that raise FakeServiceError before the first chunk
+#   break_rate          - share of streams that raise FakeServiceError after their first chunk
+#   quota               - (requests, window_seconds): calls beyond it raise FakeQuotaError, like the API's rate limit
+class FakeModel:
+    def __init__(self, reply="I'm here for you. That sounds really hard, and it makes sense you feel this way.",
+                 first_token_latency=0.3, chunk_latency=0.02, chunk_words=3, function_call=None, tool_trigger="appointment with",
+                 jitter=0.0, seed=None, slow_rate=0.0, slow_latency=5.0, failure_rate=0.0, quota=None, follow_up_call=None,
+                 break_rate=0.0):
+        self.reply = reply
+        self.first_token_latency = first_token_latency
+        self.chunk_latency = chunk_latency
+        self.chunk_words = chunk_words
+        self.function_call = function_call
+        self.follow_up_call = follow_up_call
+        self.tool_trigger = tool_trigger
+        self.jitter = jitter
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.failure_rate = failure_rate
+        self.break_rate = break_rate
+        self.quota = quota
+        self.recent_calls = deque()
+        self.quota_errors = 0
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def _sleep(self, seconds):
+        if self.jitter:
+            with self.lock:
+                seconds *= self.random.lognormvariate(0, self.jitter)
+        time.sleep(seconds)
+
+    def _wants_tool(self, prompt, tools):
+        return bool(tools) and self.function_call is not None and self.tool_trigger in str(prompt).lower()
+
+    def _chunks(self):
+        words = self.reply.split(" ")
+        for i in range(0, len(words), self.chunk_words):
+            text = " ".join(words[i:i + self.chunk_words])
+            if i + self.chunk_words < len(words):
+                text += " "
+            yield text
+
+    def _stream(self, prompt, tools, function_call=None):
+        with self.lock:
+            slow = self.random.random() < self.slow_rate
+            failed = self.random.random() < self.failure_rate
+            breaks = self.random.random() < self.break_rate
+        self._sleep(self.slow_latency if slow else self.first_token_latency)
+        if failed:
+            raise FakeServiceError("503 The service is currently unavailable.")
+        if function_call is None and self._wants_tool(prompt, tools):
+            function_call = self.function_call
+        if function_call is not None:
+            calls = function_call if isinstance(function_call, list) else [function_call]
+            yield FakeResponse([FakePart(function_call=FakeFunctionCall(name, args)) for name, args in calls])
+            yield FakeResponse([])  # the API ends the stream with a chunk carrying only the finish reason
+            return
+        for i, text in enumerate(self._chunks()):
+            if i:
+                self._sleep(self.chunk_latency)
+                if breaks:
+                    raise FakeServiceError("503 The service is currently unavailable.")
+            yield FakeResponse([FakePart(text=text)])
+
+    def start_chat(self, history=None, **kwargs):
+        return FakeChat(self, history)
+
+    def _check_quota(self):
+        if self.quota is None:
+            return
+        limit, window = self.quota
+        now = time.monotonic()
+        with self.lock:
+            while self.recent_calls and now - self.recent_calls[0] >= window:
+                self.recent_calls.popleft()
+            if len(self.recent_calls) >= limit:
+                self.quota_errors += 1
+                raise FakeQuotaError("429 Resource has been exhausted (e.g. check quota).")
+            self.recent_calls.append(now)
+
+    # function_call (not in the SDK) makes this response call the given function(s) whatever the prompt
+    def generate_content(self, prompt, stream=False, tools=None, generation_config=None, function_call=None, **kwargs):
+        with self.lock:
+            self.calls += 1
+        self._check_quota()
+        chunks = self._stream(prompt, tools, function_call)
+        if stream:
+            return chunks
+        parts = []
+        for chunk in chunks:
+            parts.extend(chunk.candidates[0].content.parts)
+        return FakeResponse(parts)
+
+
+# Function to tell whether a chat message carries function responses rather than user text
+def _is_function_response(message):
+    parts = message if isinstance(message, list) else [message]
+    return any(getattr(part, "function_response", None) for part in parts)
+
+
+# Mimics ChatSession: each message is answered by the owning FakeModel
+class FakeChat:
+    def __init__(self, model, history=None):
+        self.model = model
+        self._history = list(history or [])
+        self.streaming = False
+        self.followed_up = False
+
+    @property
+    def history(self):
+        if self.streaming:
+            raise FakeIncompleteIterationError("Please let the response complete iteration before accessing the final accumulated attributes.")
+        return self._history
+
+    def _track(self, chunks):
+        self.streaming = True
+        yield from chunks
+        self.streaming = False
+
+    def send_message(self, message, stream=False, tools=None, generation_config=None, tool_config=None, **kwargs):
+        self.history.append(message)
+        if tool_config and tool_config["function_calling_config"]["mode"] == "NONE":
+            tools = None
+        function_call = None
+        if _is_function_response(message):
+            # The model answers a tool result with text, or once with the follow-up call
+            if tools and self.model.follow_up_call is not None and not self.followed_up:
+                self.followed_up = True
+                function_call = self.model.follow_up_call
+            else:
+                tools = None
+        response = self.model.generate_content(message, stream=stream, tools=tools, generation_config=generation_config,
+                                               function_call=function_call)
+        return self._track(response) if stream else response
@@ -0,0 +1,151 @@
+# Audio fixtures for the speech benchmarks.
+# Recorded WAV files can be dropped into benchmarks/fixtures/ (or passed on the command line), each
+# with its reference transcript in a .txt file of the same name; when there are none, speech-shaped
+# synthetic utterances (with no transcript) are generated instead.
+#   python -m benchmarks.fixtures [--record]   (gTTS needs network access and ffmpeg; --record reads PHRASES from the microphone)
+import argparse
+import array
+import glob
+import io
+import math
+import os
+import random
+import re
+import wave
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+SAMPLE_RATE = 16000
+
+# Short utterances in the register users actually speak to Cotton, recorded as phrase_00.wav, ...
+PHRASES = [
+    "I have been feeling really anxious about work lately.",
+    "I can't sleep and my mind keeps racing at night.",
+    "Can you book me an appointment with Doctor Lee at three pm tomorrow?",
+    "What times are free on Friday?",
+    "Some days I feel fine and then out of nowhere everything seems too heavy, and I don't know who to talk to about it.",
+]
+
+
+# Function to build a speech-shaped utterance: voiced "syllables" separated by short gaps,
+# with longer pauses between phrases. Returns 16-bit mono PCM bytes.
+def synthetic_utterance(seconds, pause_every=2.5, pause_seconds=0.7, seed=0):
+    rng = random.Random(seed)
+    samples = array.array("h")
+    elapsed = 0.0
+    since_pause = 0.0
+    while elapsed < seconds:
+        if since_pause >= pause_every:
+            length = pause_seconds
+            since_pause = 0.0
+            samples.extend(int(rng.gauss(0, 40)) for _ in range(int(length * SAMPLE_RATE)))
+        else:
+            length = rng.uniform(0.15, 0.3)
+            pitch = rng.uniform(110, 220)
+            n = int(length * SAMPLE_RATE)
+            for i in range(n):
+                envelope = math.sin(math.pi * i / n)
+                t = i / SAMPLE_RATE
+                value = sum(math.sin(2 * math.pi * pitch * k * t) / k for k in (1, 2, 3))
+                samples.append(int(6000 * envelope * value + rng.gauss(0, 40)))
+            gap = rng.uniform(0.03, 0.08)
+            samples.extend(int(rng.gauss(0, 40)) for _ in range(int(gap * SAMPLE_RATE)))
+            length += gap
+            since_pause += length
+        elapsed += length
+    return samples.tobytes()
+
+
+# Function to wrap 16-bit mono PCM in a WAV container
+def to_wav(pcm, sample_rate=SAMPLE_RATE):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+# Function to read a fixture's reference transcript (the .txt next to the .wav), or None
+def reference_transcript(path):
+    try:
+        with open(os.path.splitext(path)[0] + ".txt", encoding="utf-8") as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+# Function to load fixtures as (name, sr.AudioData, reference transcript or None) triples
+def load_fixtures(paths=None, synthetic_seconds=(3, 8, 20)):
+    import speech_recognition as sr
+
+    if not paths:
+        paths = sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.wav")))
+    fixtures = []
+    for path in paths:
+        with sr.AudioFile(path) as source:
+            fixtures.append((os.path.basename(path), sr.Recognizer().record(source), reference_transcript(path)))
+    if not fixtures:
+        for seconds in synthetic_seconds:
+            fixtures.append((f"synthetic_{seconds}s", sr.AudioData(synthetic_utterance(seconds, seed=seconds), SAMPLE_RATE, 2), None))
+    return fixtures
+
+
+# Function to split a transcript into comparable words: lower case, no punctuation
+def normalize_words(text):
+    return re.sub(r"[^a-z0-9' ]+", " ", text.lower()).split()
+
+
+# Function to count word substitutions, insertions and deletions between a reference and a transcript
+def word_errors(reference, hypothesis):
+    reference, hypothesis = normalize_words(reference), normalize_words(hypothesis)
+    previous = list(range(len(hypothesis) + 1))
+    for i, word in enumerate(reference, 1):
+        current = [i]
+        for j, heard in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (word != heard)))
+        previous = current
+    return previous[-1], len(reference)
+
+
+# Function to write one fixture: 16 kHz mono WAV plus its reference transcript
+def write_fixture(directory, name, pcm, transcript):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"{name}.wav"), "wb") as file:
+        file.write(to_wav(pcm))
+    with open(os.path.join(directory, f"{name}.txt"), "w", encoding="utf-8") as file:
+        file.write(transcript + "\n")
+
+
+# Function to record gTTS speech into WAV fixtures (needs network access and ffmpeg)
+def make_speech_fixtures(phrases, directory=FIXTURE_DIR):
+    from gtts import gTTS
+    from pydub import AudioSegment
+
+    for i, phrase in enumerate(phrases):
+        buffer = io.BytesIO()
+        gTTS(text=phrase, lang="en").write_to_fp(buffer)
+        buffer.seek(0)
+        segment = AudioSegment.from_file(buffer, format="mp3").set_frame_rate(SAMPLE_RATE).set_channels(1).set_sample_width(2)
+        write_fixture(directory, f"phrase_{i:02d}", segment.raw_data, phrase)
+
+
+# Function to record each phrase read aloud from the microphone into WAV fixtures
+def record_speech_fixtures(phrases, directory=FIXTURE_DIR):
+    import speech_recognition as sr
+    from stt import pcm16
+
+    recognizer = sr.Recognizer()
+    with sr.Microphone(sample_rate=SAMPLE_RATE) as source:
+        recognizer.adjust_for_ambient_noise(source, duration=1)
+        for i, phrase in enumerate(phrases):
+            input(f"Press Enter, then read aloud: {phrase}")
+            audio = recognizer.listen(source, timeout=10, phrase_time_limit=20)
+            write_fixture(directory, f"phrase_{i:02d}", pcm16(audio, SAMPLE_RATE), phrase)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--record", action="store_true", help="record the phrases from the microphone instead of gTTS")
+    args = parser.parse_args()
+    (record_speech_fixtures if args.record else make_speech_fixtures)(PHRASES)
@@ -0,0 +1,352 @@
+# End-to-end latency harness that runs entirely offline.
+# genai.GenerativeModel is swapped for a local fake with configurable latency, streaming and
+# function-call behaviour; gTTS and audio playback are stubbed with timed sleeps. The harness
+# then drives generate_empathetic_response, handle_tool_calls and the CLI / Streamlit turn loops
+# under a repeatable workload and reports p50/p95/p99 per stage. Model requests are not rate
+# limited unless --rate-limits is given.
+#   python -m benchmarks.harness [--turns 30] [--targets generate,tools,cli,voice,streamlit] [--rate-limits]
+import argparse
+import builtins
+import contextlib
+import io
+import os
+import random
+import sys
+import threading
+import time
+import types
+from collections import defaultdict
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("SESSION_DIR", "")  # keep benchmark transcripts in memory
+os.environ.setdefault("AVAILABILITY_FILE", "")  # and bookings
+
+from benchmarks.fake_genai import FakeFunctionCall, FakeModel, FakePart, FakeResponse
+from gemini_client import GeminiClient
+from playback import AudioPlayer
+from startup import LazyModel
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Repeatable workload: supportive chat, model-driven bookings, locally routed bookings, greetings
+WORKLOAD = [
+    "I've been feeling really anxious about work lately.",
+    "My sister and I had another argument last night.",
+    "I didn't sleep well again and I feel drained.",
+    "Could you help me get an appointment with a therapist this week?",
+    "Sometimes I feel like nobody really listens to me.",
+    "book me with Dr. Lee at 3pm tomorrow",
+    "hello!",
+    "Today was actually a bit better than yesterday.",
+    "I'd like an appointment with someone who understands grief.",
+    "I keep overthinking everything I say at work.",
+]
+
+BOOKING_CALL = ("book_appointment", {"therapist_name": "Dr. Rivera", "time_slot": "Thursday 4pm"})
+
+
+# Function to read a percentile from sorted samples (nearest rank)
+def percentile(sorted_samples, q):
+    if not sorted_samples:
+        return 0.0
+    index = max(int(round(q / 100 * len(sorted_samples) + 0.5)) - 1, 0)
+    return sorted_samples[min(index, len(sorted_samples) - 1)]
+
+
+# Collects latency samples per stage
+class StageTimings:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self.lock:
+            self.samples[stage].append(seconds)
+
+    @contextlib.contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def summary(self, stage):
+        with self.lock:
+            samples = sorted(self.samples[stage])
+        return {
+            "count": len(samples),
+            "p50": percentile(samples, 50),
+            "p95": percentile(samples, 95),
+            "p99": percentile(samples, 99),
+            "mean": sum(samples) / len(samples) if samples else 0.0,
+        }
+
+    def report(self, title):
+        print(f"\n== {title} ==")
+        print(f"{'stage':<28} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'mean ms':>9}")
+        for stage in sorted(self.samples):
+            row = self.summary(stage)
+            print(f"{stage:<28} {row['count']:>5} {row['p50'] * 1000:>9.1f} {row['p95'] * 1000:>9.1f} "
+                  f"{row['p99'] * 1000:>9.1f} {row['mean'] * 1000:>9.1f}")
+
+
+# FakeModel that reports model.call and model.first_token timings
+class TimedFakeModel(FakeModel):
+    def __init__(self, timings, **kwargs):
+        super().__init__(**kwargs)
+        self.timings = timings
+
+    def _timed_stream(self, chunks, start):
+        first = True
+        try:
+            for chunk in chunks:
+                if first:
+                    self.timings.add("model.first_token", time.perf_counter() - start)
+                    first = False
+                yield chunk
+        finally:
+            self.timings.add("model.call", time.perf_counter() - start)
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        start = time.perf_counter()
+        response = super().generate_content(prompt, stream=stream, **kwargs)
+        if stream:
+            return self._timed_stream(response, start)
+        self.timings.add("model.call", time.perf_counter() - start)
+        return response
+
+
+# gTTS stand-in: "synthesizes" by sleeping in proportion to the text length
+def make_fake_tts(timings, seconds_per_char):
+    class FakeTTS:
+        def __init__(self, text, lang="en", **kwargs):
+            self.text = text
+
+        def write_to_fp(self, fp):
+            with timings.time("tts.synthesis"):
+                time.sleep(len(self.text) * seconds_per_char)
+                fp.write(self.text.encode("utf-8"))
+
+    return FakeTTS
+
+
+# Swaps the real model, TTS and playback for fakes while active
+class FakeEnvironment:
+    def __init__(self, timings, model_options=None, tts_seconds_per_char=0.0005,
+                 playback_seconds_per_char=0.001, tts_cache=False, rate_limits=False):
+        self.timings = timings
+        self.rate_limits = rate_limits
+        self.model_options = dict(model_options or {})
+        self.tts_seconds_per_char = tts_seconds_per_char
+        self.playback_seconds_per_char = playback_seconds_per_char
+        self.tts_cache = tts_cache
+        self.patches = []
+
+    def _patch(self, target, name, value):
+        self.patches.append((target, name, getattr(target, name, None)))
+        setattr(target, name, value)
+
+    def make_model(self, *args, **kwargs):
+        return TimedFakeModel(self.timings, **self.model_options)
+
+    def __enter__(self):
+        try:
+            import google.generativeai as genai
+        except ImportError:
+            genai = types.ModuleType("google.generativeai")
+            sys.modules.setdefault("google", types.ModuleType("google"))
+            sys.modules["google.generativeai"] = genai
+        try:
+            import gtts
+        except ImportError:
+            gtts = types.ModuleType("gtts")
+            sys.modules["gtts"] = gtts
+
+        import availability
+        import booking
+        import intent_router
+        import voice_io
+        from tts_cache import TTSCache
+
+        self._patch(genai, "configure", lambda **kwargs: None)
+        self._patch(genai, "GenerativeModel", self.make_model)
+        self._patch(gtts, "gTTS", make_fake_tts(self.timings, self.tts_seconds_per_char))
+
+        def play_audio(audio, stop=None):
+            with self.timings.time("playback"):
+                seconds = len(audio) * self.playback_seconds_per_char
+                stop.wait(seconds) if stop is not None else time.sleep(seconds)
+
+        self._patch(voice_io, "play_audio", play_audio)
+        # Never open a real audio device: every segment goes to the stubbed external player
+        self._patch(voice_io, "player", AudioPlayer("external", fallback=voice_io.player.fallback))
+        if not self.tts_cache:
+            self._patch(voice_io, "tts_cache", TTSCache(cache_dir=None, memory_limit=0))
+
+        original_book = booking.book_appointment
+
+        # The workload books the same few slots over and over, so each booking gets a fresh calendar
+        def book_appointment(therapist_name, time_slot):
+            availability._engine = availability.AvailabilityEngine.load(path=None)
+            with self.timings.time("tool.book_appointment"):
+                return original_book(therapist_name, time_slot)
+
+        self._patch(booking, "book_appointment", book_appointment)
+        self._patch(booking.registry.get("book_appointment"), "function", book_appointment)
+        self._patch(intent_router, "book_appointment", book_appointment)
+        self._patch(availability, "_engine", availability._engine)
+        return self
+
+    def __exit__(self, *exc):
+        for target, name, value in reversed(self.patches):
+            setattr(target, name, value)
+        self.patches = []
+
+
+# Function to build the workload for a run
+def workload(turns, seed):
+    rng = random.Random(seed)
+    return [rng.choice(WORKLOAD) for _ in range(turns)]
+
+
+# Function to give the engine a model (and client) built inside the fake environment.
+# Without rate limits (the environment's default) the client has no Scheduler, so the numbers leave
+# out GEMINI_RPM / GEMINI_USER_RPM queueing; with them, a Scheduler with the production defaults admits requests.
+def use_fake_model(env, rate_limits=None):
+    import engine
+    from scheduler import Scheduler
+
+    scheduler = Scheduler() if (env.rate_limits if rate_limits is None else rate_limits) else None
+    env._patch(engine, "model", LazyModel(engine.load_model))
+    env._patch(engine, "client", GeminiClient(engine.model, scheduler=scheduler, system_tokens=engine.client.system_tokens))
+    env._patch(engine, "summary_model", LazyModel(engine.load_model))
+    env._patch(engine, "summary_client", GeminiClient(engine.summary_model, scheduler=scheduler, breaker=engine.client.breaker,
+                                                      system_tokens=engine.summary_client.system_tokens))
+
+
+# Drives generate_empathetic_response directly, with conversation memory
+def drive_generate(env, messages):
+    import engine
+    from memory import ConversationMemory
+
+    use_fake_model(env)
+    memory = ConversationMemory(summarize=engine.summarizer())
+    for message in messages:
+        with env.timings.time("turn.generate"):
+            engine.generate_empathetic_response(message, memory=memory)
+
+
+# Drives booking.handle_tool_calls and complete_tool_turn on model-shaped responses
+def drive_tools(env, messages):
+    import booking
+
+    model = env.make_model()
+    for _ in messages:
+        response = FakeResponse([FakePart(function_call=FakeFunctionCall(*BOOKING_CALL))])
+        with env.timings.time("turn.handle_tool_calls"):
+            booking.handle_tool_calls(response, "prompt")
+        chat = model.start_chat()
+        with env.timings.time("turn.complete_tool_turn"):
+            booking.complete_tool_turn(chat, booking.get_function_calls(response))
+
+
+# Drives main.main() in text mode with scripted input
+def drive_cli(env, messages):
+    import main
+
+    use_fake_model(env)
+    script = iter(list(messages) + ["exit"])
+    last = [None]
+
+    def scripted_input(prompt=""):
+        now = time.perf_counter()
+        if last[0] is not None:
+            env.timings.add("turn.cli", now - last[0])
+        last[0] = now
+        return next(script)
+
+    env._patch(builtins, "input", scripted_input)
+    main.main()
+
+
+# Drives main.main() in voice mode with a fake listener standing in for the microphone
+def drive_voice(env, messages, stt_seconds=0.15):
+    import main
+
+    use_fake_model(env)
+    spoken = iter(list(messages) + ["exit"])
+    last = [None]
+
+    class FakeListener:
+        def listen(self, barge_in=False):
+            now = time.perf_counter()
+            if last[0] is not None:
+                env.timings.add("turn.voice", now - last[0])
+            with env.timings.time("stt"):
+                time.sleep(stt_seconds)
+            last[0] = time.perf_counter()
+            return next(spoken)
+
+    env._patch(builtins, "input", lambda prompt="": "voice")
+    env._patch(main, "get_listener", FakeListener)
+    main.main()
+
+
+# Drives the Streamlit script through streamlit's AppTest, one rerun per message
+def drive_streamlit(env, messages, voice_output=True):
+    from streamlit.testing.v1 import AppTest
+
+    use_fake_model(env)
+    app = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+    app.run()
+    if voice_output:
+        app.sidebar.checkbox[0].check().run()
+    for message in messages:
+        with env.timings.time("turn.streamlit"):
+            app.chat_input[0].set_value(message).run()
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+
+
+DRIVERS = {
+    "generate": drive_generate,
+    "tools": drive_tools,
+    "cli": drive_cli,
+    "voice": drive_voice,
+    "streamlit": drive_streamlit,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--targets", default="generate,tools,cli,voice,streamlit")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--first-token", type=float, default=0.12, help="fake model time to first chunk (s)")
+    parser.add_argument("--chunk", type=float, default=0.01, help="fake model time between chunks (s)")
+    parser.add_argument("--jitter", type=float, default=0.3, help="log-normal sigma applied to fake latencies")
+    parser.add_argument("--rate-limits", action="store_true", help="admit model requests with the production Scheduler")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    messages = workload(args.turns, args.seed)
+    model_options = {
+        "first_token_latency": args.first_token,
+        "chunk_latency": args.chunk,
+        "function_call": BOOKING_CALL,
+        "jitter": args.jitter,
+        "seed": args.seed,
+    }
+    print("model requests: " + ("production rate limits (Scheduler defaults)" if args.rate_limits
+                                else "no rate limits (GEMINI_RPM / GEMINI_USER_RPM queueing excluded; see --rate-limits)"))
+    for target in args.targets.split(","):
+        timings = StageTimings()
+        with FakeEnvironment(timings, model_options, rate_limits=args.rate_limits) as env:
+            with contextlib.redirect_stdout(io.StringIO()):
+                DRIVERS[target.strip()](env, messages)
+        timings.report(f"{target} ({args.turns} turns)")
+
+
+if __name__ == "__main__":
+    main()
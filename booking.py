@@ -1,60 +1,72 @@
-# Function calling for appointment booking
+# Appointment booking tool
 
-# Define the tool schema for appointment booking
-import google.generativeai as genai
+import contextlib
+import contextvars
+import os
+from availability import BookingError, format_slot, get_engine
+from tool_registry import registry, tools, get_function_calls, complete_tool_turn
 
-tools = [
-    {
-        "function_declarations": [
-            {
-                "name": "book_appointment",
-                "description": "Book a therapy appointment",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "therapist_name": {"type": "string", "description": "Name of the therapist"},
-                        "time_slot": {"type": "string", "description": "Time slot for the appointment"}
-                    },
-                    "required": ["therapist_name", "time_slot"]
-                }
-            }
-        ]
-    }
-]
+# Build the booking confirmation locally instead of asking the model for a second reply
+BOOKING_FAST_PATH = os.environ.get("BOOKING_FAST_PATH", "0").lower() in ("1", "true", "yes")
 
-# Mock function for booking appointments
-def book_appointment(therapist_name, time_slot):
+# Bookings made in the current context, collected by track_bookings()
+_booked = contextvars.ContextVar("booked", default=None)
+
+# Context manager that collects every booking made inside it (used by batch replay)
+@contextlib.contextmanager
+def track_bookings():
+    booked = []
+    token = _booked.set(booked)
+    try:
+        yield booked
+    finally:
+        _booked.reset(token)
+
+# Function to build the confirmation message without another model call
+def format_booking_confirmation(booking_result):
+    return f"{booking_result} I'm really glad you're reaching out for support. Is there anything you'd like to talk about before your session?"
+
+# With BOOKING_FAST_PATH, a successful booking is confirmed locally and the model is not asked again
+def fast_path_confirmation(booking_result):
+    return format_booking_confirmation(booking_result) if BOOKING_FAST_PATH else None
+
+# Function to book an appointment in the availability engine; raises BookingError (a ValueError)
+# when the therapist or time is unknown or the slot is taken, which is reported back to the model.
+# A reservation cannot be taken back, so a slow booking is waited for rather than reported as failed.
+@registry.tool("Book a therapy appointment", local_reply=fast_path_confirmation, abandonable=False,
+               therapist_name="Name of the therapist", time_slot="Time slot for the appointment")
+def book_appointment(therapist_name: str, time_slot: str):
     print(f"Booking appointment with {therapist_name} at {time_slot}")
+    therapist_name, start = get_engine().reserve(therapist_name, time_slot)
+    time_slot = format_slot(start)
+    booked = _booked.get()
+    if booked is not None:
+        booked.append({"therapist_name": therapist_name, "time_slot": time_slot})
     return f"Successfully booked an appointment with {therapist_name} at {time_slot}. You'll receive a confirmation email shortly."
 
-# Function to handle tool calls in the response
+# Function to list open appointment times, optionally for one therapist and/or day
+@registry.tool("Find open therapy appointment times",
+               therapist_name="Name of the therapist; leave empty to search every therapist",
+               day="Day or time to search from, e.g. 'Thursday' or 'tomorrow afternoon'",
+               limit="Maximum number of times to return")
+def find_available_slots(therapist_name: str = "", day: str = "", limit: int = 5):
+    slots = get_engine().find(therapist_name or None, day or None, limit=max(1, min(int(limit), 20)))
+    if not slots:
+        return "There are no open appointment times then."
+    return "Open appointment times: " + "; ".join(f"{name}, {format_slot(start)}" for name, start in slots) + "."
+
+# Function to handle tool calls in the response: runs every call and returns the successful
+# results joined together (None if there were none)
 def handle_tool_calls(response, prompt):
-    if hasattr(response, 'candidates') and len(response.candidates) > 0:
-        candidate = response.candidates[0]
-        if hasattr(candidate, 'content') and hasattr(candidate.content, 'parts'):
-            for part in candidate.content.parts:
-                if hasattr(part, 'function_call'):
-                    # Extract function call parameters
-                    function_name = part.function_call.name
-                    if function_name == "book_appointment":
-                        args = part.function_call.args
-                        therapist_name = args.get("therapist_name", "")
-                        time_slot = args.get("time_slot", "")
-                        
-                        # Call the booking function
-                        result = book_appointment(therapist_name, time_slot)
-                        
-                        # Return the booking confirmation
-                        return result
-    
-    # If no tool call, return None
-    return None
+    results = [result.value for result in registry.dispatch(get_function_calls(response)) if result.ok and result.value]
+    return " ".join(str(value) for value in results) or None
 
 # Test function
 def test_booking():
     import google.generativeai as genai
     import os
     from dotenv import load_dotenv
+    from gemini_client import GeminiClient
     
     # Load environment variables from .env file
     load_dotenv()
@@ -71,7 +83,7 @@ def test_booking():
     genai.configure(api_key=api_key)
     
     # Initialize the model - use the flagship model
-    model = genai.GenerativeModel('gemini-1.5-flash-8b-latest')
+    model = GeminiClient(genai.GenerativeModel('gemini-1.5-flash-8b-latest'))
     
     # Test booking functionality
     print("=== Testing Appointment Booking ===\n")
@@ -0,0 +1,164 @@
+# Response engine shared by the CLI (main.py, bot.py), the Streamlit app, the service and replay.
+# Everything that is the same on every turn is built once per process: the persona is the model's
+# system instruction, the generation settings are one read-only mapping, the tool schemas are
+# compiled once into the library the SDK would otherwise rebuild on every request, and the model
+# is configured lazily (on first use, or in the background after model.start()). Each request
+# then carries only the conversation context and the user's words.
+import os
+from functools import lru_cache, partial
+from types import MappingProxyType
+from tool_registry import tools as tool_declarations, get_function_calls, get_response_text, complete_tool_turn
+from streaming import STREAMING_ENABLED, stream_chat
+from intent_router import local_reply
+from startup import LazyModel
+from gemini_client import GeminiClient, ModelUnavailable, FALLBACK_REPLY
+from scheduler import BACKGROUND, Scheduler, priority_for
+from memory import estimate_tokens, make_summarizer
+import tracing
+from dotenv import load_dotenv
+
+DEFAULT_MODEL_NAME = "gemini-1.5-flash-8b-latest"
+MISSING_API_KEY = "GOOGLE_API_KEY environment variable not set. Please add it to your .env file in the project directory."
+
+# Cotton's persona, sent as the model's system instruction instead of being pasted into every prompt
+PERSONA = (
+    "You're an empathetic therapist named Cotton. Respond supportively to what the user says. "
+    "Be warm, understanding, and compassionate. Use a conversational tone and keep responses concise. "
+    "If the user expresses interest in booking a session with a human therapist, offer to help them book an appointment."
+)
+
+# The conversation summarizer's system instruction: a neutral note-taker rather than Cotton
+SUMMARY_INSTRUCTION = "You keep accurate, neutral notes of a conversation. Reply with the updated summary only."
+
+# Shared by every reply request; read-only so no caller can change it for the others
+GENERATION_CONFIG = MappingProxyType({
+    "temperature": 0.7,
+    "max_output_tokens": 1024
+})
+
+# Load environment variables from .env file once per process
+load_dotenv()
+api_key = os.environ.get("GOOGLE_API_KEY", "").strip("'\"")  # remove quotes if they exist in the API key
+model_name = os.environ.get("MODEL_NAME", DEFAULT_MODEL_NAME)
+
+
+# Function to configure the API and build the model (the first use, or model.start(), runs it on a background thread)
+def load_model(system_instruction=PERSONA):
+    import google.generativeai as genai
+
+    if not api_key:
+        raise ValueError(MISSING_API_KEY)
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name, system_instruction=system_instruction)
+
+
+# Function to compile the tool schemas once, after every tool has registered at import.
+# Without the SDK's converter (e.g. a stubbed google.generativeai) the declarations go as they are.
+@lru_cache(maxsize=None)
+def compiled_tools():
+    try:
+        from google.generativeai.types.content_types import to_function_library
+    except ImportError:
+        return tool_declarations
+    return to_function_library(tool_declarations)
+
+
+# The one model per process; attribute access waits for load_model
+model = LazyModel(load_model)
+
+# Deadlines, hedged requests, retries, circuit breaking and rate limiting for every model request.
+# The persona goes with every request, so it counts towards each request's tokens.
+client = GeminiClient(model, scheduler=Scheduler(), system_tokens=estimate_tokens(PERSONA))
+
+# Conversation summaries come from the same model without the persona. Its requests share the
+# rate limits and circuit breaker with the replies.
+summary_model = LazyModel(partial(load_model, SUMMARY_INSTRUCTION))
+summary_client = GeminiClient(summary_model, scheduler=client.scheduler, breaker=client.breaker,
+                              system_tokens=estimate_tokens(SUMMARY_INSTRUCTION))
+
+
+# Function to build a conversation memory's summarizer; its requests queue behind every reply
+def summarizer(user_id=None):
+    return make_summarizer(summary_client.at_priority(BACKGROUND, user_id))
+
+
+# Function to build the user turn: what is known about the conversation so far, then the user's words
+def user_turn(user_input, context=""):
+    if not context:
+        return user_input
+    return f"Here is what you know about the conversation so far:\n{context}\n\nThe user says: {user_input}"
+
+
+# Collects the text shown for one reply, so that a failure partway through can keep it
+class ShownText:
+    def __init__(self, on_text=None):
+        self.on_text = on_text
+        self.parts = []
+
+    def __call__(self, text):
+        self.parts.append(text)
+        if self.on_text:
+            self.on_text(text)
+
+    # Finish the reply with FALLBACK_REPLY after whatever was already shown (marking a sentence that
+    # was cut off); returns the whole reply
+    def fallback(self):
+        shown = "".join(self.parts).rstrip()
+        if not shown:
+            self(FALLBACK_REPLY)
+        else:
+            self((" " if shown.endswith((".", "!", "?")) else "… ") + FALLBACK_REPLY)
+        return "".join(self.parts)
+
+
+# Function to generate empathetic responses.
+# When streaming is enabled, text is passed to on_text chunk by chunk as it arrives.
+# With a ConversationMemory, its token-budgeted context is included and the exchange recorded.
+# user_id picks the per-user rate limit; messages that sound like a crisis are sent first.
+def generate_empathetic_response(user_input, on_text=None, memory=None, user_id=None):
+    # Clear-cut greetings and booking requests are answered locally, with no model round trip
+    with tracing.span("router"):
+        text = local_reply(user_input)
+    if text is not None:
+        if on_text:
+            on_text(text)
+        if memory is not None:
+            memory.add_turn(user_input, text)
+        return text
+
+    prompt = user_turn(user_input, memory.context() if memory else "")
+    tools = compiled_tools()
+
+    # One chat session per turn so a booking result goes back as a function-response turn.
+    # Both requests share the turn's deadline.
+    chat = client.start_chat(user=user_id, priority=priority_for(user_input))
+
+    shown = ShownText(on_text)
+    try:
+        if STREAMING_ENABLED:
+            # Stream the response; text after a tool call is not shown
+            with tracing.span("model.reply", streamed=True):
+                result = stream_chat(chat, prompt, on_text=shown, tools=tools, generation_config=GENERATION_CONFIG)
+            text = result.text
+            function_calls = result.function_calls
+        else:
+            # Generate response with tools enabled
+            with tracing.span("model.reply", streamed=False):
+                response = chat.send_message(prompt, tools=tools, generation_config=GENERATION_CONFIG)
+            text = get_response_text(response)
+            if text:
+                shown(text)
+            function_calls = get_function_calls(response)
+
+        # Check if there's a tool call in the response
+        if function_calls:
+            text += complete_tool_turn(chat, function_calls, on_text=shown, tools=tools,
+                                       generation_config=GENERATION_CONFIG)
+    except ModelUnavailable:
+        # Gemini is slow or down, or the stream broke off partway: keep what was already said and
+        # answer supportively instead of stalling (or crashing) the turn
+        text = shown.fallback()
+
+    if memory is not None:
+        memory.add_turn(user_input, text)
+    return text
@@ -0,0 +1,380 @@
+# Deadline-aware wrapper around the Gemini model.
+# Every request runs under the turn's deadline. An attempt that is slower than the recent p95
+# gets a hedged second attempt, and whichever answers first wins. Failed or timed-out attempts
+# are retried with jittered backoff while time remains. A circuit breaker fails fast while the
+# API is down, so callers can answer with FALLBACK_REPLY instead of stalling the turn.
+# With a Scheduler, every request first waits for its share of the API quota.
+import functools
+import itertools
+import os
+import random
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+import tracing
+from memory import estimate_tokens
+from scheduler import BACKGROUND, NORMAL, AdmissionTimeout, QueueFull
+
+TURN_DEADLINE_SECONDS = float(os.environ.get("GEMINI_TURN_DEADLINE", "15"))
+ATTEMPT_TIMEOUT_SECONDS = float(os.environ.get("GEMINI_ATTEMPT_TIMEOUT", "8"))
+# A streamed attempt must produce its first chunk within the attempt timeout, but the stream as a
+# whole (long replies, tool follow-ups late in the turn) may run for this long
+STREAM_TIMEOUT_SECONDS = float(os.environ.get("GEMINI_STREAM_TIMEOUT", "60"))
+MAX_RETRIES = int(os.environ.get("GEMINI_MAX_RETRIES", "2"))
+HEDGING_ENABLED = os.environ.get("GEMINI_HEDGE", "1").lower() not in ("0", "false", "no")
+HEDGE_PERCENTILE = 95
+HEDGE_DEFAULT_SECONDS = 2.0  # hedge delay until enough latency samples have been seen
+HEDGE_MIN_SECONDS = 0.2  # never hedge sooner than this, however fast recent calls were
+HEDGE_MIN_SAMPLES = 20
+BACKOFF_BASE_SECONDS = 0.2
+BACKOFF_MAX_SECONDS = 2.0
+BREAKER_FAILURES = int(os.environ.get("GEMINI_BREAKER_FAILURES", "5"))  # consecutive failures that open the circuit
+BREAKER_RESET_SECONDS = float(os.environ.get("GEMINI_BREAKER_RESET", "30"))  # how long it stays open before a probe
+OUTPUT_TOKEN_ESTIMATE = 200  # charged against the tokens-per-minute budget along with the prompt
+
+FALLBACK_REPLY = ("I'm having a little trouble finding my words right now, but I'm still here with you. "
+                  "Take a slow breath with me, and tell me a bit more whenever you're ready.")
+
+
+# Raised when the model could not answer in time or is known to be down
+class ModelUnavailable(Exception):
+    pass
+
+
+class DeadlineExceeded(ModelUnavailable, TimeoutError):
+    pass
+
+
+class CircuitOpenError(ModelUnavailable):
+    pass
+
+
+# A stream failed after its first chunk; the text already received stands, the rest is lost
+class StreamInterrupted(ModelUnavailable):
+    pass
+
+
+# A single attempt ran past its own timeout
+class AttemptTimeout(TimeoutError):
+    pass
+
+
+# Function to tell transient failures (worth retrying) from errors that would fail again
+def is_retryable(error):
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, "code", None)  # HTTP status on google.api_core exceptions
+    if isinstance(code, int):
+        return code in (408, 429) or code >= 500
+    return False
+
+
+# Wall-clock budget shared by every request made for one turn
+class Deadline:
+    def __init__(self, seconds):
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(self.expires - time.monotonic(), 0.0)
+
+    def expired(self):
+        return self.remaining() <= 0
+
+
+# Rolling window of successful attempt latencies, used to pick the hedge delay
+class LatencyTracker:
+    def __init__(self, window=200):
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, q):
+        with self.lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return None
+        return samples[min(int(q / 100 * len(samples)), len(samples) - 1)]
+
+    def hedge_delay(self):
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_SECONDS
+        return max(self.percentile(HEDGE_PERCENTILE), HEDGE_MIN_SECONDS)
+
+
+# Opens after repeated failures; once reset_seconds pass, a single probe decides whether it closes
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=BREAKER_FAILURES, reset_seconds=BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.opens += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+# Function to run fn on a daemon thread (a hung request must not keep the process alive)
+def _start(fn, *args):
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=tracing.run_in_context(run), daemon=True).start()
+    return future
+
+
+# Function to wait for the first chunk of a stream so an attempt's latency is its time to first token.
+# Errors raised before any text arrives surface here, inside the attempt, where they can be retried;
+# later ones can no longer be retried and are raised as StreamInterrupted while the stream is read.
+def _prefetch(stream):
+    iterator = iter(stream)
+    first = next(iterator, None)
+    if first is None:
+        return iter(())
+    return _rest_of_stream(first, iterator)
+
+
+def _rest_of_stream(first, iterator):
+    yield first
+    try:
+        yield from iterator
+    except Exception as e:
+        raise StreamInterrupted(f"The Gemini stream broke off: {type(e).__name__}: {e}") from e
+
+
+# Function to estimate the tokens a request will use (prompt plus a typical reply)
+def request_tokens(*contents):
+    return sum(estimate_tokens(str(content)) for content in contents) + OUTPUT_TOKEN_ESTIMATE
+
+
+# Function to add the request timeout to a call's request_options (for a stream, it covers the whole stream)
+def _with_timeout(kwargs, timeout):
+    request_options = dict(kwargs.get("request_options") or {})
+    request_options["timeout"] = timeout
+    return dict(kwargs, request_options=request_options)
+
+
+class GeminiClient:
+    def __init__(self, model, turn_deadline=TURN_DEADLINE_SECONDS, attempt_timeout=ATTEMPT_TIMEOUT_SECONDS,
+                 max_retries=MAX_RETRIES, hedge=HEDGING_ENABLED, breaker=None, latency=None, scheduler=None,
+                 system_tokens=0, stream_timeout=STREAM_TIMEOUT_SECONDS):
+        self.model = model
+        self.stream_timeout = stream_timeout
+        self.system_tokens = system_tokens  # the model's system instruction, sent with every request
+        self.scheduler = scheduler
+        self.turn_deadline = turn_deadline
+        self.attempt_timeout = attempt_timeout
+        self.max_retries = max_retries
+        self.hedge = hedge
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = latency or LatencyTracker()
+        self.stats = Counter()
+        self.lock = threading.Lock()
+
+    def _count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    # Start the budget for one turn; pass it to every request made for that turn
+    def deadline(self, seconds=None):
+        return Deadline(self.turn_deadline if seconds is None else seconds)
+
+    # The request timeout for one attempt. The attempt itself is abandoned after timeout without a
+    # first chunk (see _hedged), but a stream that has started is given stream_timeout to finish.
+    def request_timeout(self, timeout, stream):
+        return max(timeout, self.stream_timeout) if stream else timeout
+
+    def _launch(self, attempt, timeout):
+        self._count("attempts")
+        started = time.perf_counter()
+        future = _start(attempt, timeout)
+
+        # Late finishers count too, so the window reflects real attempt latency
+        def record(done):
+            if done.exception() is None:
+                self.latency.record(time.perf_counter() - started)
+
+        future.add_done_callback(record)
+        return future
+
+    # Run one attempt, sending a hedged duplicate if it is still pending after the p95 delay
+    # (and, with a scheduler, only if the quota has room for it without making anyone wait)
+    def _hedged(self, attempt, deadline, user=None, tokens=1):
+        timeout = min(self.attempt_timeout, deadline.remaining())
+        started = time.perf_counter()
+        primary = self._launch(attempt, timeout)
+        pending = {primary}
+        hedged = not self.hedge
+        hedge_at = self.latency.hedge_delay()
+        errors = []
+        while pending:
+            elapsed = time.perf_counter() - started
+            if elapsed >= timeout:
+                break
+            window = timeout - elapsed if hedged else min(timeout, hedge_at) - elapsed
+            done, pending = wait(pending, timeout=max(window, 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        self._count("hedge_wins")
+                    return future.result()
+                errors.append(future.exception())
+            if pending and not hedged and time.perf_counter() - started >= hedge_at:
+                hedged = True
+                if self.scheduler is not None and not self.scheduler.try_acquire(user, BACKGROUND, tokens):
+                    self._count("hedges_skipped")
+                    continue
+                self._count("hedges")
+                pending.add(self._launch(attempt, timeout - (time.perf_counter() - started)))
+        if errors and not pending:
+            raise errors[0]
+        self._count("timeouts")
+        raise AttemptTimeout(f"No response from Gemini within {timeout:.1f}s")
+
+    # Wait for the scheduler to admit one request
+    def _admit(self, user, priority, tokens, deadline):
+        try:
+            self.scheduler.acquire(user, priority, tokens, timeout=deadline.remaining())
+        except QueueFull as e:
+            self._count("shed")
+            raise ModelUnavailable("Too many requests are waiting for Gemini") from e
+        except AdmissionTimeout as e:
+            self._count("deadline_exceeded")
+            raise DeadlineExceeded("Gemini quota was not available before the turn deadline") from e
+
+    # Run attempt(timeout) under the deadline with hedging, retries and the circuit breaker.
+    # user, priority and tokens are what the scheduler (if any) uses to admit each attempt.
+    def call(self, attempt, deadline=None, user=None, priority=NORMAL, tokens=1):
+        deadline = deadline or self.deadline()
+        last_error = None
+        for retry in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                self._count("rejected")
+                raise CircuitOpenError("Gemini is unavailable; the circuit breaker is open") from last_error
+            if deadline.expired():
+                break
+            if retry:
+                self._count("retries")
+            if self.scheduler is not None:
+                self._admit(user, priority, tokens, deadline)
+            try:
+                value = self._hedged(attempt, deadline, user, tokens)
+            except Exception as e:
+                if not is_retryable(e):
+                    # The API answered, it just rejected this request
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                last_error = e
+                if retry == self.max_retries:
+                    break
+                backoff = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** retry))
+                if backoff >= deadline.remaining():
+                    break
+                time.sleep(backoff)
+                continue
+            self.breaker.record_success()
+            return value
+        if last_error is not None and not isinstance(last_error, TimeoutError) and not deadline.expired():
+            self._count("failed")
+            raise ModelUnavailable(f"Gemini failed after {self.max_retries + 1} attempts") from last_error
+        self._count("deadline_exceeded")
+        raise DeadlineExceeded("Gemini did not answer before the turn deadline") from last_error
+
+    # Same call shape as GenerativeModel.generate_content
+    def generate_content(self, prompt, stream=False, deadline=None, user=None, priority=NORMAL, **kwargs):
+        def attempt(timeout):
+            response = self.model.generate_content(prompt, stream=stream,
+                                                   **_with_timeout(kwargs, self.request_timeout(timeout, stream)))
+            return _prefetch(response) if stream else response
+
+        return self.call(attempt, deadline, user, priority, request_tokens(prompt) + self.system_tokens)
+
+    # A view of this client whose generate_content runs at the given priority (e.g. BACKGROUND for summaries)
+    def at_priority(self, priority, user=None):
+        return _PriorityView(functools.partial(self.generate_content, priority=priority, user=user))
+
+    def start_chat(self, history=None, deadline=None, user=None, priority=NORMAL):
+        return ResilientChat(self, history, deadline or self.deadline(), user, priority)
+
+    def summary(self):
+        with self.lock:
+            stats = dict(self.stats)
+        p95 = self.latency.percentile(HEDGE_PERCENTILE)
+        p95_text = f"{p95 * 1000:.0f} ms" if p95 is not None else "n/a"
+        summary = f"gemini: attempt p95 {p95_text}, breaker {self.breaker.state}, {stats}"
+        if self.scheduler is not None:
+            summary += "\n" + self.scheduler.summary()
+        return summary
+
+
+# Chat session whose messages go through GeminiClient.call.
+# Every attempt (including hedges and retries) runs on its own copy of the history, and the
+# session that answered first becomes the one later messages build on.
+class ResilientChat:
+    def __init__(self, client, history, deadline, user=None, priority=NORMAL):
+        self.client = client
+        self.deadline = deadline
+        self.user = user
+        self.priority = priority
+        self.chat = None
+        self._history = list(history or [])
+
+    @property
+    def history(self):
+        return self.chat.history if self.chat is not None else self._history
+
+    def send_message(self, message, stream=False, **kwargs):
+        history = list(self.history)
+
+        def attempt(timeout):
+            chat = self.client.model.start_chat(history=history)
+            response = chat.send_message(message, stream=stream,
+                                         **_with_timeout(kwargs, self.client.request_timeout(timeout, stream)))
+            return chat, _prefetch(response) if stream else response
+
+        tokens = request_tokens(message, *history) + self.client.system_tokens
+        self.chat, response = self.client.call(attempt, self.deadline, self.user, self.priority, tokens)
+        return response
+
+
+class _PriorityView:
+    def __init__(self, generate_content):
+        self.generate_content = generate_content
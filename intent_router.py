@@ -0,0 +1,222 @@
+# Fast local intent router.
+# Classifies obvious commands, greetings and booking requests with precompiled patterns so
+# they can be answered without a model round trip; anything uncertain falls back to Gemini.
+import os
+import random
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+from booking import BookingError, book_appointment, format_booking_confirmation
+
+# Minimum confidence for answering locally instead of asking the model
+ROUTER_CONFIDENCE = float(os.environ.get("ROUTER_CONFIDENCE", "0.85"))
+
+EXIT = "exit"
+VOICE_MODE = "voice_mode"
+TEXT_MODE = "text_mode"
+GREETING = "greeting"
+BOOKING = "booking"
+CRISIS = "crisis"
+CHAT = "chat"
+
+COMMANDS = {
+    "exit": EXIT, "quit": EXIT, "bye": EXIT, "goodbye": EXIT,
+    "voice": VOICE_MODE, "voice mode": VOICE_MODE, "switch to voice": VOICE_MODE,
+    "text": TEXT_MODE, "text mode": TEXT_MODE, "switch to text": TEXT_MODE,
+}
+
+GREETING_PATTERN = re.compile(
+    r"^(?:hi|hello|hey|hiya|howdy|good (?:morning|afternoon|evening))(?: there)?(?: cotton)?[\s!.,]*$",
+    re.IGNORECASE,
+)
+# Only a request for Cotton to book makes a booking: "book", "schedule" or "reserve" as an imperative
+# (at the start of a sentence, or after "please", "can you", "I'd like to"...) followed by what to book.
+# Messages that only mention a session ("I have a session with Dr. Lee at 3pm...") are left to the model.
+BOOKING_VERB_PATTERN = re.compile(
+    r"(?:^|[.!?,]\s*|\b(?:please|(?:can|could|would|will) you|cotton)\s+"
+    r"|\b(?:i'?d like|i would like|i want|i need|i'?d love|help me|let'?s)\s+(?:to\s+)?)"
+    r"(?:please\s+)?(?:book|schedule|reserve)\s+"
+    r"(?:me|us|a|an|one|it|in|my|another|some|time|appointments?|sessions?|slots?|dr\.?|doctor)\b",
+    re.IGNORECASE,
+)
+NEGATION_PATTERN = re.compile(
+    r"\b(?:don'?t|do not|cancel|not|never|stop|shouldn'?t|wouldn'?t)\b",
+    re.IGNORECASE,
+)
+TITLED_NAME_PATTERN = re.compile(
+    r"\b(?:with|see|for)\s+(dr\.?|doctor|mr\.?|mrs\.?|ms\.?|miss)\s+"
+    r"([a-z][\w'-]*(?:\s+(?!(?:at|on|for|in|by|around|and|please|today|tonight|tomorrow|next|this)\b)[a-z][\w'-]*)?)",
+    re.IGNORECASE,
+)
+PLAIN_NAME_PATTERN = re.compile(r"\b(?:with|see)\s+([A-Z][a-z'-]+(?:\s+[A-Z][a-z'-]+)?)")
+TIME_PATTERN = re.compile(
+    r"\b(\d{1,2}(?::\d{2})?\s*(?:am|pm|a\.m\.|p\.m\.)|\d{1,2}:\d{2}|noon|midnight)",
+    re.IGNORECASE,
+)
+DAY_PATTERN = re.compile(
+    r"\b(today|tonight|tomorrow|(?:next |this )?(?:mon|tues|wednes|thurs|fri|satur|sun)day"
+    r"|this (?:morning|afternoon|evening))\b",
+    re.IGNORECASE,
+)
+# Signs of acute distress; these messages jump the queue for the model (see scheduler.py)
+CRISIS_PATTERN = re.compile(
+    r"\b(?:suicid\w*|kill(?:ing)? myself|end(?:ing)? (?:my|it) (?:life|all)|take my (?:own )?life"
+    r"|(?:want|wanna|going) to die|better off dead|no reason to live|self[- ]harm\w*"
+    r"|(?:hurt(?:ing)?|harm(?:ing)?|cut(?:ting)?) myself|overdos\w*|can'?t go on)\b",
+    re.IGNORECASE,
+)
+
+# Capitalized words after "with" that are not names
+NOT_NAMES = {"Today", "Tomorrow", "Tonight", "Monday", "Tuesday", "Wednesday", "Thursday",
+             "Friday", "Saturday", "Sunday", "Me", "You", "Someone", "Somebody", "A", "The"}
+
+TITLES = {"dr": "Dr.", "doctor": "Dr.", "mr": "Mr.", "mrs": "Mrs.", "ms": "Ms.", "miss": "Miss"}
+
+GREETING_REPLIES = (
+    "Hi there, it's good to hear from you. How are you feeling today?",
+    "Hello! I'm glad you're here. What's on your mind?",
+    "Hey, welcome back. How has your day been so far?",
+)
+
+
+# Result of routing one message
+class Route:
+    __slots__ = ("intent", "confidence", "slots")
+
+    def __init__(self, intent, confidence=0.0, slots=None):
+        self.intent = intent
+        self.confidence = confidence
+        self.slots = slots or {}
+
+    def is_confident(self, threshold=None):
+        return self.confidence >= (ROUTER_CONFIDENCE if threshold is None else threshold)
+
+    def __repr__(self):
+        return f"Route({self.intent!r}, {self.confidence:.2f}, {self.slots!r})"
+
+
+# Function to pull therapist_name out of a booking request
+def extract_therapist(text):
+    match = TITLED_NAME_PATTERN.search(text)
+    if match:
+        title = TITLES[match.group(1).rstrip(".").lower()]
+        name = " ".join(word[:1].upper() + word[1:] for word in match.group(2).split())
+        return f"{title} {name}"
+    for match in PLAIN_NAME_PATTERN.finditer(text):
+        name = match.group(1)
+        if name.split()[0] not in NOT_NAMES:
+            return name
+    return None
+
+
+# Function to pull time_slot (time and/or day) out of a booking request
+def extract_time_slot(text):
+    time_match = TIME_PATTERN.search(text)
+    day_match = DAY_PATTERN.search(text)
+    parts = []
+    if time_match:
+        parts.append(time_match.group(1).lower().replace(" ", ""))
+    if day_match:
+        parts.append(day_match.group(1).lower())
+    return " ".join(parts) or None, time_match is not None
+
+
+# Function to classify a message; results are cached since the same text is often routed twice.
+# A message that sounds like a crisis is never answered locally, whatever else it asks for.
+@lru_cache(maxsize=256)
+def route(text):
+    stripped = text.strip()
+    command = COMMANDS.get(stripped.lower().rstrip(".!"))
+    if command:
+        return Route(command, 1.0)
+
+    if is_crisis(stripped):
+        return Route(CRISIS, 0.0)
+
+    if GREETING_PATTERN.match(stripped):
+        return Route(GREETING, 0.9)
+
+    if BOOKING_VERB_PATTERN.search(stripped):
+        therapist_name = extract_therapist(stripped)
+        time_slot, has_time = extract_time_slot(stripped)
+        slots = {}
+        if therapist_name:
+            slots["therapist_name"] = therapist_name
+        if time_slot:
+            slots["time_slot"] = time_slot
+        confidence = 0.3 + 0.3 * bool(therapist_name) + 0.2 * bool(time_slot) + 0.15 * has_time
+        if NEGATION_PATTERN.search(stripped):
+            confidence -= 0.5
+        return Route(BOOKING, max(confidence, 0.0), slots)
+
+    return Route(CHAT, 0.0)
+
+
+# Function to flag messages that suggest the user may be in crisis
+def is_crisis(text):
+    return CRISIS_PATTERN.search(text) is not None
+
+
+# Counts how many messages were answered locally and how many went to the model
+class RouterStats:
+    def __init__(self):
+        self.local = Counter()
+        self.fallback = Counter()
+        self.lock = threading.Lock()
+
+    def record(self, route_result, handled_locally):
+        with self.lock:
+            (self.local if handled_locally else self.fallback)[route_result.intent] += 1
+
+    def hit_rate(self):
+        with self.lock:
+            local = sum(self.local.values())
+            total = local + sum(self.fallback.values())
+        return local / total if total else 0.0
+
+    def summary(self):
+        with self.lock:
+            local = dict(self.local)
+            fallback = dict(self.fallback)
+        return f"router: {self.hit_rate():.0%} handled locally (local {local}, sent to model {fallback})"
+
+
+router_stats = RouterStats()
+
+
+# Function to answer a chat message locally when the router is confident.
+# Returns the reply, or None when the message should go to the model.
+def local_reply(text):
+    result = route(text)
+    reply = None
+    if result.is_confident():
+        if result.intent == BOOKING and {"therapist_name", "time_slot"} <= result.slots.keys():
+            try:
+                booking_result = book_appointment(result.slots["therapist_name"], result.slots["time_slot"])
+                reply = format_booking_confirmation(booking_result)
+            except BookingError as e:  # unknown therapist, taken slot...: say so and offer other times
+                reply = str(e)
+        elif result.intent == GREETING:
+            reply = random.choice(GREETING_REPLIES)
+    router_stats.record(result, reply is not None)
+    return reply
+
+
+# Function to tell, without answering or booking anything, whether a message would be handled
+# locally (a command, or a reply from local_reply) rather than sent to the model
+def handled_locally(text):
+    result = route(text)
+    if result.intent in (EXIT, VOICE_MODE, TEXT_MODE):
+        return True
+    return result.is_confident() and (result.intent == GREETING or (
+        result.intent == BOOKING and {"therapist_name", "time_slot"} <= result.slots.keys()))
+
+
+# Function to recognise CLI commands (exit and mode switches); returns the intent or None
+def command_intent(text):
+    result = route(text)
+    if result.intent in (EXIT, VOICE_MODE, TEXT_MODE):
+        router_stats.record(result, True)
+        return result.intent
+    return None
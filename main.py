@@ -1,53 +1,29 @@
 import os
-import time
-import google.generativeai as genai
-from voice_io import listen_to_user, speak_response
-from booking import tools, handle_tool_calls
-from dotenv import load_dotenv
+from voice_io import get_listener, speak_response, prewarm_speech, interrupt_speech, open_audio_output, BARGE_IN
+from streaming import SHOW_LATENCY
+from memory import ConversationMemory
+from session_store import CLI_NAMESPACE, SessionStore, exchanges
+from intent_router import command_intent, router_stats, EXIT, VOICE_MODE, TEXT_MODE
+from startup import BackgroundTask
+import engine
+from engine import generate_empathetic_response
+import tracing
 
-# Load environment variables from .env file
-load_dotenv()
+# The engine reads the API key (and .env) once per process; without a key there is nothing to talk to
+if not engine.api_key:
+    raise ValueError(engine.MISSING_API_KEY)
+print(f"Using model: {engine.model_name}")
 
-# Configure API key
-api_key = os.environ.get("GOOGLE_API_KEY")
-if not api_key:
-    raise ValueError("GOOGLE_API_KEY environment variable not set. Please add it to your .env file.")
+# Function to print streamed text as it arrives
+def print_chunk(text):
+    print(text, end="", flush=True)
 
-# Configure the API
-genai.configure(api_key=api_key)
+# The CLI's conversation log; the next run resumes it (set CLI_SESSION to keep separate conversations)
+CLI_SESSION = os.environ.get("CLI_SESSION", "cli")
 
-# Initialize the model
-model_name = os.environ.get("MODEL_NAME", "gemini-1.5-flash-8b-latest")  # Get model name from .env or use default
-print(f"Using model: {model_name}")
-model = genai.GenerativeModel(model_name)
-
-# Function to generate empathetic responses
-def generate_empathetic_response(user_input):
-    prompt = f"""You're an empathetic therapist named Cotton. Respond supportively to: '{user_input}'. 
-    Be warm, understanding, and compassionate. Use a conversational tone and keep responses concise.
-    If the user expresses interest in booking a session with a human therapist, offer to help them book an appointment."""
-    
-    # Generate response with tools enabled
-    response = model.generate_content(
-        prompt,
-        tools=tools,
-        generation_config={
-            "temperature": 0.7,
-            "max_output_tokens": 1024
-        }
-    )
-    
-    # Check if there's a tool call in the response
-    booking_result = handle_tool_calls(response, prompt)
-    
-    if booking_result:
-        # Generate a final response that includes the booking confirmation
-        final_prompt = f"{prompt}\n\nThe appointment has been booked: {booking_result}"
-        final_response = model.generate_content(final_prompt)
-        return final_response.text
-    
-    # If no tool call, return the regular response
-    return response.text
+# Stock phrases spoken at the start and end of every session
+WELCOME_MESSAGE = "Hey, I'm Cotton, your therapy companion. Feel free to spill your thoughts, and I'm here to listen and support you."
+GOODBYE_MESSAGE = "Take care! Remember I'm here whenever you need to talk."
 
 # Main function to run the chatbot
 def main():
@@ -56,44 +32,80 @@ def main():
     
     mode = "text"  # Default mode is text input
     
-    # Welcome message
-    welcome_message = "Hey, I'm Cotton, your therapy companion. Feel free to spill your thoughts, and I'm here to listen and support you."
-    print(f"Bot: {welcome_message}")
-    speak_response(welcome_message)
+    # Configure the model and open the audio output in the background while the user reads the welcome
+    engine.model.start()
+    BackgroundTask(open_audio_output)
+    
+    # Conversation memory with a fixed token budget
+    memory = ConversationMemory(summarize=engine.summarizer())
+    
+    # Warm the TTS cache for the goodbye line while the welcome plays
+    prewarm_speech([GOODBYE_MESSAGE])
+    
+    # Welcome message (served from the TTS cache after the first run),
+    # spoken in the background so the first prompt shows up right away
+    print(f"Bot: {WELCOME_MESSAGE}")
+    speak_response(WELCOME_MESSAGE, wait=False)
+    
+    # Pick up the previous conversation from its session log
+    transcript = SessionStore(namespace=CLI_NAMESPACE).open(CLI_SESSION)
+    memory.restore(exchanges(transcript.tail(2 * memory.recent_turns)))
+    if len(transcript):
+        print(f"(Resuming a conversation of {len(transcript)} messages)")
     
     while True:
-        if mode == "text":
-            user_input = input("You: ")
+        # Every stage of the turn is timed under one turn ID (when TRACE/TRACE_FILE is set)
+        with tracing.turn(mode=mode):
+            if mode == "text":
+                user_input = input("You: ")
+                if BARGE_IN:  # typing a reply cuts Cotton off
+                    interrupt_speech()
+                command = command_intent(user_input)
             
-            if user_input.lower() == "exit":
-                print("Bot: Take care! Remember I'm here whenever you need to talk.")
-                break
-            elif user_input.lower() == "voice":
-                mode = "voice"
-                print("Bot: Switching to voice input mode. Speak clearly into your microphone.")
-                continue
-        else:  # voice mode
-            user_input = listen_to_user()
+                if command == EXIT:
+                    break
+                elif command == TEXT_MODE:
+                    print("Bot: We're already in text mode.")
+                    continue
+                elif command == VOICE_MODE:
+                    mode = "voice"
+                    print("Bot: Switching to voice input mode. Speak clearly into your microphone.")
+                    # Opens the microphone and calibrates once; later turns reuse the open stream
+                    listener = get_listener()
+                    continue
+            else:  # voice mode
+                # With barge-in, listening starts while Cotton is still talking and speech cuts it off
+                user_input = listener.listen(barge_in=BARGE_IN)
+                command = command_intent(user_input)
             
-            if user_input.lower() == "exit":
-                print("Bot: Take care! Remember I'm here whenever you need to talk.")
-                break
-            elif user_input.lower() == "text":
-                mode = "text"
-                print("Bot: Switching to text input mode.")
-                continue
-            elif not user_input:  # If speech recognition failed
-                continue
-        
-        # Generate response
-        bot_response = generate_empathetic_response(user_input)
-        print(f"Bot: {bot_response}")
-        
-        # Speak the response
-        speak_response(bot_response)
-        
-        # Add a small delay for natural conversation flow
-        time.sleep(1)
+                if command == EXIT:
+                    break
+                elif command == VOICE_MODE:
+                    continue
+                elif command == TEXT_MODE:
+                    mode = "text"
+                    print("Bot: Switching to text input mode.")
+                    continue
+                elif not user_input:  # If speech recognition failed
+                    continue
+            
+            # Generate response, printing it as it streams in
+            print("Bot: ", end="", flush=True)
+            bot_response = generate_empathetic_response(user_input, on_text=print_chunk, memory=memory)
+            print()
+            transcript.append("user", user_input)
+            transcript.append("assistant", bot_response)
+            
+            # Speak the response; with barge-in the next prompt is ready while it plays
+            speak_response(bot_response, wait=not BARGE_IN)
+    
+    print(f"Bot: {GOODBYE_MESSAGE}")
+    if SHOW_LATENCY:
+        print(router_stats.summary())
+        print(engine.client.summary())
+        if tracing.TRACE_ENABLED:
+            print(tracing.metrics.summary())
+    speak_response(GOODBYE_MESSAGE)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
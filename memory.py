@@ -0,0 +1,191 @@
+# Token-budgeted conversation memory.
+# Recent exchanges are kept verbatim; older ones are folded into a rolling summary
+# every few turns, so the context sent with each prompt stays within a fixed budget.
+# The summary is written on a background thread and picked up on a later turn, so no reply
+# waits for it; until then the turns being summarized are still sent verbatim.
+import os
+import threading
+from collections import deque
+import tracing
+
+TOKEN_BUDGET = int(os.environ.get("MEMORY_TOKEN_BUDGET", "1200"))
+RECENT_TURNS = int(os.environ.get("MEMORY_RECENT_TURNS", "6"))
+SUMMARIZE_EVERY = int(os.environ.get("MEMORY_SUMMARIZE_EVERY", "4"))
+
+SUMMARY_PROMPT = """You maintain a running summary of a supportive therapy conversation between a user and Cotton.
+Update the summary with the new exchanges below. Keep what matters for continuing the conversation:
+the user's feelings, concerns, names, plans and any bookings. Write at most {words} words.
+
+Current summary:
+{summary}
+
+New exchanges:
+{turns}
+
+Updated summary:"""
+
+
+# Function to estimate tokens cheaply (about four characters per token for English)
+def estimate_tokens(text):
+    return (len(text) + 3) // 4
+
+
+# Function to clip text to roughly max_tokens, keeping the end (the most recent details)
+def clip_to_tokens(text, max_tokens):
+    max_chars = max(max_tokens, 0) * 4
+    if len(text) <= max_chars:
+        return text
+    return "..." + text[len(text) - max_chars + 3:] if max_chars > 3 else ""
+
+
+# Function to format one exchange for a prompt
+def format_turn(turn):
+    user_text, bot_text = turn
+    return f"User: {user_text}\nCotton: {bot_text}"
+
+
+# Function to build a summarizer that asks the model to fold new turns into the summary
+def make_summarizer(model, summary_tokens=None):
+    summary_tokens = summary_tokens or TOKEN_BUDGET // 3
+
+    def summarize(summary, turns):
+        prompt = SUMMARY_PROMPT.format(
+            words=max(summary_tokens * 3 // 4, 20),
+            summary=summary or "(none yet)",
+            turns="\n".join(format_turn(turn) for turn in turns),
+        )
+        response = model.generate_content(
+            prompt,
+            generation_config={"temperature": 0.2, "max_output_tokens": summary_tokens}
+        )
+        return response.text.strip()
+
+    return summarize
+
+
+class ConversationMemory:
+    def __init__(self, summarize=None, token_budget=TOKEN_BUDGET, recent_turns=RECENT_TURNS,
+                 summarize_every=SUMMARIZE_EVERY):
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.summarize_every = summarize_every
+        self.summary_budget = token_budget // 3
+        self.summary = ""
+        self.recent = deque()  # (user_text, bot_text), oldest first
+        self.pending = []  # turns pushed out of recent, waiting to be folded into the summary
+        self.folding = []  # turns the summarizer is working on
+        self.folded = None  # the summarizer's result, once it has finished
+        self.worker = None
+        self.generation = 0  # bumped by clear(), so a summary of a cleared conversation is dropped
+        self.lock = threading.Lock()
+        self.turns = 0
+        self.summary_updates = 0
+
+    # Reload the latest exchanges of a resumed conversation without summarizing anything
+    def restore(self, turns):
+        self.clear()
+        self.recent.extend(list(turns)[-self.recent_turns:])
+        self.turns = len(self.recent)
+
+    # Record one exchange and start folding older ones into the summary when enough have piled up
+    def add_turn(self, user_text, bot_text):
+        with self.lock:
+            self._collect()
+            self.recent.append((user_text, bot_text))
+            self.turns += 1
+            while len(self.recent) > self.recent_turns:
+                self.pending.append(self.recent.popleft())
+            if len(self.pending) >= self.summarize_every and not self.folding:
+                self._fold_pending()
+
+    # Hand the pending turns to the summarizer; without one, keep a clipped transcript of them instead
+    def _fold_pending(self):
+        turns, self.pending = self.pending, []
+        if not self.summarize:
+            self._apply("\n".join([self.summary] + [format_turn(turn) for turn in turns]).strip())
+            return
+        self.folding = turns
+        self.worker = threading.Thread(target=tracing.run_in_context(self._summarize),
+                                       args=(self.summary, turns, self.generation), name="memory-summary", daemon=True)
+        self.worker.start()
+
+    def _summarize(self, summary, turns, generation):
+        updated = None
+        try:
+            with tracing.span("memory.summarize", turns=len(turns)):
+                updated = self.summarize(summary, turns)
+        except Exception as e:
+            print(f"Could not update conversation summary: {e}")
+        # Without a summary, keep a clipped transcript of the turns
+        updated = updated or "\n".join([summary] + [format_turn(turn) for turn in turns]).strip()
+        with self.lock:
+            if generation == self.generation:
+                self.folded = updated
+
+    # Take in a summary the background summarizer has finished. Call with the lock held.
+    def _collect(self):
+        if self.folded is not None:
+            self._apply(self.folded)
+            self.folded = None
+            self.folding = []
+            if len(self.pending) >= self.summarize_every:
+                self._fold_pending()
+
+    def _apply(self, summary):
+        self.summary = clip_to_tokens(summary, self.summary_budget)
+        self.summary_updates += 1
+
+    # Wait for any summary in progress and take it in (e.g. before a batch run saves its results)
+    def flush(self):
+        while True:
+            with self.lock:
+                self._collect()
+                worker = self.worker if self.folding else None
+            if worker is None:
+                return
+            worker.join()
+
+    # Build the context block for the next prompt, never exceeding token_budget
+    def context(self):
+        with self.lock:
+            self._collect()
+            return self._context()
+
+    def _context(self):
+        summary_header = "Summary of the earlier conversation:\n"
+        recent_header = "Recent conversation:\n"
+        remaining = self.token_budget - estimate_tokens(recent_header)
+        sections = []
+
+        if self.summary:
+            remaining -= estimate_tokens(summary_header) + 1
+            summary = clip_to_tokens(self.summary, min(self.summary_budget, remaining))
+            sections.append(summary_header + summary)
+            remaining -= estimate_tokens(summary)
+
+        # Newest turns first, so the oldest are dropped when the budget runs out
+        lines = []
+        for turn in reversed(self.folding + self.pending + list(self.recent)):
+            text = format_turn(turn)
+            cost = estimate_tokens(text) + 1
+            if cost > remaining:
+                if not lines:
+                    lines.append(clip_to_tokens(text, remaining - 1))
+                break
+            lines.append(text)
+            remaining -= cost
+        if lines:
+            sections.append(recent_header + "\n".join(reversed(lines)))
+
+        return "\n\n".join(sections)
+
+    def clear(self):
+        with self.lock:
+            self.summary = ""
+            self.recent.clear()
+            self.pending = []
+            self.folding = []
+            self.folded = None
+            self.generation += 1
+            self.turns = 0
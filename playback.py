@@ -0,0 +1,196 @@
+# In-process audio playback with barge-in.
+# Speech segments (MP3 from gTTS, or WAV) are decoded to PCM with pydub and written to one
+# long-lived PyAudio output stream by a single worker thread, a few milliseconds at a time, so
+# cancel() silences Cotton within one chunk and drops everything still queued. Without PyAudio,
+# or when a segment cannot be decoded (pydub needs ffmpeg for MP3), segments go to an external
+# player instead, which cancel() terminates.
+# PLAYBACK_BACKEND picks "auto" (default: in-process when available), "pyaudio" or "external".
+import collections
+import contextvars
+import io
+import os
+import queue
+import threading
+import time
+from functools import lru_cache
+import tracing
+
+PLAYBACK_BACKEND = os.environ.get("PLAYBACK_BACKEND", "auto").lower()
+
+# Output format; gTTS speaks 24 kHz mono
+SAMPLE_RATE = 24000
+CHANNELS = 1
+SAMPLE_WIDTH = 2
+
+# PCM is written in chunks this long; a cancel takes effect at the next chunk boundary
+CHUNK_SECONDS = 0.02
+CHUNK_BYTES = int(SAMPLE_RATE * CHUNK_SECONDS) * CHANNELS * SAMPLE_WIDTH
+
+# Decoded segments kept in memory, so stock phrases (welcome, goodbye) decode once
+DECODE_CACHE_SIZE = 32
+
+# Latency samples kept for stats()
+STATS_WINDOW = 200
+
+
+# Function to decode an MP3 or WAV segment to PCM in the output format
+@lru_cache(maxsize=DECODE_CACHE_SIZE)
+def decode(audio):
+    from pydub import AudioSegment
+
+    audio_format = "wav" if audio[:4] == b"RIFF" else "mp3"
+    with tracing.span("tts.decode", format=audio_format, bytes=len(audio)):
+        segment = AudioSegment.from_file(io.BytesIO(audio), format=audio_format)
+        segment = segment.set_frame_rate(SAMPLE_RATE).set_channels(CHANNELS).set_sample_width(SAMPLE_WIDTH)
+        return segment.raw_data
+
+
+# One PyAudio output stream, opened once and reused for every segment
+class PyAudioOutput:
+    def __init__(self):
+        import pyaudio
+
+        self.audio = pyaudio.PyAudio()
+        self.stream = self.audio.open(format=self.audio.get_format_from_width(SAMPLE_WIDTH), channels=CHANNELS,
+                                      rate=SAMPLE_RATE, output=True,
+                                      frames_per_buffer=CHUNK_BYTES // (CHANNELS * SAMPLE_WIDTH))
+
+    def write(self, pcm):
+        self.stream.write(pcm)
+
+    def close(self):
+        self.stream.stop_stream()
+        self.stream.close()
+        self.audio.terminate()
+
+
+def _median_ms(samples):
+    ordered = sorted(samples)
+    return ordered[len(ordered) // 2] * 1000 if ordered else 0.0
+
+
+class AudioPlayer:
+    # fallback(audio, stop) plays one segment with an external player and returns early once the
+    # stop event is set. open_output builds the in-process output (PyAudioOutput by default).
+    def __init__(self, backend=PLAYBACK_BACKEND, fallback=None, open_output=PyAudioOutput, decoder=decode):
+        self.backend = backend
+        self.fallback = fallback
+        self.open_output = open_output
+        self.decoder = decoder
+        self.output = None
+        self.output_error = None
+        self.segments = queue.Queue()
+        self.stop = threading.Event()  # replaced on every cancel(); queued segments keep the one they were queued under
+        self.pending = 0
+        self.idle = threading.Condition()
+        self.worker = None
+        self.cancelled_at = None
+        self.lock = threading.Lock()
+        self.start_latencies = collections.deque(maxlen=STATS_WINDOW)
+        self.interrupt_latencies = collections.deque(maxlen=STATS_WINDOW)
+
+    # Open the output device and start the worker. Called on first play(); call it early (e.g. at
+    # startup, in the background) to keep device setup off the first reply.
+    def open(self):
+        with self.lock:
+            if self.worker is None:
+                self.worker = threading.Thread(target=self._run, name="playback", daemon=True)
+                self.worker.start()
+            if self.output is None and self.output_error is None and self.backend != "external":
+                try:
+                    self.output = self.open_output()
+                except Exception as e:
+                    if self.backend == "pyaudio":
+                        raise
+                    self.output_error = e  # no PyAudio or no device: use the external player
+        return self
+
+    @property
+    def in_process(self):
+        return self.output is not None
+
+    @property
+    def playing(self):
+        return self.pending > 0
+
+    # Queue a segment behind whatever is already playing; returns immediately. A segment queued
+    # with the stop event of an earlier moment (see speak_response) is dropped if cancel() came since.
+    def play(self, audio, stop=None):
+        self.open()
+        with self.idle:
+            self.pending += 1
+            was_idle = self.pending == 1
+        self.segments.put((stop or self.stop, audio, time.perf_counter(), contextvars.copy_context(), was_idle))
+
+    # Stop the current segment and drop the queued ones
+    def cancel(self):
+        with self.lock:
+            if self.pending:
+                self.cancelled_at = time.perf_counter()
+            self.stop.set()
+            self.stop = threading.Event()
+
+    # Block until everything queued has played or been cancelled; returns False on timeout
+    def wait(self, timeout=None):
+        with self.idle:
+            return self.idle.wait_for(lambda: self.pending == 0, timeout)
+
+    def _run(self):
+        while True:
+            stop, audio, queued_at, context, was_idle = self.segments.get()
+            try:
+                if not stop.is_set():
+                    context.run(self._play, stop, audio, queued_at if was_idle else None)
+            except Exception as e:
+                print(f"Could not play audio: {e}")
+            finally:
+                with self.idle:
+                    self.pending -= 1
+                    self.idle.notify_all()
+            if stop.is_set() and self.cancelled_at is not None:
+                self.interrupt_latencies.append(time.perf_counter() - self.cancelled_at)
+                tracing.observe("playback.interrupt", (time.perf_counter() - self.cancelled_at) * 1000)
+                self.cancelled_at = None
+
+    def _started(self, queued_at):
+        if queued_at is not None:
+            self.start_latencies.append(time.perf_counter() - queued_at)
+            tracing.observe("playback.start", (time.perf_counter() - queued_at) * 1000)
+
+    def _play(self, stop, audio, queued_at):
+        with tracing.span("tts.playback", backend="pyaudio" if self.in_process else "external"):
+            pcm = None
+            if self.in_process:
+                try:
+                    pcm = self.decoder(audio)
+                except Exception:
+                    pcm = None  # e.g. MP3 without ffmpeg; the external player can still play it
+            if pcm is None:
+                self._started(queued_at)
+                if self.fallback is None:
+                    raise RuntimeError("no audio output available")
+                self.fallback(audio, stop)
+                return
+            self._started(queued_at)
+            for offset in range(0, len(pcm), CHUNK_BYTES):
+                if stop.is_set():
+                    break
+                self.output.write(pcm[offset:offset + CHUNK_BYTES])
+
+    # Median latencies: queued-while-idle to first audio (for the external player, to its launch),
+    # and cancel() to silence
+    def stats(self):
+        return {
+            "backend": "pyaudio" if self.in_process else "external",
+            "start_ms": _median_ms(self.start_latencies),
+            "interrupt_ms": _median_ms(self.interrupt_latencies),
+            "interrupts": len(self.interrupt_latencies),
+        }
+
+    def close(self):
+        self.cancel()
+        self.wait(timeout=1)
+        with self.lock:
+            if self.output is not None:
+                self.output.close()
+                self.output = None
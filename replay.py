@@ -0,0 +1,191 @@
+# Batch replay of user messages through the bot, for regression-testing prompt changes.
+# Reads JSONL records, runs each one through generate_empathetic_response (model-driven
+# book_appointment calls run through the same tool handler as handle_tool_calls) on a bounded
+# thread pool, and appends one result line per record to the output as soon as it finishes.
+#   python replay.py requests.jsonl [--output replay.jsonl] [--workers 16] [--resume]
+#
+# A record is either a single message or a whole transcript:
+#   {"id": "a1", "text": "I can't sleep"}                    "message", "user_input" and "body" work too
+#   {"id": "t7", "messages": ["hi", "book me with Dr. Lee at 3pm"]}   replayed in order, with memory
+# Records without "id" or "request_id" are keyed by line number. The output file doubles as the
+# checkpoint: with --resume, records already in it are skipped and new results are appended.
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+REPLAY_WORKERS = int(os.environ.get("REPLAY_WORKERS", "16"))
+MESSAGE_FIELDS = ("text", "message", "user_input", "body")
+PROGRESS_EVERY = 100
+
+
+# Function to read (record id, [messages]) pairs from a JSONL file, skipping blank and malformed lines
+def read_records(path, field=None):
+    fields = (field,) if field else MESSAGE_FIELDS
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(record, dict):
+                continue
+            record_id = str(record.get("id", record.get("request_id", line_number)))
+            messages = record.get("messages")
+            if isinstance(messages, list):
+                messages = [m.get("text", "") if isinstance(m, dict) else str(m) for m in messages]
+            else:
+                messages = [str(record[name]) for name in fields if record.get(name)][:1]
+            messages = [message.strip() for message in messages if message.strip()]
+            if messages:
+                yield record_id, messages
+
+
+# Function to collect the ids already written to an output file (a cut-off last line is ignored)
+def completed_ids(path):
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["id"])
+            except (ValueError, KeyError, TypeError):
+                continue
+    return done
+
+
+# Totals for a replay run
+class ReplayStats:
+    def __init__(self):
+        self.records = 0
+        self.turns = 0
+        self.booking_turns = 0
+        self.fallbacks = 0
+        self.errors = 0
+        self.skipped = 0
+        self.elapsed = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, result, fallback_reply):
+        with self.lock:
+            self.records += 1
+            self.errors += "error" in result
+            for turn in result["turns"]:
+                self.turns += 1
+                self.booking_turns += bool(turn["bookings"])
+                self.fallbacks += turn["reply"] == fallback_reply
+
+    def summary(self):
+        elapsed = self.elapsed or 1e-9
+        booking_rate = self.booking_turns / self.turns if self.turns else 0.0
+        return (f"replayed {self.records} records ({self.turns} turns) in {self.elapsed:.1f}s: "
+                f"{self.records / elapsed:.1f} records/s, {self.turns / elapsed:.1f} turns/s\n"
+                f"  booking triggered on {self.booking_turns} turns ({booking_rate:.1%}), "
+                f"{self.fallbacks} fallback replies, {self.errors} errors, {self.skipped} skipped (already done)")
+
+
+class Replayer:
+    # respond(text, memory=None, user_id=None) and make_memory(record_id) default to the engine's flow and shared client
+    def __init__(self, respond=None, make_memory=None, fallback_reply=None):
+        if respond is None or make_memory is None:
+            import engine
+            from gemini_client import FALLBACK_REPLY
+            from memory import ConversationMemory
+
+            if not engine.api_key:
+                raise ValueError(engine.MISSING_API_KEY)
+            respond = respond or engine.generate_empathetic_response
+            make_memory = make_memory or (lambda record_id: ConversationMemory(
+                summarize=engine.summarizer(record_id)
+            ))
+            fallback_reply = fallback_reply or FALLBACK_REPLY
+        self.respond = respond
+        self.make_memory = make_memory
+        self.fallback_reply = fallback_reply
+
+    # Function to replay one record; a transcript shares one memory across its turns
+    def run_record(self, record_id, messages):
+        from booking import track_bookings
+
+        memory = self.make_memory(record_id) if len(messages) > 1 else None
+        result = {"id": record_id, "turns": []}
+        start = time.perf_counter()
+        try:
+            for text in messages:
+                turn_start = time.perf_counter()
+                with track_bookings() as booked:
+                    reply = self.respond(text, memory=memory, user_id=record_id)
+                result["turns"].append({"user": text, "reply": reply, "bookings": booked,
+                                        "latency_ms": round((time.perf_counter() - turn_start) * 1000, 1)})
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    # Replay records into output (a path) with `workers` threads, reading at most 2 x workers records ahead.
+    # Results are written in completion order, one flushed line each.
+    def run(self, records, output, workers=REPLAY_WORKERS, resume=False, progress=None):
+        stats = ReplayStats()
+        done = completed_ids(output) if resume else set()
+        start = time.perf_counter()
+        with open(output, "a" if resume else "w", encoding="utf-8") as out, \
+                ThreadPoolExecutor(max_workers=workers, thread_name_prefix="replay") as executor:
+            pending = set()
+
+            # Write whatever has finished, waiting for at least one record
+            def drain():
+                nonlocal pending
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    result = future.result()
+                    out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    out.flush()
+                    stats.add(result, self.fallback_reply)
+                    if progress and stats.records % PROGRESS_EVERY == 0:
+                        progress(stats)
+
+            for record_id, messages in records:
+                if record_id in done:
+                    stats.skipped += 1
+                    continue
+                done.add(record_id)
+                pending.add(executor.submit(self.run_record, record_id, messages))
+                if len(pending) >= workers * 2:  # a bounded window, so huge inputs are never read ahead
+                    drain()
+            while pending:
+                drain()
+        stats.elapsed = time.perf_counter() - start
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input", help="JSONL file of messages or transcripts")
+    parser.add_argument("--output", default="replay.jsonl")
+    parser.add_argument("--workers", type=int, default=REPLAY_WORKERS)
+    parser.add_argument("--field", help="message field to read (default: text, message, user_input or body)")
+    parser.add_argument("--resume", action="store_true", help="skip records already in --output and append")
+    args = parser.parse_args()
+
+    def progress(stats):
+        print(f"  {stats.records} records, {stats.turns} turns", file=sys.stderr, flush=True)
+
+    # Replayed bookings go to a calendar in memory, never the live one
+    os.environ.setdefault("AVAILABILITY_FILE", "")
+
+    # The bot prints booking notices as it goes; keep them out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        replayer = Replayer()
+        stats = replayer.run(read_records(args.input, args.field), args.output, args.workers, args.resume, progress)
+    print(stats.summary())
+    print(f"results: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
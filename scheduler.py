@@ -0,0 +1,265 @@
+# Rate-limit-aware scheduler for model requests.
+# Requests wait in bounded per-priority queues and are admitted only while the global and
+# per-user token buckets (requests and tokens per minute) have room, so bursts are smoothed
+# out instead of hitting the API quota. Crisis messages are admitted before routine chat,
+# and routine chat before background work such as memory summaries. When a queue is full,
+# submit raises QueueFull right away (backpressure) rather than letting callers pile up.
+# The core (submit / dispatch / next_wait) only reads the injected clock, so it can be driven
+# deterministically with SimulatedClock; acquire() is the blocking wrapper used with the real clock.
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from intent_router import is_crisis
+
+CRISIS = 0
+NORMAL = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {CRISIS: "crisis", NORMAL: "normal", BACKGROUND: "background"}
+
+GLOBAL_RPM = float(os.environ.get("GEMINI_RPM", "60"))
+GLOBAL_TPM = float(os.environ.get("GEMINI_TPM", "1000000"))
+USER_RPM = float(os.environ.get("GEMINI_USER_RPM", "20"))
+USER_TPM = float(os.environ.get("GEMINI_USER_TPM", "200000"))
+BURST_SECONDS = float(os.environ.get("GEMINI_BURST_SECONDS", "10"))  # bucket size, in seconds of refill
+QUEUE_LIMITS = {CRISIS: 100, NORMAL: 200, BACKGROUND: 50}
+MAX_TRACKED_USERS = 10000
+
+
+class QueueFull(Exception):
+    pass
+
+
+class AdmissionTimeout(TimeoutError):
+    pass
+
+
+# Function to pick the priority class for a user's message
+def priority_for(text):
+    return CRISIS if is_crisis(text) else NORMAL
+
+
+class MonotonicClock:
+    def time(self):
+        return time.monotonic()
+
+
+# Clock that only moves when told to, for deterministic tests and simulations
+class SimulatedClock:
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += max(seconds, 0.0)
+
+
+# Refills at per_minute / 60 units per second and holds up to burst_seconds worth of refill
+class TokenBucket:
+    def __init__(self, per_minute, now, burst_seconds=BURST_SECONDS):
+        self.rate = per_minute / 60
+        self.capacity = max(self.rate * burst_seconds, 1.0)
+        self.tokens = self.capacity
+        self.updated = now
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def has(self, amount, now):
+        self._refill(now)
+        return self.tokens + 1e-9 >= min(amount, self.capacity)  # tolerate float error after waiting exactly wait_time
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def wait_time(self, amount, now):
+        self._refill(now)
+        return max(min(amount, self.capacity) - self.tokens, 0.0) / self.rate
+
+
+# Global and per-user request and token budgets, checked and charged together
+class RateLimits:
+    def __init__(self, clock, rpm=GLOBAL_RPM, tpm=GLOBAL_TPM, user_rpm=USER_RPM, user_tpm=USER_TPM,
+                 burst_seconds=BURST_SECONDS):
+        now = clock.time()
+        self.requests = TokenBucket(rpm, now, burst_seconds)
+        self.tokens = TokenBucket(tpm, now, burst_seconds)
+        self.user_rpm = user_rpm
+        self.user_tpm = user_tpm
+        self.burst_seconds = burst_seconds
+        self.users = OrderedDict()  # user -> (requests bucket, tokens bucket), least recently used first
+
+    def _user(self, user, now):
+        buckets = self.users.get(user)
+        if buckets is None:
+            if len(self.users) >= MAX_TRACKED_USERS:
+                self.users.popitem(last=False)
+            buckets = self.users[user] = (TokenBucket(self.user_rpm, now, self.burst_seconds),
+                                          TokenBucket(self.user_tpm, now, self.burst_seconds))
+        self.users.move_to_end(user)
+        return buckets
+
+    def global_allows(self, tokens, now):
+        return self.requests.has(1, now) and self.tokens.has(tokens, now)
+
+    def allows(self, user, tokens, now):
+        user_requests, user_tokens = self._user(user, now)
+        return self.global_allows(tokens, now) and user_requests.has(1, now) and user_tokens.has(tokens, now)
+
+    def charge(self, user, tokens, now):
+        user_requests, user_tokens = self._user(user, now)
+        for bucket, amount in ((self.requests, 1), (self.tokens, tokens), (user_requests, 1), (user_tokens, tokens)):
+            bucket.take(amount, now)
+
+    def wait_time(self, user, tokens, now):
+        user_requests, user_tokens = self._user(user, now)
+        return max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now),
+                   user_requests.wait_time(1, now), user_tokens.wait_time(tokens, now))
+
+
+class Ticket:
+    __slots__ = ("user", "priority", "tokens", "enqueued_at", "admitted")
+
+    def __init__(self, user, priority, tokens, enqueued_at):
+        self.user = user
+        self.priority = priority
+        self.tokens = tokens
+        self.enqueued_at = enqueued_at
+        self.admitted = False
+
+
+# Queue wait times (the most recent samples, in seconds) and outcomes for one priority class
+class ClassStats:
+    def __init__(self, window=1000):
+        self.waits = deque(maxlen=window)
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def record_wait(self, seconds):
+        self.waits.append(seconds)
+        self.admitted += 1
+
+    def snapshot(self):
+        waits = sorted(self.waits)
+
+        def percentile(q):
+            return waits[min(int(q / 100 * len(waits)), len(waits) - 1)] if waits else 0.0
+
+        return {
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "mean_wait": sum(waits) / len(waits) if waits else 0.0,
+            "p50_wait": percentile(50),
+            "p95_wait": percentile(95),
+            "max_wait": waits[-1] if waits else 0.0,
+        }
+
+
+class Scheduler:
+    def __init__(self, clock=None, queue_limits=None, **limits):
+        self.clock = clock or MonotonicClock()
+        self.limits = RateLimits(self.clock, **limits)
+        self.queue_limits = dict(QUEUE_LIMITS, **(queue_limits or {}))
+        self.queues = {priority: deque() for priority in sorted(self.queue_limits)}
+        self.stats = {priority: ClassStats() for priority in self.queues}
+        self.condition = threading.Condition()
+
+    # Queue a request; raises QueueFull when its class is at capacity
+    def submit(self, user, priority=NORMAL, tokens=1):
+        with self.condition:
+            queue = self.queues[priority]
+            if len(queue) >= self.queue_limits[priority]:
+                self.stats[priority].rejected += 1
+                raise QueueFull(f"The {PRIORITY_NAMES.get(priority, priority)} queue is full")
+            ticket = Ticket(user, priority, tokens, self.clock.time())
+            queue.append(ticket)
+            return ticket
+
+    # Admit every queued request the budgets allow right now, highest priority first.
+    # A request held back only by its own user's budget does not block the rest of its class.
+    def dispatch(self):
+        admitted = []
+        with self.condition:
+            now = self.clock.time()
+            for priority, queue in self.queues.items():
+                for ticket in list(queue):
+                    if not self.limits.global_allows(ticket.tokens, now):
+                        break
+                    if not self.limits.allows(ticket.user, ticket.tokens, now):
+                        continue
+                    self.limits.charge(ticket.user, ticket.tokens, now)
+                    queue.remove(ticket)
+                    ticket.admitted = True
+                    self.stats[priority].record_wait(now - ticket.enqueued_at)
+                    admitted.append(ticket)
+                else:
+                    continue
+                break  # the global budget is spent; lower classes wait too
+            if admitted:
+                self.condition.notify_all()
+        return admitted
+
+    # Seconds until some queued request could be admitted (None when nothing is queued)
+    def next_wait(self):
+        with self.condition:
+            now = self.clock.time()
+            waits = [self.limits.wait_time(ticket.user, ticket.tokens, now)
+                     for queue in self.queues.values() for ticket in queue]
+        return min(waits) if waits else None
+
+    def cancel(self, ticket):
+        with self.condition:
+            queue = self.queues[ticket.priority]
+            if ticket in queue:
+                queue.remove(ticket)
+                self.stats[ticket.priority].timed_out += 1
+                self.condition.notify_all()
+
+    # Admit immediately if nobody is queued and the budgets allow it (used for optional extra requests)
+    def try_acquire(self, user, priority=BACKGROUND, tokens=1):
+        with self.condition:
+            now = self.clock.time()
+            if any(self.queues.values()) or not self.limits.allows(user, tokens, now):
+                return False
+            self.limits.charge(user, tokens, now)
+            self.stats[priority].record_wait(0.0)
+            return True
+
+    # Block until the request is admitted; raises QueueFull or AdmissionTimeout
+    def acquire(self, user, priority=NORMAL, tokens=1, timeout=None):
+        ticket = self.submit(user, priority, tokens)
+        expires = None if timeout is None else self.clock.time() + timeout
+        with self.condition:
+            while True:
+                self.dispatch()
+                if ticket.admitted:
+                    return ticket
+                wait = self.next_wait()
+                if expires is not None:
+                    remaining = expires - self.clock.time()
+                    if remaining <= 0:
+                        self.cancel(ticket)
+                        raise AdmissionTimeout("Timed out waiting for model quota")
+                    wait = remaining if wait is None else min(wait, remaining)
+                self.condition.wait(wait)
+
+    def queue_lengths(self):
+        with self.condition:
+            return {PRIORITY_NAMES.get(priority, priority): len(queue) for priority, queue in self.queues.items()}
+
+    def snapshot(self):
+        with self.condition:
+            return {PRIORITY_NAMES.get(priority, priority): stats.snapshot() for priority, stats in self.stats.items()}
+
+    def summary(self):
+        lines = [f"{'class':<12} {'admitted':>8} {'p50 wait s':>11} {'p95 wait s':>11} {'max wait s':>11} {'rejected':>9} {'timed out':>10}"]
+        for name, row in self.snapshot().items():
+            lines.append(f"{name:<12} {row['admitted']:>8} {row['p50_wait']:>11.2f} {row['p95_wait']:>11.2f} "
+                         f"{row['max_wait']:>11.2f} {row['rejected']:>9} {row['timed_out']:>10}")
+        return "\n".join(lines)
@@ -0,0 +1,262 @@
+# Async conversation service.
+# Serves the generate_empathetic_response flow to many concurrent conversations from one process.
+# Every session shares one GeminiClient (and the SDK connection behind it) and has its own
+# conversation memory. A session's messages are answered strictly in the order they arrive,
+# while different sessions run concurrently on a bounded worker pool.
+#   python service.py [--host 127.0.0.1] [--port 8080]
+#
+#   POST   /sessions/<id>/messages   {"text": "..."} -> {"session_id", "turn", "reply", "latency_ms"}
+#          ?stream=1 returns newline-delimited JSON: {"text": chunk} lines, then the final object
+#   WS     /sessions/<id>/ws         send text, receive {"type": "chunk"} messages then {"type": "reply"}
+#   DELETE /sessions/<id>            end the session
+#   GET    /health                   session and request counts
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import tracing
+
+SERVICE_WORKERS = int(os.environ.get("SERVICE_WORKERS", "256"))  # turns generated at once across all sessions
+SESSION_IDLE_SECONDS = float(os.environ.get("SESSION_IDLE_SECONDS", "1800"))
+MAX_SESSIONS = int(os.environ.get("MAX_SESSIONS", "5000"))
+MAX_MESSAGE_CHARS = 4000
+SWEEP_SECONDS = 60
+
+
+class Session:
+    def __init__(self, session_id, memory):
+        self.id = session_id
+        self.memory = memory
+        self.lock = asyncio.Lock()  # waiters are woken first-come, first-served
+        self.pending = 0
+        self.turns = 0
+        self.last_active = time.monotonic()
+
+    def idle_for(self):
+        return time.monotonic() - self.last_active
+
+
+class ConversationService:
+    # respond(text, on_text=None, memory=None, user_id=None) and make_memory(session_id) default to
+    # the engine's flow and shared client
+    def __init__(self, respond=None, make_memory=None, workers=SERVICE_WORKERS,
+                 idle_seconds=SESSION_IDLE_SECONDS, max_sessions=MAX_SESSIONS):
+        if respond is None or make_memory is None:
+            import engine
+            from memory import ConversationMemory
+
+            if not engine.api_key:
+                raise ValueError(engine.MISSING_API_KEY)
+            respond = respond or engine.generate_empathetic_response
+            make_memory = make_memory or (lambda session_id: ConversationMemory(
+                summarize=engine.summarizer(session_id)
+            ))
+        self.respond = respond
+        self.make_memory = make_memory
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="turn")
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+
+    def session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            if len(self.sessions) >= self.max_sessions:
+                self._evict_one()
+            session = self.sessions[session_id] = Session(session_id, self.make_memory(session_id))
+        return session
+
+    # Drop the least recently active session that has nothing queued
+    def _evict_one(self):
+        idle = [session for session in self.sessions.values() if not session.pending]
+        if not idle:
+            raise RuntimeError("Too many active sessions")
+        del self.sessions[min(idle, key=lambda session: session.last_active).id]
+
+    def end_session(self, session_id):
+        return self.sessions.pop(session_id, None) is not None
+
+    def _generate(self, session, text, on_text):
+        with tracing.turn(channel="service", session=session.id):
+            return self.respond(text, on_text=on_text, memory=session.memory, user_id=session.id)
+
+    # Answer one message; on_text (called on the event loop) receives chunks as they stream in
+    async def reply(self, session_id, text, on_text=None):
+        session = self.session(session_id)
+        session.pending += 1
+        try:
+            async with session.lock:
+                loop = asyncio.get_running_loop()
+                forward = None
+                if on_text:
+                    forward = lambda chunk: loop.call_soon_threadsafe(on_text, chunk)
+                self.in_flight += 1
+                try:
+                    reply = await loop.run_in_executor(self.executor, self._generate, session, text, forward)
+                except Exception:
+                    self.failed += 1
+                    raise
+                finally:
+                    self.in_flight -= 1
+                session.turns += 1
+                self.completed += 1
+                return session.turns, reply
+        finally:
+            session.pending -= 1
+            session.last_active = time.monotonic()
+
+    # Periodically forget sessions nobody has written to for idle_seconds
+    async def sweep(self, interval=SWEEP_SECONDS):
+        while True:
+            await asyncio.sleep(interval)
+            for session in list(self.sessions.values()):
+                if not session.pending and session.idle_for() >= self.idle_seconds:
+                    self.sessions.pop(session.id, None)
+
+    def stats(self):
+        return {
+            "sessions": len(self.sessions),
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+# Function to build the tornado application (tornado ships with streamlit)
+def make_app(service):
+    import tornado.web
+    import tornado.websocket
+
+    def read_text(payload):
+        text = str(payload.get("text", "")).strip() if isinstance(payload, dict) else ""
+        if not text or len(text) > MAX_MESSAGE_CHARS:
+            raise ValueError(f"'text' must be between 1 and {MAX_MESSAGE_CHARS} characters")
+        return text
+
+    class JsonHandler(tornado.web.RequestHandler):
+        def send_json(self, payload, status=200):
+            self.set_status(status)
+            self.set_header("Content-Type", "application/json")
+            self.finish(json.dumps(payload))
+
+        def write_error(self, status_code, **kwargs):
+            self.send_json({"error": self._reason}, status_code)
+
+    class MessageHandler(JsonHandler):
+        async def post(self, session_id):
+            try:
+                text = read_text(json.loads(self.request.body or b"{}"))
+            except ValueError as e:
+                return self.send_json({"error": str(e)}, 400)
+
+            start = time.perf_counter()
+            if self.get_query_argument("stream", "0") not in ("1", "true"):
+                turn, reply = await service.reply(session_id, text)
+                return self.send_json({"session_id": session_id, "turn": turn, "reply": reply,
+                                       "latency_ms": round((time.perf_counter() - start) * 1000, 1)})
+
+            # Newline-delimited JSON, flushed chunk by chunk
+            self.set_header("Content-Type", "application/x-ndjson")
+            chunks = asyncio.Queue()
+            task = asyncio.ensure_future(service.reply(session_id, text, on_text=chunks.put_nowait))
+            while not task.done():
+                getter = asyncio.ensure_future(chunks.get())
+                await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    break
+                self.write(json.dumps({"text": getter.result()}) + "\n")
+                await self.flush()
+            while not chunks.empty():
+                self.write(json.dumps({"text": chunks.get_nowait()}) + "\n")
+            try:
+                turn, reply = task.result()
+                final = {"session_id": session_id, "turn": turn, "reply": reply, "done": True,
+                         "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+            except Exception as e:
+                final = {"error": str(e), "done": True}
+            self.finish(json.dumps(final) + "\n")
+
+    class SessionHandler(JsonHandler):
+        def delete(self, session_id):
+            self.send_json({"session_id": session_id, "ended": service.end_session(session_id)})
+
+    class HealthHandler(JsonHandler):
+        def get(self):
+            self.send_json(service.stats())
+
+    class ConversationSocket(tornado.websocket.WebSocketHandler):
+        def open(self, session_id):
+            self.session_id = session_id
+
+        async def on_message(self, message):
+            try:
+                text = read_text(json.loads(message) if message.lstrip().startswith("{") else {"text": message})
+            except ValueError as e:
+                return self.write_message({"type": "error", "error": str(e)})
+
+            start = time.perf_counter()
+            try:
+                turn, reply = await service.reply(self.session_id, text, on_text=self.send_chunk)
+            except Exception as e:
+                return self.send({"type": "error", "error": str(e)})
+            self.send({"type": "reply", "turn": turn, "reply": reply,
+                       "latency_ms": round((time.perf_counter() - start) * 1000, 1)})
+
+        def send_chunk(self, chunk):
+            self.send({"type": "chunk", "text": chunk})
+
+        # The client may hang up mid-reply; the turn still finishes and is remembered
+        def send(self, payload):
+            try:
+                self.write_message(payload)
+            except tornado.websocket.WebSocketClosedError:
+                pass
+
+    return tornado.web.Application([
+        (r"/sessions/([\w.-]{1,128})/messages", MessageHandler),
+        (r"/sessions/([\w.-]{1,128})/ws", ConversationSocket),
+        (r"/sessions/([\w.-]{1,128})", SessionHandler),
+        (r"/health", HealthHandler),
+    ])
+
+
+# Function to start serving on the running event loop; returns the server and the bound port (port=0 picks one)
+def start_server(service, host="127.0.0.1", port=8080):
+    import tornado.httpserver
+    import tornado.netutil
+
+    sockets = tornado.netutil.bind_sockets(port, address=host)
+    server = tornado.httpserver.HTTPServer(make_app(service), idle_connection_timeout=SESSION_IDLE_SECONDS)
+    server.add_sockets(sockets)
+    return server, sockets[0].getsockname()[1]
+
+
+async def serve(host, port):
+    service = ConversationService()
+    _, port = start_server(service, host, port)
+    print(f"Cotton service listening on http://{host}:{port}")
+    await service.sweep()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
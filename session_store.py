@@ -0,0 +1,301 @@
+# Append-only, compressed conversation log per session.
+# Each message is one zlib-compressed frame (a preset dictionary of common chat wording keeps
+# short messages small) appended to <session>.log, and its byte offset is appended to
+# <session>.idx as a fixed-width integer. Reading the last N messages therefore costs two
+# seeks and O(N) bytes no matter how long the conversation is, and only a bounded window of
+# recent messages is held in memory. A write cut short by a crash is repaired on open.
+# A log whose files were closed to free handles reopens them on its next read or append.
+import io
+import json
+import os
+import re
+import struct
+import threading
+import time
+import uuid
+import weakref
+import zlib
+from collections import OrderedDict, deque
+
+SESSION_DIR = os.environ.get("SESSION_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".sessions"))
+RECENT_WINDOW = int(os.environ.get("SESSION_RECENT_WINDOW", "20"))  # messages kept in memory per open session
+SESSION_FSYNC = os.environ.get("SESSION_FSYNC", "0").lower() in ("1", "true", "yes")
+MAX_OPEN_SESSIONS = 256
+SESSION_ID_PATTERN = re.compile(r"^[\w.-]{1,128}$")
+# IDs handed out to web visitors (new_session_id); a URL may only name one of these
+ISSUED_SESSION_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# Each front end keeps its logs in its own subdirectory of SESSION_DIR, so no web URL can name a CLI log
+CLI_NAMESPACE = "cli"
+WEB_NAMESPACE = "web"
+
+FRAME_HEADER = struct.Struct("<I")  # compressed length
+INDEX_ENTRY = struct.Struct("<Q")  # frame offset in the log
+
+# Preset compression dictionary: wording that shows up in most conversations
+COMPRESSION_DICTIONARY = (
+    '{"role": "assistant", "content": "{"role": "user", "content": "", "ts": '
+    "I'm here for you. That sounds really hard, and it makes sense you feel this way. "
+    "I hear you. It's completely understandable to feel anxious, overwhelmed, stressed or sad. "
+    "Would you like to talk about what's been on your mind? How are you feeling today? "
+    "Successfully booked an appointment with Dr. at You'll receive a confirmation email shortly. "
+    "I'm really glad you're reaching out for support. Is there anything you'd like to talk about "
+    "before your session? I've been feeling really lately and I don't know what to do about my work, "
+    "my family, my sleep. Thank you for sharing that with me. "
+).encode("utf-8")
+
+
+def valid_session_id(session_id):
+    return bool(session_id) and bool(SESSION_ID_PATTERN.match(session_id))
+
+
+# Function to make a session ID for a new web visitor: 128 random bits, so it cannot be guessed
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+# Function to tell whether an ID from a URL could have come from new_session_id
+def issued_session_id(session_id):
+    return bool(session_id) and bool(ISSUED_SESSION_ID_PATTERN.match(session_id))
+
+
+# Function to encode one message as a length-prefixed compressed frame
+def encode_frame(message):
+    compressor = zlib.compressobj(6, zdict=COMPRESSION_DICTIONARY)
+    payload = compressor.compress(json.dumps(message, ensure_ascii=False).encode("utf-8")) + compressor.flush()
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+# Function to decode the consecutive frames in data
+def decode_frames(data):
+    messages = []
+    position = 0
+    while position < len(data):
+        (length,) = FRAME_HEADER.unpack_from(data, position)
+        position += FRAME_HEADER.size
+        decompressor = zlib.decompressobj(zdict=COMPRESSION_DICTIONARY)
+        messages.append(json.loads(decompressor.decompress(data[position:position + length])))
+        position += length
+    return messages
+
+
+class SessionLog:
+    # With directory=None the log is kept in memory (same format, nothing survives a restart).
+    # on_reopen(log) is called after a closed log has reopened its files.
+    def __init__(self, session_id, directory=SESSION_DIR, window=RECENT_WINDOW, on_reopen=None):
+        if not valid_session_id(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        self.session_id = session_id
+        self.lock = threading.Lock()
+        self.on_reopen = on_reopen
+        self.deleted = False
+        self.base = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.base = os.path.join(directory, session_id)
+            self._open_files()
+        else:
+            self.log = io.BytesIO()
+            self.index = io.BytesIO()
+        self._recover()
+        self.recent = deque(self.tail(window), maxlen=window)
+
+    def _open_files(self):
+        self.log = open(f"{self.base}.log", "a+b")
+        self.index = open(f"{self.base}.idx", "a+b")
+
+    # Reopen the files if close() released them; returns whether it did. Call with the lock held.
+    def _reopen(self):
+        if self.log is not None:
+            return False
+        if self.deleted or self.base is None:
+            raise ValueError(f"Session {self.session_id} is closed")
+        self._open_files()
+        return True
+
+    # Drop index entries whose frames are not fully in the log, index frames written after the
+    # last entry, and cut off a frame that was only partly written
+    def _recover(self):
+        self.log_size = self.log.seek(0, os.SEEK_END)
+        self.count = self.index.seek(0, os.SEEK_END) // INDEX_ENTRY.size
+        end = 0
+        while self.count:
+            end = self._frame_end(self._offset(self.count - 1))
+            if end is not None:
+                break
+            self.count -= 1
+        end = end or 0
+        self.index.truncate(self.count * INDEX_ENTRY.size)
+
+        orphans = []
+        frame_end = self._frame_end(end)
+        while frame_end is not None:
+            orphans.append(end)
+            end, frame_end = frame_end, self._frame_end(frame_end)
+        if end < self.log_size:
+            self.log.truncate(end)
+            self.log_size = end
+        if orphans:
+            self.index.seek(0, os.SEEK_END)
+            self.index.write(b"".join(INDEX_ENTRY.pack(offset) for offset in orphans))
+            self.count += len(orphans)
+        self.log.flush()
+        self.index.flush()
+
+    def _offset(self, position):
+        self.index.seek(position * INDEX_ENTRY.size)
+        return INDEX_ENTRY.unpack(self.index.read(INDEX_ENTRY.size))[0]
+
+    # Where the frame starting at offset ends, or None if it is not completely in the log
+    def _frame_end(self, offset):
+        if offset + FRAME_HEADER.size > self.log_size:
+            return None
+        self.log.seek(offset)
+        end = offset + FRAME_HEADER.size + FRAME_HEADER.unpack(self.log.read(FRAME_HEADER.size))[0]
+        return end if end <= self.log_size else None
+
+    def __len__(self):
+        return self.count
+
+    # Append one message; returns its position in the session
+    def append(self, role, content, **fields):
+        message = dict(fields, role=role, content=content, ts=round(time.time(), 3))
+        frame = encode_frame(message)
+        with self.lock:
+            reopened = self._reopen()
+            # Log first, then index: a crash in between leaves an orphan frame that _recover re-indexes
+            self.log.seek(0, os.SEEK_END)
+            self.log.write(frame)
+            self.log.flush()
+            self.index.seek(0, os.SEEK_END)
+            self.index.write(INDEX_ENTRY.pack(self.log_size))
+            self.index.flush()
+            if SESSION_FSYNC and hasattr(self.log, "fileno"):
+                os.fsync(self.log.fileno())
+                os.fsync(self.index.fileno())
+            self.log_size += len(frame)
+            self.count += 1
+            self.recent.append(message)
+            position = self.count - 1
+        if reopened and self.on_reopen:
+            self.on_reopen(self)
+        return position
+
+    # Messages start..stop-1 (oldest is 0), read with one index read and one log read
+    def read(self, start, stop=None):
+        with self.lock:
+            stop = self.count if stop is None else min(stop, self.count)
+            start = max(start, 0)
+            if start >= stop:
+                return []
+            reopened = self._reopen()
+            self.index.seek(start * INDEX_ENTRY.size)
+            entries = self.index.read((stop - start + (stop < self.count)) * INDEX_ENTRY.size)
+            offsets = [offset for (offset,) in INDEX_ENTRY.iter_unpack(entries)]
+            end = offsets.pop() if stop < self.count else self.log_size
+            self.log.seek(offsets[0])
+            data = self.log.read(end - offsets[0])
+        if reopened and self.on_reopen:
+            self.on_reopen(self)
+        return decode_frames(data)
+
+    # The last n messages
+    def tail(self, n):
+        return self.read(self.count - n) if n > 0 else []
+
+    # Release the file handles; a log on disk reopens them when it is next used, unless deleted
+    def close(self, deleted=False):
+        with self.lock:
+            self.deleted = self.deleted or deleted
+            if self.log is not None:
+                self.log.close()
+                self.index.close()
+            if self.base is not None:
+                self.log = self.index = None
+
+
+# Opens session logs on demand, keeping a bounded number of file handles open. Every session has
+# one SessionLog while anyone holds it; the least recently used ones only give up their files.
+# A namespace (CLI_NAMESPACE, WEB_NAMESPACE) keeps the logs in that subdirectory of directory.
+class SessionStore:
+    def __init__(self, directory=SESSION_DIR, window=RECENT_WINDOW, max_open=MAX_OPEN_SESSIONS, namespace=None):
+        if directory and namespace:
+            directory = os.path.join(directory, namespace)
+        self.directory = directory or None
+        self.window = window
+        self.max_open = max_open
+        self.open_logs = OrderedDict()  # session id -> SessionLog with open files, least recently used first
+        self.logs = weakref.WeakValueDictionary()  # session id -> every SessionLog still in use
+        self.lock = threading.Lock()
+
+    def open(self, session_id):
+        with self.lock:
+            log = self.open_logs.get(session_id) or self.logs.get(session_id)
+            if log is None:
+                log = SessionLog(session_id, self.directory, self.window, on_reopen=self._reopened)
+                self.logs[session_id] = log
+            evicted = self._track(log)
+        if evicted is not None:
+            evicted.close()
+        return log
+
+    # Put a log at the recently used end; returns the log to close to stay under max_open, if any.
+    # Call with the lock held.
+    def _track(self, log):
+        self.open_logs[log.session_id] = log
+        self.open_logs.move_to_end(log.session_id)
+        # In-memory logs are the only copy, so they are never closed to free a slot
+        if self.directory and len(self.open_logs) > self.max_open:
+            return self.open_logs.popitem(last=False)[1]
+        return None
+
+    # A log that was closed to free a slot has been used again
+    def _reopened(self, log):
+        with self.lock:
+            evicted = self._track(log) if not log.deleted else None
+        if evicted is not None:
+            evicted.close()
+
+    def exists(self, session_id):
+        if session_id in self.open_logs or session_id in self.logs:
+            return True
+        return bool(self.directory) and valid_session_id(session_id) and \
+            os.path.exists(os.path.join(self.directory, f"{session_id}.log"))
+
+    def sessions(self):
+        if not self.directory or not os.path.isdir(self.directory):
+            return sorted(self.open_logs)
+        return sorted(name[:-4] for name in os.listdir(self.directory) if name.endswith(".log"))
+
+    def delete(self, session_id):
+        with self.lock:
+            log = self.open_logs.pop(session_id, None) or self.logs.get(session_id)
+            self.logs.pop(session_id, None)
+        if log is not None:
+            log.close(deleted=True)
+        if self.directory and valid_session_id(session_id):
+            for suffix in (".log", ".idx"):
+                try:
+                    os.remove(os.path.join(self.directory, session_id + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def close(self):
+        with self.lock:
+            logs = list(self.open_logs.values())
+            self.open_logs.clear()
+        for log in logs:
+            log.close()
+
+
+# Function to pair stored messages back into (user_text, bot_text) exchanges, e.g. to restore memory
+def exchanges(messages):
+    turns = []
+    user_text = None
+    for message in messages:
+        if message.get("role") == "user":
+            user_text = message.get("content", "")
+        elif user_text is not None:
+            turns.append((user_text, message.get("content", "")))
+            user_text = None
+    return turns
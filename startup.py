@@ -0,0 +1,49 @@
+# Helpers that keep CLI startup fast by moving slow setup off the main thread
+import threading
+
+
+# Runs a function on a daemon thread; result() waits for it and re-raises any error
+class BackgroundTask:
+    def __init__(self, target, *args, **kwargs):
+        self._done = threading.Event()
+        self._value = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=(target, args, kwargs), daemon=True)
+        self._thread.start()
+
+    def _run(self, target, args, kwargs):
+        try:
+            self._value = target(*args, **kwargs)
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._done.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("Background task did not finish in time")
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+# Stands in for a GenerativeModel that is still being configured in the background.
+# Attribute access waits for the real model, so callers can use it like the model itself.
+class LazyModel:
+    def __init__(self, factory):
+        self._factory = factory
+        self._task = None
+        self._lock = threading.Lock()
+
+    # Start building the model without waiting for it
+    def start(self):
+        with self._lock:
+            if self._task is None:
+                self._task = BackgroundTask(self._factory)
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self.start()._task.result(), name)
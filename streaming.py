@@ -0,0 +1,77 @@
+# Streaming helpers for Gemini responses
+import os
+import time
+from collections import deque
+import tracing
+
+# Streaming is on by default; set STREAM_RESPONSES=0 to fall back to blocking calls
+STREAMING_ENABLED = os.environ.get("STREAM_RESPONSES", "1").lower() not in ("0", "false", "no")
+
+# Print time-to-first-token after each streamed response (useful when tuning)
+SHOW_LATENCY = os.environ.get("SHOW_LATENCY", "0").lower() in ("1", "true", "yes")
+
+# Recent time-to-first-token samples (seconds), newest last
+ttft_history = deque(maxlen=100)
+
+# Result of a streamed generation
+class StreamResult:
+    def __init__(self):
+        self.text = ""
+        self.function_calls = []
+        self.ttft = None  # seconds until the first chunk with content arrived
+        self.total = None  # seconds until the stream finished
+        self.chunks = 0
+
+# Function to pull the parts out of a streamed chunk
+def _chunk_parts(chunk):
+    candidates = getattr(chunk, "candidates", None)
+    if not candidates:
+        return []
+    content = getattr(candidates[0], "content", None)
+    return getattr(content, "parts", None) or []
+
+# Function to consume a streamed response, forwarding text to on_text as it arrives.
+# Once the model calls a function, no more text is forwarded, but the stream is still read to the
+# end: the chat session only records the turn (and will only accept the function response) once
+# its stream has completed. Calls in later chunks are collected too.
+def consume_stream(response, on_text=None, start=None):
+    result = StreamResult()
+    if start is None:
+        start = time.perf_counter()
+
+    for chunk in response:
+        result.chunks += 1
+        for part in _chunk_parts(chunk):
+            function_call = getattr(part, "function_call", None)
+            if function_call is not None and function_call.name:
+                if result.ttft is None:
+                    result.ttft = time.perf_counter() - start
+                result.function_calls.append(function_call)
+                continue
+
+            text = getattr(part, "text", "")
+            if not text or result.function_calls:
+                continue
+            if result.ttft is None:
+                result.ttft = time.perf_counter() - start
+            result.text += text
+            if on_text:
+                on_text(text)
+
+    result.total = time.perf_counter() - start
+    if result.ttft is not None:
+        ttft_history.append(result.ttft)
+        tracing.observe("model.first_token", result.ttft * 1000)
+    if SHOW_LATENCY and result.ttft is not None:
+        print(f"\n[latency] first token {result.ttft * 1000:.0f} ms, full response {result.total * 1000:.0f} ms")
+    return result
+
+# Function to stream a one-off generate_content call
+def stream_generate(model, prompt, on_text=None, **kwargs):
+    start = time.perf_counter()
+    return consume_stream(model.generate_content(prompt, stream=True, **kwargs), on_text, start)
+
+# Function to stream a message sent in a chat session
+def stream_chat(chat, message, on_text=None, **kwargs):
+    start = time.perf_counter()
+    return consume_stream(chat.send_message(message, stream=True, **kwargs), on_text, start)
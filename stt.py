@@ -0,0 +1,317 @@
+# Pluggable speech-to-text backends.
+# Pick one with STT_BACKEND: "google" (network, default), or one of the fully local
+# engines "vosk", "whisper" (faster-whisper) and "sphinx" (PocketSphinx).
+# Every backend takes an sr.AudioData and returns text, raising sr.UnknownValueError when
+# nothing was understood and sr.RequestError when the engine is unavailable.
+# Long utterances are cut at pauses and the segments recognized concurrently (SegmentedTranscription),
+# starting while the user is still talking.
+import array
+import json
+import math
+import operator
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import tracing
+
+STT_BACKEND = os.environ.get("STT_BACKEND", "google").lower()
+STT_LANGUAGE = os.environ.get("STT_LANGUAGE", "en-US")
+VOSK_MODEL_PATH = os.environ.get("VOSK_MODEL_PATH", "model")
+WHISPER_MODEL = os.environ.get("WHISPER_MODEL", "base.en")
+
+# Segmented recognition: segments run on a pool of STT_WORKERS threads (processes for engines that
+# hold the GIL while decoding, so they neither serialize nor stall the microphone). A pause of
+# SEGMENT_PAUSE_SECONDS ends a segment once it holds SEGMENT_MIN_SECONDS of audio, and a segment
+# with no pause at all is cut at SEGMENT_MAX_SECONDS (see VoiceListener.record_utterance).
+STT_WORKERS = int(os.environ.get("STT_WORKERS", "4"))
+SEGMENT_MIN_SECONDS = float(os.environ.get("STT_SEGMENT_MIN_SECONDS", "4"))
+SEGMENT_PAUSE_SECONDS = float(os.environ.get("STT_SEGMENT_PAUSE_SECONDS", "0.3"))
+SEGMENT_MAX_SECONDS = 15.0
+
+
+# Audio helpers built on the array module (audioop was deprecated in Python 3.11 and removed in 3.13).
+# Function to measure the loudness of 16-bit little-endian mono PCM: the root mean square of its samples
+def rms(pcm):
+    samples = array.array("h")
+    samples.frombytes(pcm[:len(pcm) - len(pcm) % 2])
+    if sys.byteorder == "big":
+        samples.byteswap()
+    if not samples:
+        return 0
+    return int(math.sqrt(sum(map(operator.mul, samples, samples)) / len(samples)))
+
+
+# Function to get an sr.AudioData's frames as 16-bit little-endian mono PCM at sample_rate.
+# Wider samples keep their two most significant bytes; the rate is changed by linear interpolation.
+def pcm16(audio, sample_rate):
+    data, width = audio.frame_data, audio.sample_width
+    if width == 2:
+        pcm = data
+    else:
+        count = len(data) // width
+        pcm = bytearray(2 * count)
+        if width == 1:
+            pcm[1::2] = data[:count]
+        else:
+            pcm[0::2] = data[width - 2:count * width:width]
+            pcm[1::2] = data[width - 1:count * width:width]
+        pcm = bytes(pcm)
+    if audio.sample_rate == sample_rate:
+        return pcm
+
+    samples = array.array("h")
+    samples.frombytes(pcm[:len(pcm) - len(pcm) % 2])
+    if sys.byteorder == "big":
+        samples.byteswap()
+    step = audio.sample_rate / sample_rate
+    if step.is_integer():
+        resampled = samples[::int(step)]  # e.g. 48 kHz to 16 kHz: every interpolation point is a sample
+    else:
+        last = len(samples) - 1
+        resampled = array.array("h", bytes(2 * int(len(samples) / step)))
+        for i in range(len(resampled)):
+            position = i * step
+            index = int(position)
+            sample = samples[index]
+            resampled[i] = int(sample + (samples[min(index + 1, last)] - sample) * (position - index))
+    if sys.byteorder == "big":
+        resampled.byteswap()
+    return resampled.tobytes()
+
+# Google Web Speech API (what listen_to_user has always used); needs a network connection
+class GoogleBackend:
+    name = "google"
+    local = False
+    holds_gil = False
+
+    def __init__(self):
+        import speech_recognition as sr
+
+        self.recognizer = sr.Recognizer()
+
+    def transcribe(self, audio):
+        return self.recognizer.recognize_google(audio, language=STT_LANGUAGE)
+
+
+# Vosk (Kaldi) running locally; the model directory is loaded once per process
+class VoskBackend:
+    name = "vosk"
+    local = True
+    holds_gil = False
+    SAMPLE_RATE = 16000
+
+    def __init__(self, model_path=VOSK_MODEL_PATH):
+        import speech_recognition as sr
+
+        try:
+            from vosk import Model, SetLogLevel
+        except ImportError:
+            raise sr.RequestError("missing vosk module: ensure that vosk is set up correctly (pip install vosk).")
+        if not os.path.isdir(model_path):
+            raise sr.RequestError(f"Vosk model not found at '{model_path}'. Download one from https://alphacephei.com/vosk/models and set VOSK_MODEL_PATH.")
+        SetLogLevel(-1)
+        self.model = Model(model_path)
+
+    def transcribe(self, audio):
+        import speech_recognition as sr
+        from vosk import KaldiRecognizer
+
+        recognizer = KaldiRecognizer(self.model, self.SAMPLE_RATE)
+        recognizer.AcceptWaveform(pcm16(audio, self.SAMPLE_RATE))
+        text = json.loads(recognizer.FinalResult()).get("text", "").strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+# faster-whisper running locally. SpeechRecognition's recognize_faster_whisper reloads the
+# model on every call, so the model is built once here and reused.
+class WhisperBackend:
+    name = "whisper"
+    local = True
+    holds_gil = False
+
+    def __init__(self, model_name=WHISPER_MODEL):
+        import speech_recognition as sr
+
+        try:
+            from faster_whisper import WhisperModel
+            from speech_recognition.recognizers.whisper_local.base import WhisperCompatibleRecognizer
+            from speech_recognition.recognizers.whisper_local.faster_whisper import TranscribableAdapter
+        except ImportError:
+            raise sr.RequestError("missing faster-whisper module: ensure that faster-whisper is set up correctly (pip install faster-whisper soundfile).")
+        model = WhisperModel(model_name, device="cpu", compute_type="int8")
+        self.recognizer = WhisperCompatibleRecognizer(TranscribableAdapter(model))
+        self.language = STT_LANGUAGE.split("-")[0]
+
+    def transcribe(self, audio):
+        import speech_recognition as sr
+
+        text = self.recognizer.recognize(audio, language=self.language).strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+# CMU PocketSphinx running locally (lowest accuracy, smallest footprint).
+# recognize_sphinx builds a new decoder (about half a second) on every call, so each worker thread
+# keeps its own decoder and reuses it.
+class SphinxBackend:
+    name = "sphinx"
+    local = True
+    holds_gil = True
+    SAMPLE_RATE = 16000
+
+    def __init__(self):
+        import speech_recognition as sr
+
+        try:
+            import pocketsphinx  # noqa: F401
+        except ImportError:
+            raise sr.RequestError("missing PocketSphinx module: ensure that PocketSphinx is set up correctly (pip install pocketsphinx).")
+        self.data_directory = os.path.join(os.path.dirname(os.path.realpath(sr.__file__)), "pocketsphinx-data", STT_LANGUAGE)
+        if not os.path.isdir(self.data_directory):
+            raise sr.RequestError(f"missing PocketSphinx language data directory: '{self.data_directory}'")
+        self.decoders = threading.local()
+
+    def _decoder(self):
+        from pocketsphinx import pocketsphinx
+
+        if not hasattr(self.decoders, "decoder"):
+            config = pocketsphinx.Config()
+            config.set_string("-hmm", os.path.join(self.data_directory, "acoustic-model"))
+            config.set_string("-lm", os.path.join(self.data_directory, "language-model.lm.bin"))
+            config.set_string("-dict", os.path.join(self.data_directory, "pronounciation-dictionary.dict"))
+            config.set_string("-logfn", os.devnull)
+            self.decoders.decoder = pocketsphinx.Decoder(config)
+        return self.decoders.decoder
+
+    def warm(self):
+        self._decoder()
+
+    def transcribe(self, audio):
+        import speech_recognition as sr
+
+        decoder = self._decoder()
+        decoder.start_utt()
+        decoder.process_raw(pcm16(audio, self.SAMPLE_RATE), False, True)
+        decoder.end_utt()
+        hypothesis = decoder.hyp()
+        if hypothesis is None or not hypothesis.hypstr.strip():
+            raise sr.UnknownValueError()
+        return hypothesis.hypstr
+
+
+BACKENDS = {
+    "google": GoogleBackend,
+    "vosk": VoskBackend,
+    "whisper": WhisperBackend,
+    "sphinx": SphinxBackend,
+}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+# Function to get a backend by name (STT_BACKEND by default); each is built once per process
+def get_backend(name=None):
+    name = (name or STT_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown STT backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = BACKENDS[name]()
+        return _backends[name]
+
+
+_executors = {}
+
+
+# Function to get the worker pool for a backend: shared threads, or for an engine that holds the
+# GIL, its own processes that each build the backend once
+def get_pool(backend):
+    key = backend.name if backend.holds_gil else "threads"
+    with _backends_lock:
+        if key not in _executors:
+            if backend.holds_gil:
+                _executors[key] = ProcessPoolExecutor(max_workers=STT_WORKERS, initializer=_start_worker, initargs=(backend.name,))
+            else:
+                _executors[key] = ThreadPoolExecutor(max_workers=STT_WORKERS, thread_name_prefix="stt")
+        return _executors[key]
+
+
+# Function to start a backend's worker pool ahead of the first utterance (process workers load
+# their engine on start)
+def prewarm_pool(backend):
+    pool = get_pool(backend)
+    if backend.holds_gil:
+        for future in [pool.submit(_noop) for _ in range(STT_WORKERS)]:
+            future.result()
+
+
+def _noop():
+    return None
+
+
+# Function run when a worker process starts: build the backend and load its model
+def _start_worker(name):
+    backend = get_backend(name)
+    if hasattr(backend, "warm"):
+        backend.warm()
+
+
+# Function run in a worker process: recognize one segment with that process's backend
+def _transcribe_in_process(name, pcm, sample_rate, sample_width):
+    import speech_recognition as sr
+
+    try:
+        return get_backend(name).transcribe(sr.AudioData(pcm, sample_rate, sample_width))
+    except sr.UnknownValueError:
+        return ""
+
+
+# One utterance recognized segment by segment. add() hands each segment to the pool as soon as it
+# is recorded; text() waits for the rest and joins the transcripts in the order spoken.
+class SegmentedTranscription:
+    def __init__(self, backend, sample_rate, sample_width):
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.executor = get_pool(backend)
+        self.futures = []
+
+    def _transcribe(self, audio, index):
+        import speech_recognition as sr
+
+        with tracing.span("stt.segment", index=index, seconds=round(len(audio.frame_data) / (self.sample_rate * self.sample_width), 2)):
+            try:
+                return self.backend.transcribe(audio)
+            except sr.UnknownValueError:
+                return ""
+
+    def add(self, pcm):
+        import speech_recognition as sr
+
+        if not pcm:
+            return
+        if self.backend.holds_gil:
+            future = self.executor.submit(_transcribe_in_process, self.backend.name, pcm, self.sample_rate, self.sample_width)
+        else:
+            audio = sr.AudioData(pcm, self.sample_rate, self.sample_width)
+            future = self.executor.submit(tracing.run_in_context(self._transcribe), audio, len(self.futures))
+        self.futures.append(future)
+
+    def __len__(self):
+        return len(self.futures)
+
+    # The whole transcript; raises sr.UnknownValueError if no segment was understood and
+    # sr.RequestError if the engine failed
+    def text(self):
+        import speech_recognition as sr
+
+        text = " ".join(part for part in (future.result() for future in self.futures) if part)
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
@@ -0,0 +1,222 @@
+# Declarative registry for the tools the model can call.
+# Tools are plain Python functions registered with @registry.tool(...); the function-declaration
+# schema sent to Gemini is generated from their signatures. Every function call in a response is
+# run concurrently, each with its own timeout, and all results go back to the model together as
+# one function-response turn.
+import contextvars
+import functools
+import importlib
+import inspect
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import streaming
+import tracing
+
+TOOL_TIMEOUT = float(os.environ.get("TOOL_TIMEOUT", "10"))  # seconds, unless a tool sets its own
+TOOL_WORKERS = int(os.environ.get("TOOL_WORKERS", "8"))
+# Function-response turns per reply: the model may answer a tool result with more calls (e.g.
+# find_available_slots, then book_appointment); on the last one it is asked to reply in words
+MAX_TOOL_HOPS = int(os.environ.get("MAX_TOOL_HOPS", "3"))
+NO_FUNCTION_CALLS = {"function_calling_config": {"mode": "NONE"}}
+
+# Modules whose tools are registered when this module is loaded
+TOOL_MODULES = ("booking",)
+
+# JSON schema types for annotated parameters; anything else is described as a string
+SCHEMA_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", list: "array", dict: "object"}
+
+
+class Tool:
+    # local_reply(result) may return the user-facing text for a successful call so no follow-up
+    # model request is needed; returning None asks the model as usual.
+    # A tool with abandonable=False (one whose effect cannot be taken back, like a booking) is
+    # always waited for, so the model is never told it failed when it went through.
+    def __init__(self, function, name, description, parameters, timeout=TOOL_TIMEOUT, local_reply=None,
+                 abandonable=True):
+        self.function = function
+        self.name = name
+        self.description = description
+        self.timeout = timeout
+        self.local_reply = local_reply
+        self.abandonable = abandonable
+        self.signature = inspect.signature(function)
+        self.declaration = self._declaration(parameters)
+
+    # Build the function declaration from the signature; parameters without defaults are required
+    def _declaration(self, descriptions):
+        properties = {}
+        required = []
+        for name, parameter in self.signature.parameters.items():
+            if parameter.kind in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD):
+                continue
+            schema = {"type": SCHEMA_TYPES.get(parameter.annotation, "string")}
+            if name in descriptions:
+                schema["description"] = descriptions[name]
+            properties[name] = schema
+            if parameter.default is parameter.empty:
+                required.append(name)
+        return {
+            "name": self.name,
+            "description": self.description,
+            "parameters": {"type": "object", "properties": properties, "required": required},
+        }
+
+    # Call the tool with the model's arguments, ignoring any it does not accept
+    def __call__(self, args):
+        accepted = {name: value for name, value in args.items() if name in self.signature.parameters}
+        with tracing.span(f"tool.{self.name}"):
+            return self.function(**accepted)
+
+
+# Outcome of one function call
+class ToolResult:
+    def __init__(self, name, args, value=None, error=None):
+        self.name = name
+        self.args = args
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def response(self):
+        return {"result": self.value} if self.ok else {"error": self.error}
+
+
+class ToolRegistry:
+    def __init__(self, workers=TOOL_WORKERS):
+        self.by_name = {}
+        self.declarations = []
+        self.tools = [{"function_declarations": self.declarations}]  # updated in place as tools register
+        self.workers = workers
+        self.executor = None
+        self.lock = threading.Lock()
+
+    # Decorator registering a function as a tool; keyword arguments describe its parameters
+    def tool(self, description, name=None, timeout=TOOL_TIMEOUT, local_reply=None, abandonable=True, **parameters):
+        def register(function):
+            self.register(Tool(function, name or function.__name__, description, parameters, timeout, local_reply,
+                               abandonable))
+            return function
+
+        return register
+
+    def register(self, tool):
+        with self.lock:
+            if tool.name in self.by_name:
+                self.declarations.remove(self.by_name[tool.name].declaration)
+            self.by_name[tool.name] = tool
+            self.declarations.append(tool.declaration)
+
+    def get(self, name):
+        return self.by_name.get(name)
+
+    def _pool(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="tool")
+            return self.executor
+
+    # Run every function call concurrently; returns a ToolResult per call, in the order given.
+    # A tool that overruns its timeout is reported as failed (its thread is left to finish on its own),
+    # unless it is not abandonable. Tools run with a copy of the caller's context variables.
+    def dispatch(self, function_calls):
+        pending = []
+        start = time.monotonic()
+        for function_call in function_calls:
+            name = function_call.name
+            args = dict(function_call.args or {})
+            tool = self.by_name.get(name)
+            if tool is None:
+                pending.append((ToolResult(name, args, error=f"Unknown tool: {name}"), None, None))
+                continue
+            future = self._pool().submit(functools.partial(contextvars.copy_context().run, tool), args)
+            pending.append((ToolResult(name, args), tool, future))
+
+        results = []
+        for result, tool, future in pending:
+            if future is not None:
+                try:
+                    timeout = max(start + tool.timeout - time.monotonic(), 0) if tool.abandonable else None
+                    result.value = future.result(timeout=timeout)
+                except FutureTimeout:
+                    result.error = f"{result.name} timed out after {tool.timeout:g}s"
+                except Exception as e:
+                    result.error = f"{type(e).__name__}: {e}"
+            results.append(result)
+        return results
+
+
+registry = ToolRegistry()
+tools = registry.tools
+
+
+# Function to pull every function call out of a (non-streamed) response
+def get_function_calls(response):
+    candidates = getattr(response, "candidates", None)
+    if not candidates:
+        return []
+    parts = getattr(getattr(candidates[0], "content", None), "parts", None) or []
+    return [part.function_call for part in parts
+            if getattr(part, "function_call", None) is not None and part.function_call.name]
+
+
+# Function to pull the text out of a (non-streamed) response; unlike response.text, a response
+# that also calls functions does not raise
+def get_response_text(response):
+    candidates = getattr(response, "candidates", None)
+    if not candidates:
+        return ""
+    parts = getattr(getattr(candidates[0], "content", None), "parts", None) or []
+    return "".join(getattr(part, "text", "") or "" for part in parts)
+
+
+# Function to finish a turn in which the model called tools.
+# All calls run at once; their results go back to the model as a single function-response turn,
+# unless every tool can phrase its own result (local_reply), in which case no second call is made.
+# When the model answers the results with more calls, those run too, for up to max_hops turns;
+# the last of them forbids further calls so the reply always ends in text.
+# tools is what the follow-up request offers the model (the raw declarations unless a compiled copy is passed).
+def complete_tool_turn(chat, function_calls, on_text=None, tools=tools, max_hops=MAX_TOOL_HOPS, **kwargs):
+    import google.generativeai as genai
+
+    text = ""
+    for hop in range(1, max_hops + 1):
+        results = registry.dispatch(function_calls)
+        if not results:
+            break
+
+        local_replies = [registry.get(result.name).local_reply(result.value)
+                         if result.ok and registry.get(result.name).local_reply else None for result in results]
+        if all(reply is not None for reply in local_replies):
+            reply = " ".join(local_replies)
+            if on_text:
+                on_text(reply)
+            return text + reply
+
+        response_parts = [genai.protos.Part(
+            function_response=genai.protos.FunctionResponse(name=result.name, response=result.response())
+        ) for result in results]
+        request = dict(kwargs, tool_config=NO_FUNCTION_CALLS) if hop == max_hops else kwargs
+        with tracing.span("model.tool_reply", streamed=streaming.STREAMING_ENABLED, calls=len(results), hop=hop):
+            if streaming.STREAMING_ENABLED:
+                result = streaming.stream_chat(chat, response_parts, on_text=on_text, tools=tools, **request)
+                text += result.text
+                function_calls = result.function_calls
+            else:
+                response = chat.send_message(response_parts, tools=tools, **request)
+                reply = get_response_text(response)
+                if reply and on_text:
+                    on_text(reply)
+                text += reply
+                function_calls = get_function_calls(response)
+        if not function_calls:
+            break
+    return text
+
+
+for _module in TOOL_MODULES:
+    importlib.import_module(_module)
@@ -0,0 +1,223 @@
+# Per-turn stage timing.
+# Each stage of a turn (listening, recognition, model calls, tools, speech synthesis, playback)
+# runs inside a timed span tagged with the turn ID. Finished spans are appended to a JSONL file
+# and fed into an in-process metrics registry of counters and histograms.
+# Tracing is off unless TRACE=1 or TRACE_FILE is set; when off, span() returns a shared no-op.
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+
+TRACE_FILE = os.environ.get("TRACE_FILE", "")
+TRACE_ENABLED = bool(TRACE_FILE) or os.environ.get("TRACE", "0").lower() in ("1", "true", "yes")
+
+# Histogram bucket upper bounds in milliseconds (roughly logarithmic)
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000, 30000)
+
+_turn_id = contextvars.ContextVar("turn_id", default=None)
+_turn_counter = itertools.count(1)
+_session = f"{int(time.time()):x}-{os.getpid():x}"
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    # Estimate a percentile from the buckets (upper bound of the bucket it falls in)
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def increment(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {name: histogram.snapshot() for name, histogram in self.histograms.items()},
+            }
+
+    def summary(self):
+        snapshot = self.snapshot()
+        lines = [f"{'stage':<28} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+        for name in sorted(snapshot["histograms"]):
+            row = snapshot["histograms"][name]
+            lines.append(f"{name:<28} {row['count']:>5} {row['p50']:>9.0f} {row['p95']:>9.0f} {row['max']:>9.0f}")
+        return "\n".join(lines)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+metrics = MetricsRegistry()
+
+
+# Appends finished spans to a JSONL file
+class JsonlSink:
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, separators=(",", ":"), default=str)
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, "a", encoding="utf-8", buffering=1)
+            self.file.write(line + "\n")
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+_sink = JsonlSink(TRACE_FILE) if TRACE_FILE else None
+
+
+class Span:
+    __slots__ = ("name", "tags", "start", "wall_start", "token")
+
+    def __init__(self, name, tags):
+        self.name = name
+        self.tags = tags
+        self.token = None
+
+    # Attach extra tags (e.g. a cache hit or the time to first token) while the span is open
+    def tag(self, **tags):
+        self.tags.update(tags)
+
+    def __enter__(self):
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        duration_ms = (time.perf_counter() - self.start) * 1000
+        metrics.observe(self.name, duration_ms)
+        metrics.increment(f"{self.name}.count")
+        if exc_type is not None:
+            metrics.increment(f"{self.name}.errors")
+        if _sink is not None:
+            record = {
+                "session": _session,
+                "turn_id": _turn_id.get(),
+                "span": self.name,
+                "start": round(self.wall_start, 6),
+                "duration_ms": round(duration_ms, 3),
+            }
+            if self.tags:
+                record["tags"] = self.tags
+            if exc_type is not None:
+                record["error"] = exc_type.__name__
+            _sink.write(record)
+        if self.token is not None:
+            _turn_id.reset(self.token)
+        return False
+
+
+# Shared do-nothing span used while tracing is disabled
+class _NoopSpan:
+    __slots__ = ()
+
+    def tag(self, **tags):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+# Function to time one stage of the current turn
+def span(name, **tags):
+    if not TRACE_ENABLED:
+        return _NOOP
+    return Span(name, tags)
+
+
+# Function to open a new turn; spans inside it (including on threads started with
+# run_in_context) carry its turn ID
+def turn(**tags):
+    if not TRACE_ENABLED:
+        return _NOOP
+    turn_span = Span("turn", tags)
+    turn_span.token = _turn_id.set(f"{_session}-{next(_turn_counter)}")
+    return turn_span
+
+
+# Function to get the current turn ID (None outside a turn or when tracing is off)
+def current_turn():
+    return _turn_id.get()
+
+
+# Function to wrap a thread target so it runs with the caller's turn ID
+def run_in_context(target):
+    if not TRACE_ENABLED:
+        return target
+    return functools.partial(contextvars.copy_context().run, target)
+
+
+# Function to record a duration measured elsewhere (e.g. time to first token)
+def observe(name, duration_ms):
+    if TRACE_ENABLED:
+        metrics.observe(name, duration_ms)
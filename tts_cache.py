@@ -0,0 +1,166 @@
+# Content-addressed cache for synthesized speech.
+# Audio is keyed by a hash of the text and voice settings, kept in a size-bounded
+# in-memory LRU, and backed by a size-bounded on-disk tier that survives restarts.
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+CACHE_DIR = os.environ.get("TTS_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".tts_cache"))
+MEMORY_LIMIT_BYTES = int(float(os.environ.get("TTS_CACHE_MEMORY_MB", "16")) * 1024 * 1024)
+DISK_LIMIT_BYTES = int(float(os.environ.get("TTS_CACHE_DISK_MB", "128")) * 1024 * 1024)
+
+
+# Function to build the cache key for a piece of text and its voice settings
+def cache_key(text, lang='en', tld='com', slow=False):
+    raw = f"{lang}\x00{tld}\x00{int(slow)}\x00{text.strip()}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    def __init__(self, cache_dir=CACHE_DIR, memory_limit=MEMORY_LIMIT_BYTES, disk_limit=DISK_LIMIT_BYTES):
+        self.cache_dir = cache_dir
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self.memory = OrderedDict()  # key -> audio bytes, least recently used first
+        self.memory_bytes = 0
+        self.disk = None  # key -> file size, loaded lazily from cache_dir
+        self.disk_bytes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.mp3")
+
+    # Index whatever is already on disk, oldest access first
+    def _load_disk_index(self):
+        self.disk = OrderedDict()
+        if not self.cache_dir or not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".mp3"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self.disk[key] = size
+            self.disk_bytes += size
+
+    def _remember(self, key, audio):
+        if len(audio) > self.memory_limit:
+            return
+        if key in self.memory:
+            self.memory_bytes -= len(self.memory.pop(key))
+        self.memory[key] = audio
+        self.memory_bytes += len(audio)
+        while self.memory_bytes > self.memory_limit:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= len(evicted)
+
+    def _write_disk(self, key, audio):
+        if not self.cache_dir or len(audio) > self.disk_limit:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"Could not write TTS cache entry: {e}")
+            return
+        if key in self.disk:
+            self.disk_bytes -= self.disk.pop(key)
+        self.disk[key] = len(audio)
+        self.disk_bytes += len(audio)
+        while self.disk_bytes > self.disk_limit:
+            evicted, size = self.disk.popitem(last=False)
+            self.disk_bytes -= size
+            try:
+                os.remove(self._path(evicted))
+            except OSError:
+                pass
+
+    def _read_disk(self, key):
+        if self.disk is None:
+            self._load_disk_index()
+        if key not in self.disk:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                audio = f.read()
+            os.utime(self._path(key))
+        except OSError:
+            self.disk_bytes -= self.disk.pop(key)
+            return None
+        self.disk.move_to_end(key)
+        return audio
+
+    def get(self, key):
+        with self.lock:
+            audio = self.memory.get(key)
+            if audio is not None:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                return audio
+            audio = self._read_disk(key)
+            if audio is not None:
+                self._remember(key, audio)
+                self.disk_hits += 1
+                return audio
+            self.misses += 1
+            return None
+
+    def put(self, key, audio):
+        with self.lock:
+            if self.disk is None:
+                self._load_disk_index()
+            self._remember(key, audio)
+            self._write_disk(key, audio)
+
+    # Return cached audio for key, calling synthesize() and storing the result on a miss
+    def get_or_create(self, key, synthesize):
+        audio = self.get(key)
+        if audio is None:
+            audio = synthesize()
+            self.put(key, audio)
+        return audio
+
+    def clear(self):
+        with self.lock:
+            if self.disk is None:
+                self._load_disk_index()
+            for key in list(self.disk):
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self.memory.clear()
+            self.disk.clear()
+            self.memory_bytes = 0
+            self.disk_bytes = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self.memory),
+                "memory_bytes": self.memory_bytes,
+                "disk_entries": len(self.disk) if self.disk is not None else None,
+                "disk_bytes": self.disk_bytes if self.disk is not None else None,
+            }
+
+
+# Process-wide cache used by voice_io
+tts_cache = TTSCache()
@@ -1,40 +1,419 @@
-import speech_recognition as sr
-from gtts import gTTS
+import io
 import os
 import platform
+import queue
+import re
+import subprocess
+import tempfile
+import threading
 import time
+from collections import deque
+import tracing
+from playback import AudioPlayer
+from tts_cache import cache_key, tts_cache
+from stt import SEGMENT_MAX_SECONDS, SEGMENT_MIN_SECONDS, SEGMENT_PAUSE_SECONDS, SegmentedTranscription, get_backend, prewarm_pool, rms
 
-# Function to listen to user's voice input
-def listen_to_user():
-    recognizer = sr.Recognizer()
-    with sr.Microphone() as source:
-        print("Listening...")
-        recognizer.adjust_for_ambient_noise(source)
-        audio = recognizer.listen(source)
+# Sentence boundaries used to pipeline speech synthesis
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+# Fragments shorter than this are merged into the next sentence to avoid choppy playback
+MIN_SENTENCE_CHARS = 20
+
+# How many synthesized sentences may wait ahead of playback
+PREFETCH_SENTENCES = 2
+
+
+# Only one reply speaks at a time (e.g. a background welcome and the first answer)
+_speech_lock = threading.Lock()
+
+# Let the user interrupt Cotton by speaking or typing; otherwise each reply is heard out in full
+BARGE_IN = os.environ.get("BARGE_IN", "1").lower() in ("1", "true", "yes")
+# While Cotton is talking, speech must be this much louder again to count, so its own voice
+# coming back through the microphone does not interrupt it
+BARGE_IN_ENERGY_RATIO = float(os.environ.get("BARGE_IN_ENERGY_RATIO", "3.0"))
+
+# Voice activity detection settings for the persistent listener
+CALIBRATION_SECONDS = float(os.environ.get("VAD_CALIBRATION_SECONDS", "0.5"))
+SPEECH_ENERGY_RATIO = float(os.environ.get("VAD_ENERGY_RATIO", "3.0"))  # speech must be this much louder than the noise floor
+MIN_SPEECH_ENERGY = 150  # keeps a silent room from making every click count as speech
+END_SILENCE_SECONDS = float(os.environ.get("VAD_END_SILENCE_SECONDS", "0.6"))  # trailing silence that ends an utterance
+ONSET_SECONDS = 0.1  # sustained energy needed to start an utterance
+PRE_ROLL_SECONDS = 0.3  # audio kept from just before the onset so first syllables aren't clipped
+MAX_UTTERANCE_SECONDS = 60
+NOISE_FLOOR_SMOOTHING = 0.05
+NOISE_DRIFT_RATIO = 2.0  # recalibrate when the tracked floor moves this far from the calibrated one
+NOISE_WINDOW_SECONDS = 2.0  # a noise floor that rises for this long is noise, not speech
+
+# Function to turn recorded audio (an sr.AudioData, or a SegmentedTranscription already under way)
+# into text with the configured STT backend
+def recognize(audio, backend=None):
+    import speech_recognition as sr
     
     try:
-        text = recognizer.recognize_google(audio)
+        backend = backend or get_backend()
+        with tracing.span("stt.recognize", backend=backend.name):
+            text = audio.text() if isinstance(audio, SegmentedTranscription) else backend.transcribe(audio)
         print(f"You said: {text}")
         return text
     except sr.UnknownValueError:
         print("Sorry, I couldn't understand what you said.")
         return ""
-    except sr.RequestError:
-        print("Could not request results from speech recognition service.")
+    except sr.RequestError as e:
+        print(f"Could not request results from speech recognition service: {e}")
         return ""
 
-# Function to speak the bot's response
-def speak_response(text):
-    tts = gTTS(text=text, lang='en')
-    tts.save("response.mp3")
-    
-    # Play the audio file based on the operating system
-    if platform.system() == "Darwin":  # macOS
-        os.system("afplay response.mp3")
-    elif platform.system() == "Linux":
-        os.system("mpg123 response.mp3")
-    else:  # Windows
-        os.system("start response.mp3")
+# Long-lived microphone session for voice mode.
+# The stream stays open between turns, the noise floor is calibrated once and tracked
+# from the silence between utterances, and utterances end on a short energy-based pause.
+class VoiceListener:
+    def __init__(self, source=None):
+        self.source = source  # an open sr.Microphone (or anything with the same stream/CHUNK/SAMPLE_* attributes)
+        self.microphone = None
+        self.backend = None
+        self.noise_floor = None
+        self.calibrated_floor = None
+        self.recent_energies = None
+        self.recalibrations = 0
+    
+    def open(self):
+        # Imported here so the microphone stack only loads once voice mode is used
+        import speech_recognition as sr
+        
+        self.backend = get_backend()
+        prewarm_pool(self.backend)
+        if self.source is None:
+            self.microphone = sr.Microphone()
+            self.source = self.microphone.__enter__()
+        if self.calibrated_floor is None:
+            self.calibrate()
+        return self
+    
+    def close(self):
+        if self.microphone is not None:
+            self.microphone.__exit__(None, None, None)
+            self.microphone = None
+            self.source = None
+    
+    def _frame_seconds(self):
+        return self.source.CHUNK / self.source.SAMPLE_RATE
+    
+    def _read_frame(self):
+        frame = self.source.stream.read(self.source.CHUNK)
+        return frame, rms(frame)
+    
+    # Measure the noise floor from a short stretch of room tone
+    def calibrate(self, duration=CALIBRATION_SECONDS):
+        frames = max(int(duration / self._frame_seconds()), 1)
+        with tracing.span("stt.calibrate"):
+            energies = [self._read_frame()[1] for _ in range(frames)]
+        self.noise_floor = self.calibrated_floor = sum(energies) / len(energies)
+    
+    def threshold(self, speaking=None):
+        threshold = max(self.calibrated_floor * SPEECH_ENERGY_RATIO, MIN_SPEECH_ENERGY)
+        return threshold * BARGE_IN_ENERGY_RATIO if speaking is not None and speaking.playing else threshold
+    
+    # Follow the room noise and re-baseline only when it has drifted: downward drift shows in
+    # the smoothed energy between utterances, upward drift as a minimum that stays high
+    def _track_noise(self, energy, speaking):
+        if self.recent_energies is None:
+            self.recent_energies = deque(maxlen=max(int(NOISE_WINDOW_SECONDS / self._frame_seconds()), 1))
+        self.recent_energies.append(energy)
+        if not speaking:
+            self.noise_floor += NOISE_FLOOR_SMOOTHING * (energy - self.noise_floor)
+        
+        floor = max(self.calibrated_floor, 1)
+        if len(self.recent_energies) == self.recent_energies.maxlen and min(self.recent_energies) > floor * NOISE_DRIFT_RATIO:
+            self.noise_floor = min(self.recent_energies)
+        elif self.noise_floor * NOISE_DRIFT_RATIO >= floor:
+            return False
+        self.calibrated_floor = self.noise_floor
+        self.recent_energies.clear()
+        self.recalibrations += 1
+        return True
+    
+    # Record one utterance; returns raw audio bytes, or None if nobody spoke before timeout.
+    # With barge_in, the user can talk over Cotton: playback stops once speech starts.
+    # on_segment(pcm) receives the utterance in pieces cut at pauses while it is still being recorded.
+    def record_utterance(self, timeout=None, barge_in=False, on_segment=None):
+        speaking = player if barge_in else None
+        frame_seconds = self._frame_seconds()
+        onset_frames = max(int(ONSET_SECONDS / frame_seconds), 1)
+        end_frames = max(int(END_SILENCE_SECONDS / frame_seconds), 1)
+        max_frames = int(MAX_UTTERANCE_SECONDS / frame_seconds)
+        pre_roll = deque(maxlen=max(int(PRE_ROLL_SECONDS / frame_seconds), onset_frames))
+        
+        # Wait for speech
+        waited = 0.0
+        loud = 0
+        while True:
+            frame, energy = self._read_frame()
+            if not frame:
+                return None
+            pre_roll.append(frame)
+            loud_enough = energy > self.threshold(speaking)
+            if self._track_noise(energy, loud_enough):
+                loud = 0
+            elif loud_enough:
+                loud += 1
+                if loud >= onset_frames:
+                    if speaking is not None:
+                        speaking.cancel()
+                    break
+            else:
+                loud = 0
+            waited += frame_seconds
+            if timeout is not None and waited >= timeout:
+                return None
+        
+        # Record until a long enough pause
+        frames = list(pre_roll)
+        silent = 0
+        segment_start = 0
+        segment_voiced = True
+        pause_frames = max(int(SEGMENT_PAUSE_SECONDS / frame_seconds), 1)
+        min_segment_frames = int(SEGMENT_MIN_SECONDS / frame_seconds)
+        max_segment_frames = int(SEGMENT_MAX_SECONDS / frame_seconds)
+        while silent < end_frames and len(frames) < max_frames:
+            frame, energy = self._read_frame()
+            if not frame:
+                break
+            frames.append(frame)
+            loud_enough = energy > self.threshold()
+            if self._track_noise(energy, loud_enough) and len(frames) > end_frames:
+                # The "speech" was a rise in background noise; end the utterance here
+                break
+            silent = 0 if loud_enough else silent + 1
+            segment_voiced = segment_voiced or loud_enough
+            length = len(frames) - segment_start
+            if on_segment and ((silent >= pause_frames and length >= min_segment_frames) or length >= max_segment_frames):
+                on_segment(b"".join(frames[segment_start:]))
+                segment_start = len(frames)
+                segment_voiced = False
+        if on_segment and segment_voiced:  # trailing silence after the last cut is not worth recognizing
+            on_segment(b"".join(frames[segment_start:]))
+        return b"".join(frames)
+    
+    # Listen for one utterance and return the recognized text ("" if nothing usable).
+    # With barge_in, listening may start while Cotton is still talking. Long utterances are
+    # recognized in segments while the user is still speaking.
+    def listen(self, timeout=None, barge_in=False):
+        if self.backend is None:
+            self.open()
+        print("Listening...")
+        transcription = SegmentedTranscription(self.backend, self.source.SAMPLE_RATE, self.source.SAMPLE_WIDTH)
+        with tracing.span("stt.record"):
+            audio = self.record_utterance(timeout, barge_in, on_segment=transcription.add)
+        if not audio:
+            return ""
+        return recognize(transcription, self.backend)
+
+_listener = None
+
+# Function to get the shared listener, opening the microphone on first use
+def get_listener():
+    global _listener
+    if _listener is None:
+        _listener = VoiceListener().open()
+    return _listener
+
+# Function to listen to user's voice input
+def listen_to_user():
+    return get_listener().listen()
+
+# Function to split a reply into sentences for pipelined speech
+def split_sentences(text):
+    sentences = []
+    pending = ""
+    for sentence in SENTENCE_BOUNDARY.split(text.strip()):
+        pending = f"{pending} {sentence}".strip()
+        if len(pending) >= MIN_SENTENCE_CHARS:
+            sentences.append(pending)
+            pending = ""
+    if pending:
+        if sentences:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+    return sentences
+
+# Function to synthesize text into an in-memory MP3 buffer, consulting the TTS cache first
+def synthesize(text, lang='en', tld='com', slow=False):
+    def generate():
+        from gtts import gTTS
+        
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=lang, tld=tld, slow=slow).write_to_fp(buffer)
+        return buffer.getvalue()
+    
+    with tracing.span("tts.synthesize", chars=len(text)):
+        return tts_cache.get_or_create(cache_key(text, lang, tld, slow), generate)
+
+# Function to pre-warm the TTS cache with phrases we know will be spoken.
+# Phrases are split the same way speak_response splits them so the cached segments match.
+def prewarm_speech(phrases, background=True):
+    def warm():
+        for phrase in phrases:
+            for sentence in split_sentences(phrase):
+                try:
+                    synthesize(sentence)
+                except Exception as e:
+                    print(f"Could not pre-warm speech: {e}")
+                    return
+    
+    if background:
+        thread = threading.Thread(target=warm, daemon=True)
+        thread.start()
+        return thread
+    warm()
+    return None
+
+# Synthesizes a reply sentence by sentence on a worker thread while its text is still streaming in.
+# The audio stays in memory and belongs to the caller, so concurrent sessions never share a file or a player.
+class SpeechStream:
+    def __init__(self):
+        self.pending = ""  # text after the last complete sentence
+        self.sentences = queue.Queue()
+        self.segments = queue.Queue()
+        self.done = False
+        threading.Thread(target=tracing.run_in_context(self._synthesize_all), daemon=True).start()
+    
+    def _synthesize_all(self):
+        try:
+            while True:
+                sentence = self.sentences.get()
+                if sentence is None:
+                    break
+                self.segments.put(synthesize(sentence))
+        except Exception as e:
+            self.segments.put(e)
+        self.segments.put(None)
+    
+    # Add streamed text; every complete sentence is queued for synthesis right away
+    def feed(self, text):
+        *complete, self.pending = SENTENCE_BOUNDARY.split(self.pending + text)
+        sentence = ""
+        for part in complete:
+            sentence = f"{sentence} {part}".strip()
+            if len(sentence) >= MIN_SENTENCE_CHARS:
+                self.sentences.put(sentence)
+                sentence = ""
+        if sentence:  # too short to speak on its own; it goes with the next sentence
+            self.pending = f"{sentence} {self.pending}"
+    
+    # No more text is coming; synthesize whatever is left
+    def finish(self):
+        if self.pending.strip():
+            self.sentences.put(self.pending.strip())
+        self.pending = ""
+        self.sentences.put(None)
+    
+    # Next synthesized segment in order. Returns None when the reply is over, or, with block=False,
+    # when the next segment is not ready yet.
+    def next_segment(self, block=True):
+        if self.done:
+            return None
+        try:
+            audio = self.segments.get(block=block)
+        except queue.Empty:
+            return None
+        if isinstance(audio, Exception):
+            self.done = True
+            raise audio
+        self.done = audio is None
+        return audio
+
+# Function to play MP3 bytes with the operating system's player (used when in-process playback
+# is unavailable). Returns early, stopping the player, once the stop event is set.
+def play_audio(audio, stop=None):
+    try:
+        if platform.system() == "Linux":
+            # mpg123 reads the MP3 straight from stdin, so nothing touches the disk
+            process = subprocess.Popen(["mpg123", "-q", "-"], stdin=subprocess.PIPE)
+            try:
+                process.stdin.write(audio)
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+            _wait_for_player(process, stop)
+            return
+        
+        # afplay and PowerShell need a file; give each segment its own so nothing is shared
+        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as audio_file:
+            audio_file.write(audio)
+        if platform.system() == "Darwin":  # macOS
+            command = ["afplay", audio_file.name]
+        else:  # Windows
+            command = ["powershell", "-NoProfile", "-NonInteractive", "-Command", WINDOWS_PLAYER, audio_file.name]
+        try:
+            # Both players exit when the segment ends, so sentences play one after another
+            _wait_for_player(subprocess.Popen(command), stop)
+        finally:
+            os.remove(audio_file.name)
+    except FileNotFoundError as e:
+        print(f"Could not play audio: {e}")
+
+# Plays the MP3 given as its argument with the WPF media player and exits once it has finished.
+# (start / os.startfile return at once, so consecutive sentences would talk over each other.)
+WINDOWS_PLAYER = (
+    "Add-Type -AssemblyName PresentationCore; "
+    "$player = New-Object System.Windows.Media.MediaPlayer; "
+    "$player.Open([Uri]$args[0]); "
+    "$deadline = (Get-Date).AddSeconds(5); "
+    "while (-not $player.NaturalDuration.HasTimeSpan -and (Get-Date) -lt $deadline) { Start-Sleep -Milliseconds 10 }; "
+    "if ($player.NaturalDuration.HasTimeSpan) { "
+    "$player.Play(); Start-Sleep -Milliseconds ([int]$player.NaturalDuration.TimeSpan.TotalMilliseconds + 100) }; "
+    "$player.Close()"
+)
+
+def _wait_for_player(process, stop):
+    if stop is None:
+        process.wait()
+        return
+    while process.poll() is None:
+        if stop.wait(0.02):
+            process.terminate()
+            process.wait()
+
+# Plays every reply: in process when PyAudio is available, otherwise through play_audio
+player = AudioPlayer(fallback=lambda audio, stop: play_audio(audio, stop))
+
+# Function to open the audio output ahead of the first reply
+def open_audio_output():
+    player.open()
+
+# Function to stop Cotton mid-sentence and drop the rest of the reply
+def interrupt_speech():
+    player.cancel()
+
+# Function to speak the bot's response.
+# Sentence N+1 is synthesized on a worker thread while sentence N plays. With wait=False this
+# returns as soon as synthesis has started; interrupt_speech() stops the reply at any point.
+def speak_response(text, wait=True):
+    sentences = split_sentences(text)
+    if not sentences:
+        return
+    stop = player.stop  # set by interrupt_speech(); nothing more of this reply is synthesized or played after it
+    
+    def synthesize_all():
+        with _speech_lock:
+            for sentence in sentences:
+                # Stay at most PREFETCH_SENTENCES ahead of playback
+                while player.pending > PREFETCH_SENTENCES and not stop.is_set():
+                    stop.wait(0.05)
+                if stop.is_set():
+                    return
+                try:
+                    audio = synthesize(sentence)
+                except Exception as e:
+                    print(f"Could not synthesize speech: {e}")
+                    return
+                player.play(audio, stop)
+    
+    thread = threading.Thread(target=tracing.run_in_context(synthesize_all), daemon=True)
+    thread.start()
+    if wait:
+        thread.join()
+        player.wait()
 
 # Test function
 def test_voice_io():